@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the emulated networks. Each benchmark builds its own small
+network, so nothing else should be running.
+
+- backends : setup time and forwarding throughput of the fabric datapath backends
+- links    : forwarding throughput under each link profile
+- cfg      : netcfg generation time for many large fabrics, by number of processes
+"""
+import json
+import multiprocessing
+import sys
+import time
+
+from mininet.net import Mininet
+from mininet.node import RemoteController
+from mininet.log import setLogLevel, info
+from mininet.util import quietRun
+
+from domains import Domain
+from datapaths import BACKENDS, portDescCmd, pathFlows, installFlows
+from links import LINK_PROFILES, applyProfiles
+from cfggen import generate
+
+class BenchDomain(Domain):
+    """
+    h<x>1 - leaf<x>01 - spine<x>1 - leaf<x>02 - h<x>2, with every switch
+    implemented by the same datapath backend.
+    """
+    def __init__(self, did, backend):
+        Domain.__init__(self, did)
+        self.setBackend(backend)
+
+    def build(self):
+        d = self.getId()
+        spine = self.addFabricSwitch('spine%s1' % d, 'spine')
+        for i in (1, 2):
+            leaf = self.addFabricSwitch('leaf%s0%s' % (d, i), 'leaf')
+            host = self.addHost('h%s%s' % (d, i), ip='10.%s.0.%s/24' % (d, i))
+            self.addLink(host, leaf)
+            self.addLink(leaf, spine)
+
+    def path(self):
+        """ the nodes from one host to the other """
+        d = self.getId()
+        return [ self.getHosts('h%s1' % d), self.getSwitches('leaf%s01' % d),
+                 self.getSwitches('spine%s1' % d), self.getSwitches('leaf%s02' % d),
+                 self.getHosts('h%s2' % d) ]
+
+def waitManageable(switches, timeout=30):
+    """ wait until every switch answers management commands """
+    end = time.time() + timeout
+    pending = list(switches)
+    while pending and time.time() < end:
+        pending = [ sw for sw in pending
+                    if 'eth' not in quietRun(portDescCmd(sw), shell=True) ]
+        if pending:
+            time.sleep(0.1)
+    return not pending
+
+def benchRun(backend, profile=None, seconds=10):
+    """
+    returns (setup time in seconds, iperf TCP throughput) for a backend, with
+    a link profile if given.
+    """
+    d = BenchDomain(9, backend)
+    d.setLinkProfile(profile)
+    # nothing listens on this port: flows are programmed directly
+    d.addController('c9', controller=RemoteController, ip='127.0.0.1', port=6699)
+    net = Mininet(controller=None)
+    d.build()
+    d.injectInto(net)
+
+    start = time.time()
+    net.build()
+    applyProfiles([ d ])
+    d.start()
+    ready = waitManageable(d.getSwitches())
+    errs = installFlows(pathFlows(net, d.path()))
+    setup = time.time() - start
+    if not ready or errs:
+        net.stop()
+        return setup, 'unusable: %s' % (errs if errs else 'switches did not come up')
+
+    src, dst = d.path()[0], d.path()[-1]
+    net.ping([src, dst], timeout=1)
+    rate = net.iperf((src, dst), seconds=seconds)[-1]
+    net.stop()
+    return setup, rate
+
+def backends(*names):
+    """ compare the datapath backends named, or all of them """
+    results = []
+    for b in names if names else sorted(BACKENDS):
+        info('*** Benchmarking datapath backend %s\n' % b)
+        results.append((b,) + benchRun(b))
+    info('\n%-8s %10s  %s\n' % ('backend', 'setup (s)', 'throughput'))
+    for b, setup, rate in results:
+        info('%-8s %10.2f  %s\n' % (b, setup, rate))
+    return results
+
+def links(backend='ovs', *names):
+    """ compare the link profiles named, or all of them, over one backend """
+    results = []
+    for p in names if names else sorted(LINK_PROFILES):
+        info('*** Benchmarking link profile %s over %s\n' % (p, backend))
+        results.append((p,) + benchRun(backend, p)[1:])
+    info('\n%-10s  %s\n' % ('profile', 'throughput'))
+    for p, rate in results:
+        info('%-10s  %s\n' % (p, rate))
+    return results
+
+def fabricDesc(did, spines, leaves, fanout):
+    """ a cfggen description of a spine-leaf fabric, without building it """
+    sws, hosts = [], []
+    for s in range(spines):
+        sws.append({ 'name' : 'spine%d-%04d' % (did, s), 'dpid' : '%04x%08x' % (did, s),
+                     'leaf' : False, 'gw' : None, 'edge' : [] })
+    for l in range(leaves):
+        name = 'leaf%d-%04d' % (did, l)
+        sws.append({ 'name' : name, 'dpid' : '%04x1%07x' % (did, l), 'leaf' : True,
+                     'gw' : '10.%d.%d.254' % (did % 256, l % 256),
+                     'edge' : list(range(spines + 1, spines + fanout + 1)) })
+        for h in range(fanout):
+            hosts.append({ 'mac' : '02:%02x:%02x:%02x:%02x:01' % (did % 256, l // 256, l % 256, h),
+                           'ip' : '10.%d.%d.%d' % (did % 256, l % 256, h + 1),
+                           'sw' : name, 'port' : spines + h + 1 })
+    return { 'did' : did, 'macfmt' : '00:00:00:%02x:%02x:80', 'switches' : sws, 'hosts' : hosts }
+
+def cfg(domains=32, leaves=256, fanout=8):
+    """ netcfg generation time for domains fabrics of leaves leaves, by number of processes """
+    descs = [ fabricDesc(d, 4, int(leaves), int(fanout)) for d in range(1, int(domains) + 1) ]
+    procs, n = [], 1
+    while n < multiprocessing.cpu_count():
+        procs.append(n)
+        n *= 2
+    procs.append(multiprocessing.cpu_count())
+    results, first = [], None
+    for p in procs:
+        start = time.time()
+        cfgs = generate(descs, procs=p)
+        secs = time.time() - start
+        doc = json.dumps(cfgs, sort_keys=True)
+        if first is None:
+            first = doc
+        elif doc != first:
+            info('*** %d processes gave a different netcfg\n' % p)
+        results.append((p, secs))
+    info('\n%d domains of %d switches and %d hosts each\n'
+         % (len(descs), len(descs[0]['switches']), len(descs[0]['hosts'])))
+    info('%-10s %10s %8s\n' % ('processes', 'time (s)', 'speedup'))
+    for p, secs in results:
+        info('%-10d %10.2f %8.2f\n' % (p, secs, results[0][1] / secs))
+    return results
+
+BENCHMARKS = { 'backends' : backends, 'links' : links, 'cfg' : cfg }
+
+if __name__ == '__main__':
+    setLogLevel('info')
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print ('Usage: sudo -E ./bench.py benchmark [args]\n\n'
+               'backends [names] : setup time and throughput per datapath backend\n'
+               'links [backend [profiles]] : throughput per link profile (over ovs)\n'
+               'cfg [domains [leaves [fanout]]] : netcfg generation time per number of processes')
+    else:
+        BENCHMARKS[sys.argv[1]](*sys.argv[2:])
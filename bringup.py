@@ -0,0 +1,125 @@
+"""
+Bring-up as a graph of tasks, so that steps that do not depend on each other
+run at the same time.
+
+Tasks are added with the names of the tasks they depend on, and run in
+threads as soon as all of those have finished, at most workers at a time.
+A task that fails (raises) takes down the tasks that depend on it, but not
+the others. Afterwards the critical path - the chain of tasks that decided
+when the last one finished - is reported, along with how much the overlap
+saved over running everything in order.
+
+    b = BringUp()
+    b.add('build', net.build)
+    b.add('start:1', d1.start, [ 'build' ], domain=d1)
+    b.add('start:2', d2.start, [ 'build' ], domain=d2)
+    b.run()
+    b.report()
+
+Tasks that belong to a domain have their run time recorded in it, with
+noteTime(), under the task name up to any ':'.
+"""
+import threading
+import time
+import traceback
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+from mininet.log import info, error
+
+class Task(object):
+
+    def __init__(self, name, fn, deps, domain):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.domain = domain
+        self.start = self.end = None
+        self.error = None
+
+    def run(self, done):
+        self.start = time.time()
+        try:
+            self.fn()
+        except Exception as e:
+            self.error = e
+            error('*** bring-up: %s failed:\n%s' % (self.name, traceback.format_exc()))
+        self.end = time.time()
+        done.put(self)
+
+    def secs(self):
+        return self.end - self.start if self.end else 0.0
+
+class BringUp(object):
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        # task name to Task, and names in the order added
+        self.tasks = {}
+        self.order = []
+        self.start = self.end = None
+
+    def add(self, name, fn, deps=[], domain=None):
+        """ add a task running fn() after the tasks named in deps. returns its name """
+        if name in self.tasks:
+            raise ValueError('task %s added twice' % name)
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError('task %s depends on unknown task %s' % (name, dep))
+        self.tasks[name] = Task(name, fn, deps, domain)
+        self.order.append(name)
+        return name
+
+    def run(self):
+        """ run all tasks. returns True if all of them ran and none failed """
+        done = Queue()
+        pending = list(self.order)
+        finished, failed = set(), set()
+        running = 0
+        self.start = time.time()
+        while pending or running:
+            for name in list(pending):
+                t = self.tasks[name]
+                if any(d in failed for d in t.deps):
+                    info('*** bring-up: skipping %s\n' % name)
+                    failed.add(name)
+                    pending.remove(name)
+                elif running < self.workers and all(d in finished for d in t.deps):
+                    pending.remove(name)
+                    running += 1
+                    th = threading.Thread(target=t.run, args=(done,))
+                    th.daemon = True
+                    th.start()
+            if not running:
+                # tasks only depend on tasks added before them, so with nothing
+                # running, everything left was just skipped
+                continue
+            t = done.get()
+            running -= 1
+            (failed if t.error else finished).add(t.name)
+            if t.domain is not None and not t.error:
+                t.domain.noteTime(t.name.split(':')[0], t.secs())
+        self.end = time.time()
+        return not failed
+
+    def criticalPath(self):
+        """ the tasks, first to last, of the chain that finished last """
+        ran = [ t for t in self.tasks.values() if t.end ]
+        if not ran:
+            return []
+        t = max(ran, key=lambda t: t.end)
+        path = [ t ]
+        while t.deps:
+            t = max((self.tasks[d] for d in t.deps), key=lambda d: d.end or 0)
+            path.append(t)
+        return path[::-1]
+
+    def report(self):
+        total = self.end - self.start
+        serial = sum(t.secs() for t in self.tasks.values())
+        info('*** Bring-up: %.2fs, against %.2fs for the same tasks one by one\n' % (total, serial))
+        info('*** Critical path:\n')
+        for t in self.criticalPath():
+            info('\t%-16s %7.2fs  (from %.2fs)\n' % (t.name, t.secs(), t.start - self.start))
@@ -0,0 +1,38 @@
+"""
+Apply many network changes with few processes.
+
+- ipBatch : many ip(8) commands in one 'ip -batch', in any node's namespace
+- vsctl   : many ovs-vsctl commands in one OVSDB transaction
+"""
+from subprocess import Popen, PIPE, STDOUT
+
+def run(args, stdin=None):
+    """ run args (a list), feeding it stdin. returns (exit status, output) """
+    p = Popen(args, stdin=PIPE, stdout=PIPE, stderr=STDOUT, universal_newlines=True)
+    out, _ = p.communicate(stdin)
+    return p.returncode, out
+
+def ipBatch(lines, pid=None, force=True):
+    """
+    run ip commands (without the leading 'ip') as a single batch.
+    pid : run in the network namespace of this process (a node's pid)
+    force : carry on past failing commands
+    """
+    if not lines:
+        return 0, ''
+    args = [ 'ip' ] + ([ '-force' ] if force else []) + [ '-batch', '-' ]
+    if pid:
+        args = [ 'mnexec', '-a', str(pid) ] + args
+    return run(args, '\n'.join(lines) + '\n')
+
+def vsctl(cmds, timeout=30):
+    """
+    run ovs-vsctl commands (each a list of arguments) as one transaction.
+    """
+    if not cmds:
+        return 0, ''
+    args = [ 'ovs-vsctl', '--timeout=%d' % timeout ]
+    for cmd in cmds:
+        args.append('--')
+        args.extend(cmd)
+    return run(args)
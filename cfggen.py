@@ -0,0 +1,117 @@
+"""
+Segment routing netcfg generation for many, large fabric domains at once.
+
+Each domain is first described as plain data (describe()), which can be sent
+to other processes. Each description is cut into shards of switches, shards
+are turned into partial netcfgs in a process pool, and the partial netcfgs
+of a domain are merged into its netcfg. Switches are numbered (node SIDs,
+router IPs and MACs) in order of name, so the result does not depend on how
+the work was split, and dump() writes keys in sorted order.
+
+A description is a dict:
+
+    { 'did' : 1, 'macfmt' : '00:00:00:%02x:%02x:80',
+      'switches' : [ { 'name' : 'leaf101', 'dpid' : '...', 'leaf' : True,
+                       'gw' : '10.1.1.254', 'edge' : [ <ports facing hosts/tethers> ] } ],
+      'hosts' : [ { 'mac' : '...', 'ip' : '10.1.2.2', 'sw' : 'leaf102', 'port' : 1 } ] }
+"""
+import json
+from multiprocessing import Pool
+
+from endpoints import endpointsOf
+from validate import devId
+
+def describe(domain):
+    """ a plain-data description of a SegmentRoutedDomain, once injected into a net """
+    gws = getattr(domain, 's2gw', {})
+    leaves = set(domain.getLeaves())
+    sws = []
+    for sw in sorted(domain.getSwitches(), key=lambda s: s.name):
+        edge = []
+        for intf in sw.intfList():
+            if intf.name == 'lo' or not intf.link:
+                continue
+            ends = (intf.link.intf1.node.name, intf.link.intf2.node.name)
+            if any(n[0] == 'h' or 'tether' in n for n in ends):
+                edge.append(sw.ports[intf])
+        sws.append({ 'name' : sw.name, 'dpid' : sw.dpid, 'leaf' : sw.name in leaves,
+                     'gw' : gws.get(sw.name), 'edge' : sorted(edge) })
+    hosts = []
+    for h in sorted(domain.getHosts(), key=lambda h: h.name):
+        intf = [ i for i in h.intfList() if i.name != 'lo' ][0]
+        peer = intf.link.intf1 if intf.link.intf2 == intf else intf.link.intf2
+        for mac, ip in endpointsOf(h):
+            hosts.append({ 'mac' : mac or intf.mac,
+                           'ip' : (ip or h.params.get('ip') or intf.ip or '').split('/')[0],
+                           'sw' : peer.node.name, 'port' : peer.node.ports[peer] })
+    return { 'did' : domain.getId(), 'macfmt' : domain.macFmt,
+             'switches' : sws, 'hosts' : hosts }
+
+def shardCfg(task):
+    """
+    the netcfg of a shard: (domain ID, MAC format, index of the first switch,
+    switches, hosts attached to them)
+    """
+    did, macfmt, first, sws, hosts = task
+    cfg = { 'devices' : {}, 'ports' : {}, 'hosts' : {} }
+    ids = {}
+    for n, sw in enumerate(sws, first + 1):
+        dev = devId(sw['dpid'])
+        ids[sw['name']] = dev
+        ip = sw['gw'] if sw['leaf'] and sw['gw'] else '192.168.%s.%s' % (did, n)
+        cfg['devices'][dev] = { 'segmentrouting' : {
+            'name' : sw['name'], 'nodeSid' : '%s0%s' % (did, n), 'routerIp' : ip,
+            'routerMac' : macfmt % (did, n),
+            'isEdgeRouter' : 'true' if sw['leaf'] else 'false', 'adjacencySids' : [] } }
+        if not sw['leaf']:
+            continue
+        for port in sw['edge']:
+            intf = { 'vlan' : '-1' }
+            if sw['gw']:
+                intf['ips'] = [ sw['gw'] + '/24' ]
+            cfg['ports']['%s/%s' % (dev, port)] = { 'interfaces' : [ intf ] }
+    for h in hosts:
+        cfg['hosts']['%s/-1' % h['mac']] = { 'basic' : {
+            'ips' : [ h['ip'] ], 'location' : '%s/%s' % (ids[h['sw']], h['port']) } }
+    return did, cfg
+
+def tasks(descs, shard):
+    """ shards of shard switches, carrying only their own part of the descriptions """
+    for desc in descs:
+        sws = desc['switches']
+        onto = {}
+        for h in desc['hosts']:
+            onto.setdefault(h['sw'], []).append(h)
+        for lo in range(0, max(len(sws), 1), shard):
+            part = sws[lo:lo + shard]
+            yield (desc['did'], desc['macfmt'], lo, part,
+                   sum((onto.get(sw['name'], []) for sw in part), []))
+
+def merge(parts):
+    """ map of domain ID to netcfg, from (domain ID, partial netcfg) pairs """
+    cfgs = {}
+    for did, part in parts:
+        cfg = cfgs.setdefault(did, { 'devices' : {}, 'ports' : {}, 'hosts' : {} })
+        for key, ents in part.items():
+            cfg[key].update(ents)
+    return cfgs
+
+def generate(descs, procs=None, shard=64):
+    """
+    map of domain ID to netcfg for descriptions descs.
+    procs : worker processes (default: one per core; 1: no pool)
+    shard : switches per unit of work
+    """
+    work = list(tasks(descs, shard))
+    if procs == 1:
+        return merge(map(shardCfg, work))
+    pool = Pool(procs)
+    try:
+        return merge(pool.map(shardCfg, work))
+    finally:
+        pool.close()
+        pool.join()
+
+def dump(cfg, fname):
+    with open(fname, 'w') as outfile:
+        json.dump(cfg, outfile, indent=4, sort_keys=True, separators=(',', ': '))
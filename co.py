@@ -10,6 +10,7 @@ from mininet.link import OVSIntf, Intf
 from mininet.util import quietRun
 from mininet.examples.vlanhost import VLANHost
 from domains import SegmentRoutedDomain
+from endpoints import EndpointHost, endpointsOf
 
 class CO(SegmentRoutedDomain):
 
@@ -17,9 +18,10 @@ class CO(SegmentRoutedDomain):
         SegmentRoutedDomain.__init__(self, did, self.toCfg, ovs)
         self.s2gw = {}
     
-    def build(self, n=2, m=2, f=2):
+    def build(self, n=2, m=2, f=2, endpoints=0):
         """
         bipartite graph, where n = spine; m = leaf; f = host fanout
+        endpoints : customer endpoints per leaf, sharing one namespace (see endpoints.py)
         """
         l_nsw=[]
         l_msw=[]
@@ -27,14 +29,19 @@ class CO(SegmentRoutedDomain):
 
         # create n spine switches.
         for sw in range(n):
-            l_nsw.append(self.addSwitch('spine%s%s' % (self.getId(), sw+1),
-                         cls=UserSwitch, dpopts='--no-local-port'))
+            l_nsw.append(self.addFabricSwitch('spine%s%s' % (self.getId(), sw+1), 'spine'))
 
         # create m leaf switches, add f hosts.
         for sw in range(m):
-            leaf = self.addSwitch('leaf%s0%s' % (self.getId(), sw+1),
-                                  cls=UserSwitch, dpopts='--no-local-port --no-slicing')
+            leaf = self.addFabricSwitch('leaf%s0%s' % (self.getId(), sw+1), 'leaf',
+                                        dpopts='--no-local-port --no-slicing')
             l_msw.append(self.noteLeaf(leaf))
+            if endpoints:
+                self.s2gw[leaf] = '10.%s.%s.254' % (self.getId(), sw+1)
+                host = self.addHost('h%s%se' % (self.getId(), sw+1), cls=EndpointHost,
+                                    subnet='10.%s.%s.0/24' % (self.getId(), sw+1),
+                                    count=endpoints, gateway=self.s2gw[leaf])
+                self.addLink(host, leaf)
             #uncomment to attach hosts onto leaf 
             #for h in range(f):
             #    self.s2gw[leaf] = '10.%s.%s.254' % (self.getId(), sw+1)
@@ -51,7 +58,7 @@ class CO(SegmentRoutedDomain):
 
         # add normal mode OVS + host to EE-side leaf
         ee = 'leaf%s01' % self.getId()
-        ovs = self.addSwitch('ovs%s000' % self.getId(), cls=OVSBridge)
+        ovs = self.addSwitch('ovs%s000' % self.getId(), tier='ee', cls=OVSBridge)
         self.addLink(ovs, ee)
         # if standalone VNF host is needed - uncomment next two lines
         # vnf = self.addHost('h%s004' % self.getId() )
@@ -88,7 +95,8 @@ class CO(SegmentRoutedDomain):
                                   '00:00:00:0%s:0%s:80' % (self.getId(), i))
             i = i+1
         for h in self.getHosts():
-            self.addHostCfg(h)
+            for mac, ip in endpointsOf(h):
+                self.addHostCfg(h, mac=mac, ip=ip)
 
 class IpHost(Host):
     def __init__(self, name, gateway, *args, **kwargs):
@@ -97,9 +105,9 @@ class IpHost(Host):
 
     def config(self, **kwargs):
         Host.config(self, **kwargs)
-        mtu = "ifconfig "+self.name+"-eth0 mtu 1490"
-        self.cmd(mtu)
-        self.cmd('ip route add default via %s' % self.gateway)
+        # one round trip to the shell. a link profile may change the MTU later.
+        self.cmd('ifconfig %s-eth0 mtu 1490; ip route add default via %s'
+                 % (self.name, self.gateway))
 
 def attachDev(net, sw, dev):
     switch = net.get(sw)
@@ -113,15 +121,17 @@ def attachDev(net, sw, dev):
     info("Interface %s is attached to switch %s.\n" % (dev, sw))
 
 def setup(argv):
-    ctls = sys.argv[1].split(',')
-    ifs = sys.argv[2].split(',') if len(sys.argv) > 1 else []
+    opts = dict(a[2:].partition('=')[::2] for a in argv[1:] if a.startswith('--'))
+    argv = [ a for a in argv if not a.startswith('--') ]
+    ctls = argv[1].split(',')
+    ifs = argv[2].split(',') if len(argv) > 2 else []
     co = CO(1)
     for i in range (len(ctls)):
         co.addController('c%s' % i, controller=RemoteController, ip=ctls[i])
 
     # make/setup Mininet object
     net = Mininet()
-    co.build()
+    co.build(endpoints=int(opts.get('endpoints') or 0))
     co.injectInto(net)
     #co.dumpCfg('co.json')
 
@@ -138,8 +148,10 @@ if __name__ == '__main__':
     setLogLevel('info')
     import sys
     if len(sys.argv) < 1:
-        print ('Usage: sudo -E ./co.py [ctrls] [interfaces]\n\n',
+        print ('Usage: sudo -E ./co.py [options] [ctrls] [interfaces]\n\n',
                '[ctrls] : a comma-separated list of controller IPs\n',
-               '[interfaces] : a comma-separated list of interfaces to the world (optional)')
+               '[interfaces] : a comma-separated list of interfaces to the world (optional)\n',
+               'options:\n',
+               '--endpoints=<n> : n customer endpoints per leaf, sharing one namespace')
     else:
         setup(sys.argv)
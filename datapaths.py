@@ -0,0 +1,327 @@
+"""
+Datapath backends for the switches of a Domain, and the commands used to
+program and inspect them regardless of the backend.
+
+- cpqd  : CpQD ofsoftswitch13 (UserSwitch), managed with dpctl over unix:/tmp/<switch>
+- ovs   : kernel Open vSwitch, managed with ovs-ofctl
+- ovs13 : kernel Open vSwitch limited to OpenFlow 1.3 pipelines
+
+Flows are described in a backend-neutral way, as dicts of the form
+    { 'table' : 0, 'priority' : 65000,
+      'match' : { 'in_port' : '1', 'vlan_vid' : '100' },
+      'actions' : [ 'output:4' ] }
+using the OXM match field names that dpctl understands.
+"""
+import os
+import re
+
+from mininet.node import UserSwitch, OVSSwitch
+from mininet.util import quietRun
+
+from bulk import run
+
+# backend name to (switch class, default switch parameters)
+BACKENDS = {
+    'cpqd'  : (UserSwitch, { 'dpopts' : '--no-local-port' }),
+    'ovs'   : (OVSSwitch, {}),
+    'ovs13' : (OVSSwitch, { 'protocols' : 'OpenFlow13' }),
+}
+
+# let ovs-ofctl negotiate with both plain and OpenFlow 1.3-only bridges
+OFCTL = 'ovs-ofctl -O OpenFlow10,OpenFlow13'
+
+# OXM match field names to their ovs-ofctl equivalents
+OVS_FIELDS = {
+    'vlan_vid' : 'dl_vlan',
+    'vlan_pcp' : 'dl_vlan_pcp',
+    'eth_type' : 'dl_type',
+    'eth_src' : 'dl_src',
+    'eth_dst' : 'dl_dst',
+}
+
+def isCpqd(sw):
+    """ is sw a CpQD switch? (everything else is taken to be OVS) """
+    return isinstance(sw, UserSwitch)
+
+def portDescCmd(sw):
+    """ command listing the port descriptions of sw """
+    if isCpqd(sw):
+        return 'dpctl unix:/tmp/%s port-desc' % sw.name
+    return '%s dump-ports-desc %s' % (OFCTL, sw.name)
+
+def flowModCmd(sw, flow, cmd='add'):
+    """
+    command adding (cmd='add') or deleting (cmd='del') a flow on sw.
+    flow : a flow dict, as described at the top of this file
+    """
+    match = flow.get('match', {})
+    acts = flow.get('actions', [])
+    prio = flow.get('priority')
+    if isCpqd(sw):
+        mod = 'table=%s,cmd=%s' % (flow.get('table', 0), cmd)
+        if prio is not None:
+            mod += ',prio=%s' % prio
+        fields = ','.join('%s=%s' % (k, match[k]) for k in sorted(match))
+        ins = 'apply:' + ','.join(a.replace(':', '=', 1) for a in acts) if acts else ''
+        return 'dpctl unix:/tmp/%s flow-mod %s %s %s' % (sw.name, mod, fields, ins)
+    spec = ['table=%s' % flow.get('table', 0)]
+    if prio is not None:
+        spec.append('priority=%s' % prio)
+    spec.extend('%s=%s' % (OVS_FIELDS.get(k, k), match[k]) for k in sorted(match))
+    if cmd == 'del':
+        return '%s del-flows %s %s' % (OFCTL, sw.name, ','.join(spec))
+    spec.append('actions=%s' % (','.join(acts) if acts else 'drop'))
+    return '%s add-flow %s %s' % (OFCTL, sw.name, ','.join(spec))
+
+def dumpFlowsCmd(sw):
+    """ command listing the flows of sw """
+    if isCpqd(sw):
+        return 'dpctl unix:/tmp/%s stats-flow' % sw.name
+    return '%s dump-flows %s' % (OFCTL, sw.name)
+
+def flowCount(sw):
+    """ the number of flows installed in sw """
+    return flowStats(sw)[0]
+
+def flowStats(sw):
+    """ (number of flows, packets, bytes) summed over the flows of sw """
+    out = quietRun(dumpFlowsCmd(sw), shell=True)
+    if isCpqd(sw):
+        pkts = re.findall(r'pkt_cnt="(\d+)"', out)
+        byts = re.findall(r'byte_cnt="(\d+)"', out)
+        return (len(re.findall(r'\{table="', out)),
+                sum(map(int, pkts)), sum(map(int, byts)))
+    flows = [ l for l in out.splitlines() if 'actions=' in l ]
+    pkts = re.findall(r'n_packets=(\d+)', out)
+    byts = re.findall(r'n_bytes=(\d+)', out)
+    return len(flows), sum(map(int, pkts)), sum(map(int, byts))
+
+# dpctl action printouts to canonical actions
+CPQD_ACTIONS = [
+    (re.compile(r'^out\{port="(\w+)"'), lambda m: 'output:%s' % m.group(1)),
+    (re.compile(r'^pop_vlan'), lambda m: 'pop_vlan'),
+    (re.compile(r'^push_vlan\{eth(?:ertype)?="(\w+)"'), lambda m: 'push_vlan:%s' % m.group(1)),
+    (re.compile(r'^group\{id="(\w+)"'), lambda m: 'group:%s' % m.group(1)),
+]
+
+# ovs-ofctl shorthand match fields
+OVS_PROTOS = { 'ip' : '0x0800', 'arp' : '0x0806', 'ipv6' : '0x86dd' }
+
+# flow fields ovs-ofctl prints that are not part of the flow itself
+OVS_STATS = ('cookie', 'duration', 'n_packets', 'n_bytes', 'idle_age', 'hard_age')
+
+def normValue(val):
+    """ match values as strings, with hexadecimal ones in one spelling """
+    val = val.strip().strip('"')
+    if val.startswith('0x') and '/' not in val:
+        try:
+            return '0x%04x' % int(val, 16)
+        except ValueError:
+            pass
+    return val
+
+def splitTop(text, sep=','):
+    """ split text at sep, except inside brackets """
+    parts, depth, cur = [], 0, ''
+    for c in text:
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        if c == sep and not depth:
+            parts.append(cur.strip())
+            cur = ''
+        else:
+            cur += c
+    if cur.strip():
+        parts.append(cur.strip())
+    return parts
+
+def parseCpqdFlows(out):
+    """
+    flow dicts from dpctl stats-flow output. actions, and instructions other
+    than apply-actions, that cannot be written back are kept as 'raw:<text>'.
+    """
+    flows = []
+    body = out[out.find('stat_repl'):]
+    for ent in re.split(r'(?:stats=\[|, )\{table="', body)[1:]:
+        match = re.search(r'match="oxm\{(.*?)\}"', ent)
+        prio = re.search(r'prio="(\d+)"', ent)
+        if not match or not prio:
+            continue
+        insts = ent[ent.find('insts=[') + 7:]
+        acts = []
+        for ins in re.findall(r'apply\{acts=\[(.*?)\]\}', insts):
+            for act in splitTop(ins):
+                for pat, canon in CPQD_ACTIONS:
+                    m = pat.match(act)
+                    if m:
+                        acts.append(canon(m))
+                        break
+                else:
+                    acts.append('raw:' + act)
+        rest = re.sub(r'apply\{acts=\[.*?\]\}', '', insts)
+        acts.extend('raw:' + i for i in re.findall(r'\w+\{[^}]*\}', rest))
+        flows.append({ 'table' : int(re.match(r'\d+', ent).group(0)),
+                       'priority' : int(prio.group(1)),
+                       'match' : dict((k, normValue(v)) for k, v in
+                                      re.findall(r'(\w+)="([^"]*)"', match.group(1))),
+                       'actions' : acts })
+    return flows
+
+def parseOvsFlows(out):
+    """ flow dicts from ovs-ofctl dump-flows output """
+    rev = dict((v, k) for k, v in OVS_FIELDS.items())
+    flows = []
+    for line in out.splitlines():
+        spec, sep, acts = line.strip().partition(' actions=')
+        if not sep:
+            continue
+        flow = { 'table' : 0, 'priority' : 32768, 'match' : {} }
+        for field in re.split(r',\s*', spec):
+            key, eq, val = field.partition('=')
+            key = key.strip()
+            if not key or key in OVS_STATS:
+                continue
+            if not eq:
+                if key in OVS_PROTOS:
+                    flow['match']['eth_type'] = OVS_PROTOS[key]
+                continue
+            if key in ('table', 'priority'):
+                flow[key] = int(val)
+            else:
+                flow['match'][rev.get(key, key)] = normValue(val)
+        acts = splitTop(acts)
+        flow['actions'] = [] if acts == ['drop'] else acts
+        flows.append(flow)
+    return flows
+
+def dumpFlows(sw):
+    """ the flows installed in sw, as flow dicts """
+    out = quietRun(dumpFlowsCmd(sw), shell=True)
+    return parseCpqdFlows(out) if isCpqd(sw) else parseOvsFlows(out)
+
+def portStatsCmd(sw):
+    """ command listing the port counters of sw """
+    if isCpqd(sw):
+        return 'dpctl unix:/tmp/%s stats-port' % sw.name
+    return '%s dump-ports %s' % (OFCTL, sw.name)
+
+# dpctl port counter names to the names used here
+CPQD_COUNTERS = {
+    'rx_pkt' : 'rx_pkts', 'tx_pkt' : 'tx_pkts',
+    'rx_bytes' : 'rx_bytes', 'tx_bytes' : 'tx_bytes',
+    'rx_drops' : 'rx_drops', 'tx_drops' : 'tx_drops',
+}
+
+OVS_PORT = re.compile(r'port\s+"?([^:"]+?)"?:\s+rx pkts=(\d+), bytes=(\d+), drop=(\d+)'
+                      r'.*?tx pkts=(\d+), bytes=(\d+), drop=(\d+)', re.S)
+
+def portStats(sw):
+    """
+    the counters of the ports of sw, as a map of port number to
+    { 'rx_pkts', 'tx_pkts', 'rx_bytes', 'tx_bytes', 'rx_drops', 'tx_drops' }
+    """
+    out = quietRun(portStatsCmd(sw), shell=True)
+    stats = {}
+    if isCpqd(sw):
+        for ent in re.findall(r'\{port="(\d+)"([^}]*)\}', out):
+            cnt = dict((CPQD_COUNTERS[k], int(v))
+                       for k, v in re.findall(r'(\w+)="(\d+)"', ent[1]) if k in CPQD_COUNTERS)
+            stats[ent[0]] = cnt
+        return stats
+    for port, rxp, rxb, rxd, txp, txb, txd in OVS_PORT.findall(out):
+        if port.strip() == 'LOCAL':
+            continue
+        stats[port.strip()] = { 'rx_pkts' : int(rxp), 'rx_bytes' : int(rxb), 'rx_drops' : int(rxd),
+                                'tx_pkts' : int(txp), 'tx_bytes' : int(txb), 'tx_drops' : int(txd) }
+    return stats
+
+def ofprotocolPid(sw):
+    """ the PID of the ofprotocol process of CpQD switch sw, if running """
+    sock = 'unix:/tmp/%s' % sw.name
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open('/proc/%s/cmdline' % pid) as f:
+                args = f.read().split('\0')
+        except IOError:
+            continue
+        if args and args[0].endswith('ofprotocol') and sock in args:
+            return int(pid)
+    return None
+
+def connected(sw):
+    """
+    is sw connected to a controller? CpQD switches are checked by looking for
+    an established TCP session owned by their ofprotocol, without forking.
+    """
+    if not isCpqd(sw):
+        return sw.connected()
+    pid = getattr(sw, 'ofpPid', None) or ofprotocolPid(sw)
+    if not pid:
+        return False
+    sw.ofpPid = pid
+    try:
+        socks = set()
+        for fd in os.listdir('/proc/%d/fd' % pid):
+            link = os.readlink('/proc/%d/fd/%s' % (pid, fd))
+            if link.startswith('socket:['):
+                socks.add(link[8:-1])
+        for tcp in ('tcp', 'tcp6'):
+            with open('/proc/%d/net/%s' % (pid, tcp)) as f:
+                for line in f.readlines()[1:]:
+                    cols = line.split()
+                    # state 01 is ESTABLISHED
+                    if cols[3] == '01' and cols[9] in socks:
+                        return True
+    except (IOError, OSError):
+        # ofprotocol exited: look it up again next time
+        sw.ofpPid = None
+    return False
+
+def portTo(net, node, peer):
+    """ the port number on switch node of its (first) link to peer """
+    link = net.linksBetween(node, peer)[0]
+    intf = link.intf1 if link.intf1.node == node else link.intf2
+    return node.ports[intf]
+
+def pathFlows(net, nodes, match={}, priority=None):
+    """
+    flows forwarding both ways along nodes, a list of Mininet nodes of the
+    form [ src, sw1, ..., swN, dst ]. returns a list of (switch, flow).
+    """
+    flows = []
+    for i in range(1, len(nodes) - 1):
+        prev, sw, nxt = nodes[i - 1], nodes[i], nodes[i + 1]
+        p1, p2 = portTo(net, sw, prev), portTo(net, sw, nxt)
+        for inp, outp in ((p1, p2), (p2, p1)):
+            m = dict(match, in_port=str(inp))
+            flow = { 'table' : 0, 'match' : m, 'actions' : [ 'output:%s' % outp ] }
+            if priority is not None:
+                flow['priority'] = priority
+            flows.append((sw, flow))
+    return flows
+
+def installFlows(flows, cmd='add'):
+    """ push a list of (switch, flow) to their switches. returns the errors """
+    errs = []
+    for sw, flow in flows:
+        # dpctl echoes what it sends, so only look for reported errors
+        out = quietRun(flowModCmd(sw, flow, cmd), shell=True)
+        if 'error' in out.lower():
+            errs.append('%s: %s' % (sw.name, out.strip()))
+    return errs
+
+def pushFlows(sw, flows, cmd='add'):
+    """
+    add (cmd='add') or delete (cmd='del') many flows on sw: with one
+    ovs-ofctl on OVS switches, one dpctl per flow on CpQD. returns the errors
+    """
+    if isCpqd(sw):
+        return installFlows([ (sw, f) for f in flows ], cmd)
+    # the flow spec is the last word of the flow-mod command
+    specs = [ flowModCmd(sw, f, cmd).rpartition(' ')[2] for f in flows ]
+    if cmd == 'del':
+        specs = [ 'delete_strict ' + s for s in specs ]
+    status, out = run(OFCTL.split() + [ 'add-flows', sw.name, '-' ], '\n'.join(specs) + '\n')
+    return [ '%s: %s' % (sw.name, out.strip()) ] if status else []
@@ -1,6 +1,19 @@
 import json
+import re
+from collections import OrderedDict
 from mininet.net import Mininet
 
+from datapaths import BACKENDS
+
+def switchDpid(name, dpid=None):
+    """ the DPID Mininet gives switch name: dpid, or else the first number in the name """
+    if not dpid:
+        nums = re.findall(r'\d+', name)
+        if not nums:
+            raise ValueError('no DPID given for %s, and none in its name' % name)
+        dpid = '%x' % int(nums[0])
+    return dpid.replace(':', '').rjust(16, '0')
+
 class Domain(object):
     """
     A container for switch, host, link, and controller information to be dumped
@@ -15,22 +28,63 @@ class Domain(object):
         self.__ctrls = {}
         self.__switches = {}
         self.__hosts = {}
-        self.__links = {}
+        # in the order added, which is the order injectInto() numbers ports in
+        self.__links = OrderedDict()
         # maps of devices, hosts, and controller names to actual objects
         self.__smap = {}
         self.__hmap = {}
         self.__cmap = {}
         self.__lmap = {}
+        # datapath backend per switch tier (None: any tier), and switch tiers
+        self.__backends = {}
+        self.__tiers = {}
+        # phase name to duration in seconds, e.g. time to connect to controllers
+        self.__timings = {}
+        # CPUs the processes of this domain may run on, and their CPU quota
+        self.__cores = None
+        self.__quota = None
+        # link profile for the interfaces of this domain (see links.py), and
+        # interfaces in the root namespace that belong to no node
+        self.__linkProfile = None
+        self.__intfs = []
 
     def addController(self, name, **args):
         self.__ctrls[name] = args if args else {}
         return name
 
     # Note: This method will return the name of the swich, not the switch object
-    def addSwitch(self, name, **args):
+    def addSwitch(self, name, tier=None, **args):
         self.__switches[name] = args if args else {}
+        if tier:
+            self.__tiers[name] = tier
         return name
 
+    def addFabricSwitch(self, name, tier, dpopts=None, **args):
+        """
+        add a switch implemented by the datapath backend chosen for its tier.
+        dpopts : ofdatapath options, replacing the backend's default (CpQD only)
+        """
+        cls, params = BACKENDS[self.getBackend(tier)]
+        opts = dict(params)
+        if dpopts and 'dpopts' in opts:
+            opts['dpopts'] = dpopts
+        opts.update(args)
+        return self.addSwitch(name, tier=tier, cls=cls, **opts)
+
+    def setBackend(self, backend, tier=None):
+        """ use backend for the fabric switches of a tier, or of all tiers """
+        if backend not in BACKENDS:
+            raise ValueError('unknown datapath backend %s (one of %s)'
+                             % (backend, ', '.join(sorted(BACKENDS))))
+        self.__backends[tier] = backend
+
+    def getBackend(self, tier=None):
+        return self.__backends.get(tier, self.__backends.get(None, 'cpqd'))
+
+    def getTier(self, name):
+        """ the tier ('spine', 'leaf', ...) a switch was added as, if any """
+        return self.__tiers.get(name)
+
     def addHost(self, name, **args):
         self.__hosts[name] = args if args else {}
         return name
@@ -42,6 +96,40 @@ class Domain(object):
     def getId( self):
         return int(self.__dId)
 
+    def noteTime(self, phase, secs):
+        """ record how long a phase of bringing up this domain took """
+        self.__timings[phase] = secs
+
+    def getTimings(self):
+        return self.__timings
+
+    def setPlacement(self, cores=None, quota=None):
+        """
+        confine the switches and hosts of this domain (see placement.py).
+        cores : list of CPU numbers to pin them to
+        quota : CPU time they may use together, in cores (e.g. 1.5)
+        """
+        self.__cores = cores
+        self.__quota = quota
+
+    def getPlacement(self):
+        return self.__cores, self.__quota
+
+    def setLinkProfile(self, profile):
+        """ profile : a name from links.LINK_PROFILES, or a dict like them """
+        self.__linkProfile = profile
+
+    def getLinkProfile(self):
+        return self.__linkProfile
+
+    def noteIntf(self, name):
+        """ note down an interface this domain created outside of any node """
+        self.__intfs.append(name)
+        return name
+
+    def getIntfs(self):
+        return self.__intfs
+
     def getControllers(self, name=None):
         return self.__cmap.values() if not name else self.__cmap.get(name)
 
@@ -51,6 +139,12 @@ class Domain(object):
     def getHosts(self, name=None):
         return self.__hmap.values() if not name else self.__hmap.get(name)
 
+    def getLinks(self, src=None, dst=None):
+        """ the Link objects of this domain, or the one between src and dst """
+        if not src:
+            return self.__lmap.values()
+        return self.__lmap.get((src, dst), self.__lmap.get((dst, src)))
+
     def injectInto(self, net):
         """ Adds available topology info to a supplied Mininet object. """
         # add switches, hosts, then links to mininet object
@@ -67,6 +161,31 @@ class Domain(object):
         for c, args in self.__ctrls.iteritems():
             self.__cmap[c] = net.addController(c, **args)
 
+    def layout(self):
+        """
+        switch name to (DPID, port numbers) as injectInto() would give them,
+        without making anything
+        """
+        ports = dict((sw, []) for sw in self.__switches)
+        # links get the next free port at either end, in the order added
+        for (src, dst), args in self.__links.iteritems():
+            for end, key in ((src, 'port1'), (dst, 'port2')):
+                if end in ports:
+                    ports[end].append(args.get(key) or max(ports[end] + [ 0 ]) + 1)
+        return dict((sw, (switchDpid(sw, args.get('dpid')), sorted(ports[sw])))
+                    for sw, args in self.__switches.iteritems())
+
+    def injectSwitch(self, net, name):
+        """ add a switch added to this domain after injectInto to a running net """
+        self.__smap[name] = net.addSwitch(name, **self.__switches[name])
+        return self.__smap[name]
+
+    def injectLink(self, net, link):
+        """ add a link (a (src, dst) from addLink) to a running net """
+        ends = [ self.__smap.get(n) or self.__hmap.get(n) for n in link ]
+        self.__lmap[link] = net.addLink(ends[0], ends[1], **self.__links[link])
+        return self.__lmap[link]
+
     def start(self):
         """ starts the switches with the correct controller. """
         map(lambda c: c.start(), self.__cmap.values())
@@ -82,6 +201,8 @@ class SegmentRoutedDomain(Domain):
     """
     # base for DPID string to format them in way network config likes them
     id_base='0000000000000000'
+    # router MAC of the n-th switch of domain did: macFmt % (did, n)
+    macFmt='00:00:00:%02x:%02x:80'
 
     def __init__(self, did, tocfg, ovs=True):
         """
@@ -110,7 +231,7 @@ class SegmentRoutedDomain(Domain):
         domains to the core.  name: the UserSwitch to connect the OVS to.
         """
         if self.useOvs and tname and tdpid:
-            self.__tether = self.addSwitch(tname, dpid=tdpid)
+            self.__tether = self.addSwitch(tname, tier='tether', dpid=tdpid)
             # Note: OVS port number '1' reserved for port facing the fabric
             self.addLink(tname, name, port1=1)
         else:
@@ -165,8 +286,12 @@ class SegmentRoutedDomain(Domain):
         cfg = { 'vlan' : vlan } if not ips else { 'ips' : ips, 'vlan' : vlan }
         self.__cfg['ports'][ifid]['interfaces'].append(cfg)
 
-    def addHostCfg(self, host, tag=-1):
-        """ add a host configuration given a Host object """
+    def addHostCfg(self, host, tag=-1, mac=None, ip=None):
+        """
+        add a host configuration given a Host object.
+        mac, ip : those of the host, if not those of its first interface,
+                  e.g. for each endpoint of an EndpointHost (see endpoints.py)
+        """
         # 4093 - starting VLAN tag value for L2 switching - segment routing convention
         # assume that first non-loopback interface is sufficient
         iface = filter(lambda i: i.name != 'lo', host.intfList())[0]
@@ -175,12 +300,20 @@ class SegmentRoutedDomain(Domain):
             locif = if1 if if1.node.name != host.name else if2
             did = self.__sw2id[locif.node]
             ent = { 'basic' : {} }
-            ent['basic']['ips'] = [host.params.get('ip').split('/')[0]]
+            ent['basic']['ips'] = [(ip or host.params.get('ip')).split('/')[0]]
             ent['basic']['location'] = '%s/%s' % (did, locif.node.ports[locif])
-            hid = '%s/%s' % (iface.mac, tag)
+            hid = '%s/%s' % (mac or iface.mac, tag)
             self.__cfg['hosts'][hid] = ent
             return hid
 
+    def getCfg(self):
+        """ the netcfg generated so far """
+        return self.__cfg
+
+    def setCfg(self, cfg):
+        """ use a netcfg generated elsewhere, e.g. by cfggen.py """
+        self.__cfg = cfg
+
     def dumpCfg(self, fname):
         self.toCfg()
         with open(fname, 'w') as outfile:
@@ -0,0 +1,101 @@
+"""
+Many customer endpoints in one network namespace.
+
+An EndpointHost is a single Mininet host, linked to a leaf, that carries
+count logical endpoints. Each is a macvlan interface of the link (or of a
+VLAN sub-interface of it) with its own MAC and IP, so to the fabric they
+look like count hosts on one leaf port, at the cost of one namespace, one
+shell and one veth pair. In the namespace:
+
+- each endpoint's traffic is routed out of its own interface, by a policy
+  routing rule on its source IP
+- ARP is only answered by the interface owning the address asked for
+
+All of it is set up with one 'ip -batch'. MACs are derived from the IPs,
+02:ee:<IP as four hex bytes>, so netcfg can be generated from the host.
+"""
+import socket
+import struct
+
+from mininet.node import Host
+
+from bulk import ipBatch
+
+# routing table of the first endpoint of a host
+TABLE_BASE = 1000
+
+def ip2int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+def int2ip(n):
+    return socket.inet_ntoa(struct.pack('!I', n))
+
+def network(subnet):
+    """ (first address, length) of subnet a.b.c.d/n, as integers """
+    ip, plen = subnet.split('/')
+    plen = int(plen)
+    return ip2int(ip) & (0xffffffff << (32 - plen) & 0xffffffff), plen
+
+def allocate(subnet, count, gateway):
+    """ count addresses in subnet (a.b.c.d/n), skipping the gateway and subnet/broadcast """
+    first, plen = network(subnet)
+    last = first + (1 << (32 - plen)) - 1
+    gw = ip2int(gateway)
+    ips = [ int2ip(n) for n in range(first + 1, min(last, first + count + 2)) if n != gw ][:count]
+    if len(ips) < count:
+        raise ValueError('%s has room for %d endpoints, not %d' % (subnet, len(ips), count))
+    return ips
+
+def endpointMAC(ip):
+    return '02:ee:%02x:%02x:%02x:%02x' % struct.unpack('!4B', socket.inet_aton(ip))
+
+class EndpointHost(Host):
+    """
+    count endpoints on subnet (a.b.c.d/n), routed through gateway.
+    vlan : put the endpoints on this VLAN of the link, instead of untagged
+    """
+
+    def __init__(self, name, gateway, subnet, count=1, vlan=None, *args, **kwargs):
+        super(EndpointHost, self).__init__(name, *args, **kwargs)
+        self.gateway = gateway
+        self.subnet = '%s/%d' % (int2ip(network(subnet)[0]), network(subnet)[1])
+        self.vlan = vlan
+        # (MAC, IP) of each endpoint, in order of their interfaces ep<n>
+        self.endpoints = [ (endpointMAC(ip), ip) for ip in allocate(subnet, count, gateway) ]
+
+    def config(self, **params):
+        r = super(EndpointHost, self).config(**params)
+        self.cmd('sysctl -qw net.ipv4.conf.all.arp_ignore=1 net.ipv4.conf.all.arp_announce=2'
+                 ' net.ipv4.conf.all.rp_filter=0 net.ipv4.conf.default.rp_filter=0')
+        status, out = ipBatch(self.endpointCmds(), self.pid)
+        if status:
+            raise Exception('%s: could not set up endpoints: %s' % (self.name, out.strip()))
+        return r
+
+    def endpointCmds(self):
+        """ the ip batch lines setting up the endpoints """
+        intf = self.defaultIntf().name
+        lines = [ 'addr flush dev %s' % intf ]
+        parent = intf
+        if self.vlan:
+            parent = '%s.%d' % (intf, self.vlan)
+            lines += [ 'link add link %s name %s type vlan id %d' % (intf, parent, self.vlan),
+                       'link set %s up' % parent ]
+        plen = self.subnet.split('/')[1]
+        for n, (mac, ip) in enumerate(self.endpoints):
+            ep, table = 'ep%d' % n, TABLE_BASE + n
+            lines += [ 'link add link %s name %s address %s type macvlan mode bridge' % (parent, ep, mac),
+                       'addr add %s/%s dev %s' % (ip, plen, ep),
+                       'link set %s up' % ep,
+                       'rule add from %s table %d' % (ip, table),
+                       'route add %s dev %s src %s table %d' % (self.subnet, ep, ip, table),
+                       'route add default via %s dev %s table %d' % (self.gateway, ep, table) ]
+        if self.endpoints:
+            lines.append('route replace default via %s dev ep0' % self.gateway)
+        return lines
+
+def endpointsOf(host):
+    """ (MAC, IP) of each endpoint of host, or of host itself if it is a plain host """
+    if hasattr(host, 'endpoints'):
+        return host.endpoints
+    return [ (None, None) ]
@@ -0,0 +1,163 @@
+"""
+Timed failure scenarios against the links and switches of Domains, with a
+probe stream (probe.py) running between two hosts to measure, for each
+event, how long traffic was lost and when it came back.
+
+A scenario is a text file, one event per line, at an offset in seconds from
+the start of the probe stream, and a 'probe' line naming the hosts:
+
+    probe h111 h211 10.0.100.2 1000    # src, dst, dst IP, probes per second
+    2   down  leaf101 spine11          # link between two nodes of a domain
+    5   up    leaf101 spine11
+    8   stop  spine12                  # switch, keeping its interfaces
+    12  start spine12                  # switch, back to its domain's controllers
+
+Each gap the receiver sees is matched to the last event at or before it
+began (the first probe it lost). An event's outage is the full length of its
+gap(s); its recovery time is from the event to the end of its last gap.
+Events without a gap lost nothing.
+"""
+import os
+import sys
+import time
+
+from mininet.log import info, warn, error
+
+PROBE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'probe.py')
+PROBE_PORT = 5999
+ACTIONS = ('down', 'up', 'stop', 'start')
+
+def parse(fname):
+    """ (probe args, [ (offset, action, args) ]) from a scenario file """
+    probe, events = None, []
+    with open(fname) as f:
+        for n, line in enumerate(f, 1):
+            args = line.split('#')[0].split()
+            if not args:
+                continue
+            if args[0] == 'probe':
+                probe = args[1:]
+                continue
+            if len(args) < 2 or args[1] not in ACTIONS:
+                raise ValueError('%s:%d: expected <offset> %s <node> [<node>]'
+                                 % (fname, n, '|'.join(ACTIONS)))
+            # a link is between two nodes, a switch is one
+            want = 2 if args[1] in ('down', 'up') else 1
+            if len(args) != 2 + want:
+                raise ValueError('%s:%d: %s takes %d node name(s)' % (fname, n, args[1], want))
+            try:
+                offset = float(args[0])
+            except ValueError:
+                raise ValueError('%s:%d: bad offset %s' % (fname, n, args[0]))
+            events.append((offset, args[1], args[2:]))
+    if not probe or len(probe) < 3:
+        raise ValueError('%s: needs a line "probe <src> <dst> <ip> [<pps>]"' % fname)
+    return probe, sorted(events)
+
+class Scenario(object):
+    """
+    runs the events of a scenario file against domains.
+    """
+
+    def __init__(self, domains, fname):
+        self.domains = domains
+        self.probe, self.events = parse(fname)
+        # one dict per event that was run, see run()
+        self.results = []
+
+    def node(self, name, kind='Hosts'):
+        for d in self.domains:
+            n = getattr(d, 'get' + kind)(name)
+            if n:
+                return d, n
+        raise ValueError('no domain has %s' % name)
+
+    def link(self, src, dst):
+        for d in self.domains:
+            l = d.getLinks(src, dst)
+            if l:
+                return l
+        raise ValueError('no domain has a link %s-%s' % (src, dst))
+
+    def check(self):
+        """ resolve every name before anything is done """
+        self.node(self.probe[0])
+        self.node(self.probe[1])
+        for _, action, args in self.events:
+            if action in ('down', 'up'):
+                self.link(*args[:2])
+            else:
+                self.node(args[0], 'Switches')
+
+    def do(self, action, args):
+        if action in ('down', 'up'):
+            l = self.link(*args[:2])
+            l.intf1.ifconfig(action)
+            l.intf2.ifconfig(action)
+        elif action == 'stop':
+            self.node(args[0], 'Switches')[1].stop(deleteIntfs=False)
+        else:
+            d, sw = self.node(args[0], 'Switches')
+            sw.start(d.getControllers())
+
+    def run(self):
+        """ run the scenario, and return the per-event results """
+        self.check()
+        src = self.node(self.probe[0])[1]
+        dst = self.node(self.probe[1])[1]
+        ip = self.probe[2]
+        pps = float(self.probe[3]) if len(self.probe) > 3 else 1000.0
+        length = (self.events[-1][0] if self.events else 0) + 5
+        info('*** Scenario: %d events over %ds, probing %s -> %s at %d pps\n'
+             % (len(self.events), length, src.name, dst.name, pps))
+        recv = dst.popen([ sys.executable, PROBE, 'recv', str(PROBE_PORT),
+                           str(length + 2), str(pps) ])
+        time.sleep(0.5)
+        send = src.popen([ sys.executable, PROBE, 'send', ip, str(PROBE_PORT),
+                           str(pps), str(length) ])
+        start = time.time()
+        done = []
+        for offset, action, args in self.events:
+            delay = start + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            t = time.time()
+            self.do(action, args)
+            info('*** %6.2fs %s %s\n' % (t - start, action, ' '.join(args)))
+            done.append((t, action, args))
+        send.wait()
+        out, _ = recv.communicate()
+        self.results = self.match(done, out, start)
+        return self.results
+
+    def match(self, done, out, start):
+        gaps, total = [], None
+        for line in out.decode().splitlines():
+            f = line.split()
+            if f and f[0] == 'gap':
+                gaps.append((float(f[1]), float(f[2]), int(f[3])))
+            elif f and f[0] == 'total':
+                total = (int(f[1]), int(f[2]))
+        if total is None:
+            error('*** Scenario: no results from the probe receiver\n')
+        elif not total[0]:
+            warn('*** Scenario: no probes received, is %s reachable?\n' % self.probe[2])
+        # a gap begins with the first probe lost, one interval after the last received
+        interval = 1.0 / (float(self.probe[3]) if len(self.probe) > 3 else 1000.0)
+        results = []
+        for i, (t, action, args) in enumerate(done):
+            until = done[i + 1][0] if i + 1 < len(done) else float('inf')
+            mine = [ g for g in gaps if t <= g[0] + interval < until ]
+            results.append({ 'at' : t - start, 'action' : action, 'target' : '-'.join(args),
+                             'outage' : sum(g[1] - g[0] for g in mine),
+                             'recovery' : max(g[1] for g in mine) - t if mine else 0.0,
+                             'lost' : sum(g[2] for g in mine) })
+        return results
+
+    def report(self):
+        info('*** Failure scenario results:\n')
+        info('\t%8s %-6s %-20s %10s %10s %8s\n'
+             % ('at', 'action', 'target', 'outage', 'recovery', 'lost'))
+        for r in self.results:
+            info('\t%7.2fs %-6s %-20s %9.3fs %9.3fs %8d\n'
+                 % (r['at'], r['action'], r['target'], r['outage'], r['recovery'], r['lost']))
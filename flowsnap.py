@@ -0,0 +1,112 @@
+"""
+Snapshots of the flow tables of every switch of a set of Domains, to restore
+a programmed lab after a restart.
+
+A snapshot is gzipped JSON of flow dicts (see datapaths.py), per domain and
+switch:
+
+    { "taken" : <time>, "domains" : { "<domain ID>" : { "<switch>" : [ flows ] } } }
+
+Tables are read and restored in parallel, one thread per switch. Flows are
+pushed with one 'ovs-ofctl add-flows' per OVS switch, and one dpctl per flow
+on CpQD switches. A flow is identified by its table, priority and match, so
+a diff tells flows missing from a switch, flows it has in excess, and flows
+whose actions differ.
+"""
+import gzip
+import json
+import time
+from multiprocessing.pool import ThreadPool
+
+from mininet.log import info, warn
+
+from datapaths import dumpFlows, pushFlows
+
+def snapshot(domains, threads=16):
+    """ the flows of every switch of domains """
+    sws = [ (d, sw) for d in domains for sw in d.getSwitches() ]
+    pool = ThreadPool(threads)
+    flows = pool.map(lambda ds: dumpFlows(ds[1]), sws)
+    pool.close()
+    snap = { 'taken' : time.time(), 'domains' : {} }
+    for (d, sw), fl in zip(sws, flows):
+        snap['domains'].setdefault(str(d.getId()), {})[sw.name] = fl
+    return snap
+
+def save(snap, fname):
+    with gzip.open(fname, 'wb') as f:
+        f.write(json.dumps(snap, sort_keys=True, separators=(',', ':')).encode())
+
+def load(fname):
+    with gzip.open(fname, 'rb') as f:
+        return json.loads(f.read().decode())
+
+def flowKey(flow):
+    return (int(flow.get('table', 0)), flow.get('priority'),
+            tuple(sorted(flow.get('match', {}).items())))
+
+def diffFlows(want, have):
+    """ (missing, extra, changed) flows of a switch that should have want, and has have """
+    wmap = dict((flowKey(f), f) for f in want)
+    hmap = dict((flowKey(f), f) for f in have)
+    missing = [ f for k, f in wmap.items() if k not in hmap ]
+    extra = [ f for k, f in hmap.items() if k not in wmap ]
+    changed = [ f for k, f in wmap.items()
+                if k in hmap and f.get('actions', []) != hmap[k].get('actions', []) ]
+    return missing, extra, changed
+
+def switchesOf(domains, snap):
+    """ (domain ID, switch, snapshot flows) for the switches of snap that domains have """
+    sws = []
+    for d in domains:
+        for name, flows in snap['domains'].get(str(d.getId()), {}).items():
+            sw = d.getSwitches(name)
+            if sw:
+                sws.append((d.getId(), sw, flows))
+            else:
+                warn('*** flowsnap: domain %s has no switch %s\n' % (d.getId(), name))
+    return sws
+
+def diff(domains, snap, threads=16):
+    """ map of (domain ID, switch name) to (missing, extra, changed) against live tables """
+    sws = switchesOf(domains, snap)
+    pool = ThreadPool(threads)
+    live = pool.map(lambda s: dumpFlows(s[1]), sws)
+    pool.close()
+    return dict(((did, sw.name), diffFlows(flows, have))
+                for (did, sw, flows), have in zip(sws, live))
+
+def replay(domains, snap, threads=16):
+    """
+    add the flows of snap that are missing or changed on the switches of
+    domains. returns the errors.
+    """
+    todo = []
+    for (did, name), (missing, extra, changed) in diff(domains, snap, threads).items():
+        flows = [ f for f in missing + changed
+                  if not any(a.startswith('raw:') for a in f.get('actions', [])) ]
+        if len(flows) < len(missing) + len(changed):
+            warn('*** flowsnap: %s: skipping %d flows with actions that cannot be written back\n'
+                 % (name, len(missing) + len(changed) - len(flows)))
+        if flows:
+            todo.append((next(d for d in domains if d.getId() == did).getSwitches(name), flows))
+    start = time.time()
+    pool = ThreadPool(threads)
+    errs = sum(pool.map(lambda sf: pushFlows(*sf), todo), [])
+    pool.close()
+    info('*** flowsnap: restored %d flows on %d switches in %.2fs\n'
+         % (sum(len(f) for _, f in todo), len(todo), time.time() - start))
+    return errs
+
+def report(diffs):
+    info('*** Flow tables against snapshot:\n')
+    info('\t%-8s %-12s %8s %8s %8s\n' % ('domain', 'switch', 'missing', 'extra', 'changed'))
+    for (did, name), (missing, extra, changed) in sorted(diffs.items()):
+        info('\t%-8s %-12s %8d %8d %8d\n' % (did, name, len(missing), len(extra), len(changed)))
+
+def restore(domains, fname, threads=16):
+    """ replay the snapshot in fname, and report how the tables compare after """
+    snap = load(fname)
+    for e in replay(domains, snap, threads):
+        warn('*** flowsnap: %s\n' % e)
+    report(diff(domains, snap, threads))
@@ -0,0 +1,77 @@
+"""
+Link profiles: MTU, offloads and transmit queue length for every interface
+of a Domain - host and switch veths, and interfaces noted with noteIntf()
+such as the cross-connects of twoCOs.py.
+
+A profile is applied in bulk: per network namespace, one 'ip -batch' for
+MTU and txqueuelen, and one shell running ethtool for all the interfaces.
+"""
+from mininet.log import info, error
+
+from bulk import ipBatch, run
+
+LINK_PROFILES = {
+    # leave interfaces as Mininet makes them
+    'default' : {},
+    # jumbo frames, with segmentation/receive offloads and long queues
+    'jumbo' : { 'mtu' : 9000, 'txqueuelen' : 10000,
+                'offload' : { 'tso' : 'on', 'gso' : 'on', 'gro' : 'on' } },
+    # standard frames, with offloads and long queues
+    'offload' : { 'mtu' : 1500, 'txqueuelen' : 10000,
+                  'offload' : { 'tso' : 'on', 'gso' : 'on', 'gro' : 'on' } },
+    # standard frames, every packet through the stack on its own
+    'nooffload' : { 'mtu' : 1500, 'txqueuelen' : 1000,
+                    'offload' : { 'tso' : 'off', 'gso' : 'off', 'gro' : 'off' } },
+}
+
+def profileOf(domain):
+    p = domain.getLinkProfile()
+    return LINK_PROFILES[p] if isinstance(p, str) else p
+
+def domainIntfs(domain):
+    """ map of namespace (a node's pid, None for root) to the domain's interfaces """
+    intfs = {}
+    for node in list(domain.getSwitches()) + list(domain.getHosts()):
+        ns = node.pid if node.inNamespace else None
+        for intf in node.intfList():
+            if intf.name != 'lo':
+                intfs.setdefault(ns, []).append(intf.name)
+    intfs.setdefault(None, []).extend(domain.getIntfs())
+    return intfs
+
+def profileCmds(names, profile):
+    """ (ip batch lines, ethtool shell script) applying profile to names """
+    # VLAN sub-interfaces last, as their MTU is bounded by their parent's
+    names = sorted(set(names), key=lambda n: ('.' in n, n))
+    settings = ''
+    if 'mtu' in profile:
+        settings += ' mtu %d' % profile['mtu']
+    if 'txqueuelen' in profile:
+        settings += ' txqueuelen %d' % profile['txqueuelen']
+    lines = [ 'link set %s%s' % (n, settings) for n in names ] if settings else []
+    script = None
+    if profile.get('offload'):
+        flags = ' '.join('%s %s' % kv for kv in sorted(profile['offload'].items()))
+        # sub-interfaces follow the offloads of their parent
+        script = 'for i in %s; do ethtool -K $i %s 2>/dev/null; done' % (
+            ' '.join(n for n in names if '.' not in n), flags)
+    return lines, script
+
+def applyProfiles(domains):
+    """ apply the link profile of each domain that has one """
+    for d in domains:
+        profile = profileOf(d)
+        if not profile:
+            continue
+        nss = domainIntfs(d)
+        name = d.getLinkProfile() if isinstance(d.getLinkProfile(), str) else 'custom'
+        info('*** Domain %s: applying link profile %s to %d interfaces in %d namespaces\n'
+             % (d.getId(), name, sum(map(len, nss.values())), len(nss)))
+        for ns, names in nss.items():
+            lines, script = profileCmds(names, profile)
+            status, out = ipBatch(lines, ns)
+            if status:
+                error('*** link profile: %s\n' % out.strip())
+            if script:
+                args = [ 'sh', '-c', script ]
+                run([ 'mnexec', '-a', str(ns) ] + args if ns else args)
@@ -0,0 +1,191 @@
+"""
+Metrics of a running lab in the Prometheus text format, served over HTTP at
+/metrics or written to a file for node_exporter's textfile collector.
+
+The page is rebuilt every interval seconds in a thread, from the Domains
+and from whichever monitors are attached (a StatsCollector, VlanAccounting,
+Profiler or failure Scenario). Scrapes only return the last page built, so
+they cost the same however large the topology is.
+
+    lab_switches{domain="1"} 4
+    lab_switches_connected{domain="1"} 4
+    lab_phase_seconds{domain="1",phase="connected"} 2.31
+    lab_port_rx_bps{domain="1",switch="leaf101",port="1"} 1.2e+06
+    lab_failure_outage_seconds{event="0",action="down",target="leaf101-spine11"} 0.52
+"""
+import os
+import threading
+import time
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from mininet.log import info, error
+
+from datapaths import connected
+
+# metric name to (type, help)
+METRICS = {
+    'lab_switches' : ('gauge', 'switches in the domain'),
+    'lab_hosts' : ('gauge', 'hosts in the domain'),
+    'lab_links' : ('gauge', 'links in the domain'),
+    'lab_switches_connected' : ('gauge', 'switches connected to a controller'),
+    'lab_phase_seconds' : ('gauge', 'duration of a bring-up phase'),
+    'lab_port_rx_bps' : ('gauge', 'switch port receive rate, bits/s'),
+    'lab_port_tx_bps' : ('gauge', 'switch port transmit rate, bits/s'),
+    'lab_port_rx_pps' : ('gauge', 'switch port receive rate, packets/s'),
+    'lab_port_tx_pps' : ('gauge', 'switch port transmit rate, packets/s'),
+    'lab_vlan_rx_bps' : ('gauge', 'VLAN receive rate, bits/s'),
+    'lab_vlan_tx_bps' : ('gauge', 'VLAN transmit rate, bits/s'),
+    'lab_cpu_percent' : ('gauge', 'CPU use of node processes'),
+    'lab_rss_bytes' : ('gauge', 'resident memory of node processes'),
+    'lab_fds' : ('gauge', 'open file descriptors of node processes'),
+    'lab_failure_outage_seconds' : ('gauge', 'traffic lost after a failure event'),
+    'lab_failure_recovery_seconds' : ('gauge', 'time from a failure event to traffic flowing'),
+    'lab_failure_lost_probes' : ('gauge', 'probes lost after a failure event'),
+    'lab_metrics_build_seconds' : ('gauge', 'time taken to build this page'),
+}
+
+def label(val):
+    return str(val).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def sample(name, labels, val):
+    """ one line of the exposition format. None (e.g. a phase that timed out) is NaN """
+    lbl = ','.join('%s="%s"' % (k, label(labels[k])) for k in sorted(labels))
+    return '%s%s %s\n' % (name, '{%s}' % lbl if lbl else '',
+                           'NaN' if val is None else repr(float(val)))
+
+class Metrics(object):
+    """
+    builds the metrics page of domains every interval seconds.
+    stats, acct, prof, scenario : monitors to take figures from, if any.
+    They may be attached at any time.
+    """
+
+    def __init__(self, domains, interval=5.0, stats=None, acct=None, prof=None, scenario=None):
+        self.domains = domains
+        self.interval = interval
+        self.stats = stats
+        self.acct = acct
+        self.prof = prof
+        self.scenario = scenario
+        self.page = ''
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__server = None
+
+    def collect(self):
+        """ map of metric name to [ (labels, value) ] """
+        m = dict((name, []) for name in METRICS)
+        for d in self.domains:
+            dom = { 'domain' : d.getId() }
+            sws = list(d.getSwitches())
+            m['lab_switches'].append((dom, len(sws)))
+            m['lab_hosts'].append((dom, len(d.getHosts())))
+            m['lab_links'].append((dom, len(d.getLinks())))
+            m['lab_switches_connected'].append((dom, sum(1 for sw in sws if connected(sw))))
+            for phase, secs in d.getTimings().items():
+                m['lab_phase_seconds'].append((dict(dom, phase=phase), secs))
+        if self.stats:
+            for (did, sw, port), r in list(self.stats.rates.items()):
+                lbl = { 'domain' : did, 'switch' : sw, 'port' : port }
+                for f in ('rx_bps', 'tx_bps', 'rx_pps', 'tx_pps'):
+                    m['lab_port_' + f].append((lbl, r[f]))
+        if self.acct:
+            for (did, vid, side), r in list(self.acct.rates.items()):
+                lbl = { 'domain' : did, 'vlan' : vid, 'side' : side }
+                m['lab_vlan_rx_bps'].append((lbl, r['rx_bps']))
+                m['lab_vlan_tx_bps'].append((lbl, r['tx_bps']))
+        if self.prof:
+            for (did, tier), (pct, rss, fds) in self.prof.summary(lambda did, tier: (did, tier)).items():
+                lbl = { 'domain' : did, 'tier' : tier or 'none' }
+                m['lab_cpu_percent'].append((lbl, pct))
+                m['lab_rss_bytes'].append((lbl, rss))
+                m['lab_fds'].append((lbl, fds))
+        if self.scenario:
+            for i, r in enumerate(self.scenario.results):
+                lbl = { 'event' : i, 'action' : r['action'], 'target' : r['target'] }
+                m['lab_failure_outage_seconds'].append((lbl, r['outage']))
+                m['lab_failure_recovery_seconds'].append((lbl, r['recovery']))
+                m['lab_failure_lost_probes'].append((lbl, r['lost']))
+        return m
+
+    def build(self):
+        """ rebuild the page """
+        start = time.time()
+        lines = []
+        m = self.collect()
+        m['lab_metrics_build_seconds'].append(({}, time.time() - start))
+        for name in sorted(m):
+            if not m[name]:
+                continue
+            kind, hlp = METRICS[name]
+            lines.append('# HELP %s %s\n# TYPE %s %s\n' % (name, hlp, name, kind))
+            lines.extend(sample(name, lbl, val) for lbl, val in m[name])
+        self.page = ''.join(lines)
+        return self.page
+
+    def write(self, fname):
+        """ write the page to fname, atomically, for a textfile collector """
+        tmp = '%s.%d' % (fname, os.getpid())
+        with open(tmp, 'w') as outfile:
+            outfile.write(self.page)
+        os.rename(tmp, fname)
+
+    def run(self, fname):
+        while not self.__stop.is_set():
+            start = time.time()
+            try:
+                self.build()
+                if fname:
+                    self.write(fname)
+            except Exception as e:
+                # e.g. a switch stopped half way through: try again next time
+                error('*** metrics: %s\n' % e)
+            self.__stop.wait(max(0, self.interval - (time.time() - start)))
+
+    def serve(self, port, addr='127.0.0.1'):
+        """ serve the page at http://addr:port/metrics """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.page.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.__server = HTTPServer((addr, port), Handler)
+        t = threading.Thread(target=self.__server.serve_forever)
+        t.daemon = True
+        t.start()
+        info('*** metrics: serving on http://%s:%d/metrics\n' % (addr, port))
+
+    def start(self, port=None, fname=None):
+        """ start rebuilding the page, serving it on port and/or writing it to fname """
+        self.build()
+        if port:
+            self.serve(port)
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.run, args=(fname,))
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread:
+            self.__thread.join()
+        if self.__server:
+            self.__server.shutdown()
+            self.__server.server_close()
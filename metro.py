@@ -10,6 +10,11 @@ from mininet.link import OVSIntf
 from mininet.util import quietRun
 
 from domains import Domain, SegmentRoutedDomain
+from readiness import waitReady, report, logConvergence
+from validate import check
+from cfggen import describe, generate, dump
+from bringup import BringUp
+from services import Planner, parse
 from opticalUtils import LINCSwitch, LINCLink
 
 class OpticalDomain(Domain):
@@ -17,7 +22,7 @@ class OpticalDomain(Domain):
     def build(self):
         for i in range (1,4):
             oean = { "optical.regens": 0 }
-            self.addSwitch('OE%s' % i, dpid='0000ffffffffff0%s' % i, annotations=oean, cls=LINCSwitch)
+            self.addSwitch('OE%s' % i, tier='oe', dpid='0000ffffffffff0%s' % i, annotations=oean, cls=LINCSwitch)
 
         # ROADM port number OE"1" -> OE'2' = "1"'2'00
         # leaving port number up to 100 open for use by Och port
@@ -33,6 +38,9 @@ class FabricDomain(SegmentRoutedDomain):
     Each FabricDomain should be given a unique Domain ID (did) to ensure unique
     names and addressing.
     """
+    # router MACs, with single-digit domain IDs and switch indexes
+    macFmt='00:00:00:0%s:0%s:80'
+
     def __init__(self, did, ovs=True):
         SegmentRoutedDomain.__init__(self, did, self.toCfg, ovs)
         # hosts to gateway, for generating configs (see toCfg()).
@@ -47,19 +55,17 @@ class FabricDomain(SegmentRoutedDomain):
 
         # create n spine switches.
         for sw in range(n):
-            l_nsw.append(self.addSwitch('spine%s%s' % (self.getId(), sw+1),
-                         cls=UserSwitch, dpopts='--no-local-port'))
+            l_nsw.append(self.addFabricSwitch('spine%s%s' % (self.getId(), sw+1), 'spine'))
 
         # create connection point to optical core (a leaf switch)
-        tsw = self.addSwitch('leaf%s01' % self.getId(), cls=UserSwitch, dpopts='--no-local-port')
+        tsw = self.addFabricSwitch('leaf%s01' % self.getId(), 'leaf')
         self.addTether(tsw, 'tether%s' % self.getId(), '0000ffffffff000%s' % self.getId())
         self.s2gw[tsw] = '10.%s.1.254' % self.getId()
         l_msw.append(tsw)
 
         # attach f hosts to last m-1 leaves, and record IP blocks used
         for sw in range(1, m):
-            msw = self.addSwitch('leaf%s0%s' % (self.getId(), sw+1),
-                                 cls=UserSwitch, dpopts='--no-local-port')
+            msw = self.addFabricSwitch('leaf%s0%s' % (self.getId(), sw+1), 'leaf')
             self.noteLeaf(msw)
             l_msw.append(msw)
             for h in range(f):
@@ -79,7 +85,7 @@ class FabricDomain(SegmentRoutedDomain):
         for sw in self.getSwitches():
             if sw.name in self.getLeaves():
                 swid = self.addSwitchCfg(sw, '%s0%s' % (self.getId(), i), self.s2gw[sw.name],
-                                         '00:00:00:0%s:0%s:80' % (self.getId(), i))
+                                         self.macFmt % (self.getId(), i))
                 # check for non-loopback ports facing a host with name of form 'h.*'.
                 for iface in filter(lambda el: el.name != 'lo', sw.intfList()):
                     ep1, ep2 = iface.link.intf1.node, iface.link.intf2.node
@@ -91,7 +97,7 @@ class FabricDomain(SegmentRoutedDomain):
             else:
                 self.addSwitchCfg(sw, '%s0%s' % (self.getId(), i),
                                   '192.168.%s.%s' % (self.getId(), i),
-                                  '00:00:00:0%s:0%s:80' % (self.getId(), i))
+                                  self.macFmt % (self.getId(), i))
             i = i + 1
         for h in self.getHosts():
             self.addHostCfg(h)
@@ -103,13 +109,65 @@ class IpHost(Host):
 
     def config(self, **kwargs):
         Host.config(self, **kwargs)
-        mtu = "ifconfig "+self.name+"-eth0 mtu 1490"
-        self.cmd(mtu)
-        self.cmd('ip route add default via %s' % self.gateway)
+        # one round trip to the shell. a link profile may change the MTU later.
+        self.cmd('ifconfig %s-eth0 mtu 1490; ip route add default via %s'
+                 % (self.name, self.gateway))
+
+def genCfgs(domains, descs):
+    """ generate segment routing cfgs """
+    info('*** Generating routing configuration files for COs:\n')
+    cfgs = generate(descs)
+    for i in range (1,len(domains)):
+        info('\tCO%s: domain%s-cfgv2.json\n' % (i, i))
+        domains[i].setCfg(cfgs[domains[i].getId()])
+        dump(cfgs[domains[i].getId()], 'domain%s-cfgv2.json' % i)
+
+def crossConnect(net, domains, domainCfgs):
+    """ connect COs to core - sort of hard-wired at this moment """
+    d0 = domains[0]
+    for i in range(1,len(domains)):
+        # add 10 cross-connect links between domains
+        xcPortNo=2
+        ochPortNo=10
+        for j in range(0, 10):
+            an = { "bandwidth": 10, "durable": "true" }
+            net.addLink(domains[i].getTether(), d0.getSwitches('OE%s' % i),
+                        port1=xcPortNo+j, port2=ochPortNo+j, speed=10000, annotations=an, cls=LINCLink)
+            xcId = 'of:' + domains[i].getSwitches(name=domains[i].getTether()).dpid + '/' + str(xcPortNo+j)
+            ochId = 'of:' + d0.getSwitches('OE%s' % i).dpid + '/' + str(ochPortNo+j)
+            domainCfgs[i]['ports'][xcId] = {'cross-connect': {'remote': ochId}}
+
+def bootOE(net, d0):
+    # create a minimal copy of the network for configuring LINC.
+    cfgnet = Mininet()
+    cfgnet.switches = net.switches
+    cfgnet.links = net.links
+    cfgnet.controllers = d0.getControllers()
+    LINCSwitch.bootOE(cfgnet, d0.getSwitches())
+
+def pushCfg(domain, i, cfg, ok):
+    """ send netcfg json to a CO-ONOS """
+    filename = 'Topology%d.json' % i
+    with open(filename, 'w') as outfile:
+        json.dump(cfg, outfile, indent=4, separators=(',', ': '))
+    if not ok:
+        warn('***WARNING: Not pushing invalid %s to CO-ONOS %d\n' % (filename, i))
+        return
+    info('*** Pushing Topology.json to CO-ONOS %d\n' % i)
+
+    output = quietRun('%s/tools/test/bin/onos-netcfg %s %s &'\
+                       % (LINCSwitch.onosDir,
+                          domain.getControllers()[0].ip,
+                          filename), shell=True)
+    # successful output contains the two characters '{}'
+    # if there is more output than this, there is an issue
+    if output.strip('{}'):
+        warn('***WARNING: Could not push topology file to ONOS: %s\n' % output)
 
 def setup(argv):
     domains = []
-    ctlsets = sys.argv[1:]
+    opts = dict(a[2:].partition('=')[::2] for a in argv[1:] if a.startswith('--'))
+    ctlsets = [ a for a in argv[1:] if not a.startswith('--') ]
 
     # the controllers for the optical domain
     d0 = OpticalDomain()
@@ -138,58 +196,54 @@ def setup(argv):
 
     # make/setup Mininet object
     net = Mininet()
-    for d in domains:
-        d.build()
-        d.injectInto(net)
+    state = {}
 
-    # generate segment routing cfgs
-    info('*** Generating routing configuration files for COs:\n')
-    for i in range (1,len(domains)):
-        info('\tCO%s: domain%s-cfg.json\n' % (i, i))
-        domains[i].dumpCfg('domain%s-cfgv2.json' % i)
-
-    # connect COs to core - sort of hard-wired at this moment
-    # adding cross-connect links
-    for i in range(1,len(domains)):
-        # add 10 cross-connect links between domains
-        xcPortNo=2
-        ochPortNo=10
-        for j in range(0, 10):
-            an = { "bandwidth": 10, "durable": "true" }
-            net.addLink(domains[i].getTether(), d0.getSwitches('OE%s' % i),
-                        port1=xcPortNo+j, port2=ochPortNo+j, speed=10000, annotations=an, cls=LINCLink)
-            xcId = 'of:' + domains[i].getSwitches(name=domains[i].getTether()).dpid + '/' + str(xcPortNo+j)
-            ochId = 'of:' + d0.getSwitches('OE%s' % i).dpid + '/' + str(ochPortNo+j)
-            domainCfgs[i]['ports'][xcId] = {'cross-connect': {'remote': ochId}}
-
-    # fire everything up
-    net.build()
-    map(lambda x: x.start(), domains)
-
-    # create a minimal copy of the network for configuring LINC.
-    cfgnet = Mininet()
-    cfgnet.switches = net.switches
-    cfgnet.links = net.links
-    cfgnet.controllers = d0.getControllers()
-    LINCSwitch.bootOE(cfgnet, d0.getSwitches())
-
-    # send netcfg json to each CO-ONOS
+    # bring-up as a task graph: steps that touch the Mininet object in ways
+    # that are not thread-safe (adding nodes and links) are chained, the rest
+    # runs as soon as what it needs is there.
+    b = BringUp()
+    prev = []
+    for d in domains:
+        prev = [ b.add('inject:%s' % d.getId(), lambda d=d: (d.build(), d.injectInto(net)),
+                       prev, domain=d) ]
+    b.add('describe', lambda: state.update(descs=[ describe(d) for d in domains[1:] ]), prev)
+    b.add('cfg', lambda: genCfgs(domains, state['descs']), [ 'describe' ])
+    b.add('xconnect', lambda: crossConnect(net, domains, domainCfgs), [ 'describe' ])
+    # check the configs against the topology and each other before using them
+    b.add('validate', lambda: state.update(ok=check(
+          domains, dict((i, domainCfgs[i]) for i in range(1, len(domains))), net)),
+          [ 'cfg', 'xconnect' ])
+    b.add('build', net.build, [ 'xconnect' ])
+    for d in domains:
+        b.add('start:%s' % d.getId(), d.start, [ 'build' ], domain=d)
+    # LINC taps attach to the tether bridges, which the domains' starts (re)create
+    b.add('bootOE', lambda: bootOE(net, d0), [ 'start:%s' % d.getId() for d in domains ],
+          domain=d0)
     for i in range(1,len(domains)):
-        info('*** Pushing Topology.json to CO-ONOS %d\n' % i)
-        filename = 'Topology%d.json' % i
-        with open(filename, 'w') as outfile:
-            json.dump(domainCfgs[i], outfile, indent=4, separators=(',', ': '))
-
-        output = quietRun('%s/tools/test/bin/onos-netcfg %s %s &'\
-                           % (LINCSwitch.onosDir,
-                              domains[i].getControllers()[0].ip,
-                              filename), shell=True)
-        # successful output contains the two characters '{}'
-        # if there is more output than this, there is an issue
-        if output.strip('{}'):
-            warn('***WARNING: Could not push topology file to ONOS: %s\n' % output)
+        b.add('push:%s' % i, lambda i=i: pushCfg(domains[i], i, domainCfgs[i], state['ok']),
+              [ 'validate' ], domain=domains[i])
+    # wait for the COs to be connected and programmed
+    b.add('ready', lambda: state.update(times=waitReady(domains[1:])),
+          [ 'start:%s' % d.getId() for d in domains ] + [ 'bootOE' ] +
+          [ 'push:%s' % i for i in range(1, len(domains)) ])
+    ok = b.run()
+    b.report()
+    if not ok:
+        error('*** Bring-up failed, stopping\n')
+        net.stop()
+        LINCSwitch.shutdownOE()
+        return
+    report(state['times'])
+    logConvergence('convergence.log', state['times'], script='metro')
+    services = None
+    if opts.get('services'):
+        services = Planner(net, domains)
+        services.provision(parse(opts['services']))
+        services.report()
 
     CLI(net)
+    if services:
+        services.teardown()
     net.stop()
     LINCSwitch.shutdownOE()
 
@@ -197,7 +251,8 @@ if __name__ == '__main__':
     setLogLevel('info')
     import sys
     if len(sys.argv) < 2:
-        print ("Usage: sudo -E ./metro.py ctl-set1 ... ctl-set4\n\n",
-                "Where ctl-set are comma-separated controller IP's")
+        print ("Usage: sudo -E ./metro.py [--services=<file>] ctl-set1 ... ctl-set4\n\n",
+                "Where ctl-set are comma-separated controller IP's, and <file> the\n",
+                "EE services to provision across the COs and the core (see services.py)")
     else:
         setup(sys.argv)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+"""
+Port mirroring on the cross-connect OVS bridges (ovs<vid>, see vxlan.py), and
+capture of the mirrored traffic.
+
+A MirrorManager mirrors any number of target ports on any number of bridges
+with one ovs-vsctl transaction. Each bridge gets one mirror, selecting all of
+its target ports, and sending copies out to an internal port mir<bridge>
+(or to a given port, as set_mirror_port.sh does). With snaplen set, OVS only
+copies the start of each packet.
+
+To take only 1 in every 'sample' packets, sampling has to happen in OVS, or
+every packet is still copied and read before most are thrown away. OVS port
+mirrors cannot sample, so with sample > 1 each bridge gets an sFlow agent
+instead of a mirror: the datapath samples 1 in 'sample' packets of the
+bridge and sends their first snaplen bytes to a collector on 127.0.0.1,
+port SFLOW_PORT + the bridge's place in the list. sFlow samples every port
+of a bridge; samples are kept for the target ports where their ifindexes
+can be found.
+
+A Capture reads a mirror port with a raw socket, or the sFlow samples of a
+bridge from its collector port, into a bounded ring, and a writer drains the
+ring into rotating pcap files and/or per-VLAN counters, scaled up by the
+sampling rate. When the writer falls behind, the oldest packets are dropped
+and counted, rather than slowing the capture down.
+"""
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+from mininet.log import setLogLevel, info, error
+
+from bulk import vsctl, ipBatch
+
+ETH_P_ALL = 0x0003
+ETH_P_8021Q = 0x8100
+# collector port of the first bridge sampled with sFlow
+SFLOW_PORT = 6343
+
+def mirrorPort(bridge):
+    return 'mir%s' % bridge[:12]
+
+class MirrorManager(object):
+    """
+    mirrors : map of bridge to list of target ports
+    outputs : map of bridge to an existing port to mirror to (default: a new
+              internal port per bridge)
+    sample : sample 1 in every sample packets with sFlow, instead of mirroring
+    """
+
+    def __init__(self, mirrors, outputs={}, snaplen=None, sample=1):
+        self.mirrors = mirrors
+        self.outputs = outputs
+        self.snaplen = snaplen
+        self.sample = sample
+
+    def output(self, bridge):
+        return self.outputs.get(bridge, mirrorPort(bridge))
+
+    def collector(self, bridge):
+        """ the UDP port the sFlow samples of bridge are sent to """
+        return SFLOW_PORT + sorted(self.mirrors).index(bridge)
+
+    def setCmds(self):
+        cmds = []
+        for i, br in enumerate(sorted(self.mirrors)):
+            if self.sample > 1:
+                cmds.append([ '--id=@s%d' % i, 'create', 'sflow', 'agent=lo',
+                              'target="127.0.0.1:%d"' % self.collector(br),
+                              'header=%d' % (self.snaplen or 128),
+                              'sampling=%d' % self.sample, 'polling=0' ])
+                cmds.append([ 'set', 'bridge', br, 'sflow=@s%d' % i ])
+                continue
+            out = self.output(br)
+            if br not in self.outputs:
+                cmds.append([ '--may-exist', 'add-port', br, out ])
+                cmds.append([ 'set', 'interface', out, 'type=internal' ])
+            targets = []
+            for j, port in enumerate(self.mirrors[br]):
+                targets.append('@t%d_%d' % (i, j))
+                cmds.append([ '--id=' + targets[-1], 'get', 'port', port ])
+            cmds.append([ '--id=@o%d' % i, 'get', 'port', out ])
+            mirror = [ '--id=@m%d' % i, 'create', 'mirror', 'name=mirror_%s' % br,
+                       'select-src-port=' + ','.join(targets),
+                       'select-dst-port=' + ','.join(targets),
+                       'output-port=@o%d' % i ]
+            if self.snaplen:
+                mirror.append('snaplen=%d' % self.snaplen)
+            cmds.append(mirror)
+            cmds.append([ 'set', 'bridge', br, 'mirrors=@m%d' % i ])
+        return cmds
+
+    def clearCmds(self):
+        cmds = []
+        for br in sorted(self.mirrors):
+            if self.sample > 1:
+                cmds.append([ '--if-exists', 'clear', 'bridge', br, 'sflow' ])
+                continue
+            cmds.append([ '--if-exists', 'clear', 'bridge', br, 'mirrors' ])
+            if br not in self.outputs:
+                cmds.append([ '--if-exists', 'del-port', br, self.output(br) ])
+        return cmds
+
+    def set(self):
+        status, out = vsctl(self.setCmds())
+        if status:
+            error('*** could not set mirrors: %s\n' % out.strip())
+            return False
+        if self.sample > 1:
+            info('*** Sampling 1 in %d packets on %d bridges with sFlow\n'
+                 % (self.sample, len(self.mirrors)))
+            return True
+        ipBatch([ 'link set %s up' % self.output(br) for br in self.mirrors
+                  if br not in self.outputs ])
+        info('*** Mirroring %d ports on %d bridges\n'
+             % (sum(map(len, self.mirrors.values())), len(self.mirrors)))
+        return True
+
+    def clear(self):
+        status, out = vsctl(self.clearCmds())
+        if status:
+            error('*** could not clear mirrors: %s\n' % out.strip())
+        return not status
+
+class PcapWriter(object):
+    """ pcap files <prefix>-<n>.pcap of at most maxbytes, keeping the last keep """
+
+    def __init__(self, prefix, snaplen=65535, maxbytes=100 * 1024 * 1024, keep=10):
+        self.prefix = prefix
+        self.snaplen = snaplen
+        self.maxbytes = maxbytes
+        self.keep = keep
+        self.n = 0
+        self.f = None
+
+    def rotate(self):
+        if self.f:
+            self.f.close()
+        self.n += 1
+        old = '%s-%d.pcap' % (self.prefix, self.n - self.keep)
+        if os.path.exists(old):
+            os.remove(old)
+        self.f = open('%s-%d.pcap' % (self.prefix, self.n), 'wb')
+        self.f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, self.snaplen, 1))
+
+    def write(self, ts, data, origlen):
+        if not self.f or self.f.tell() > self.maxbytes:
+            self.rotate()
+        self.f.write(struct.pack('<IIII', int(ts), int((ts % 1) * 1e6), len(data), origlen))
+        self.f.write(data)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+def sflowSamples(data):
+    """ (rate, input, output, frame length, header) of each sampled packet
+        in an sFlow v5 datagram """
+    version, addrtype = struct.unpack('!II', data[:8])
+    if version != 5:
+        return []
+    off = 8 + (16 if addrtype == 2 else 4) + 12
+    nsamples, = struct.unpack('!I', data[off:off + 4])
+    off += 4
+    samples = []
+    for _ in range(nsamples):
+        fmt, length = struct.unpack('!II', data[off:off + 8])
+        body, off = data[off + 8:off + 8 + length], off + 8 + length
+        if fmt == 1:
+            rate, inp, outp, nrecs = struct.unpack('!8xI8xIII', body[:32])
+            inp, outp, roff = inp & 0x3fffffff, outp & 0x3fffffff, 32
+        elif fmt == 3:
+            rate, inp, outp, nrecs = struct.unpack('!12xI12xI4xII', body[:44])
+            roff = 44
+        else:
+            continue
+        for _ in range(nrecs):
+            rfmt, rlen = struct.unpack('!II', body[roff:roff + 8])
+            if rfmt == 1:
+                proto, flen, stripped, hlen = struct.unpack('!IIII', body[roff + 8:roff + 24])
+                if proto == 1:
+                    samples.append((rate, inp, outp, flen - stripped,
+                                    body[roff + 24:roff + 24 + hlen]))
+            roff += 8 + rlen
+    return samples
+
+class Capture(object):
+    """
+    capture on intf (a mirror port), or from the sFlow collector port sflow,
+    into a ring of ringsize packets.
+    vlan : VLAN to count untagged packets under (e.g. the VLAN of an ovs<vid> bridge)
+    snaplen : bytes kept of each packet
+    pcap : prefix of the pcap files to write, if any
+    ifindexes : with sflow, keep only samples into or out of these ifindexes
+    """
+
+    def __init__(self, intf, vlan=None, ringsize=8192, snaplen=128, pcap=None,
+                 sflow=None, ifindexes=None):
+        self.intf = intf
+        self.vlan = vlan
+        self.snaplen = snaplen
+        self.sflow = sflow
+        self.ifindexes = ifindexes
+        self.ring = deque(maxlen=ringsize)
+        self.pcap = PcapWriter(pcap, snaplen) if pcap else None
+        self.seen = 0
+        self.dropped = 0
+        # VLAN to [packets, bytes], scaled up by the sampling rate
+        self.counters = {}
+        self.__stop = threading.Event()
+        self.__threads = []
+
+    def socket(self):
+        if self.sflow:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', self.sflow))
+        else:
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+            sock.bind((self.intf, ETH_P_ALL))
+        sock.settimeout(0.5)
+        return sock
+
+    def packets(self, data):
+        """ (sampling rate, header, frame length) of what one recv() returned """
+        if not self.sflow:
+            return [ (1, data[:self.snaplen], len(data)) ]
+        return [ (rate, hdr[:self.snaplen], flen)
+                 for rate, inp, outp, flen, hdr in sflowSamples(data)
+                 if not self.ifindexes or inp in self.ifindexes
+                 or outp in self.ifindexes ]
+
+    def read(self):
+        sock = self.socket()
+        ring = self.ring
+        while not self.__stop.is_set():
+            try:
+                data = sock.recv(65535)
+            except socket.timeout:
+                continue
+            now = time.time()
+            for rate, hdr, origlen in self.packets(data):
+                self.seen += 1
+                if len(ring) == ring.maxlen:
+                    self.dropped += 1
+                ring.append((now, hdr, origlen, rate))
+        sock.close()
+
+    def drain(self):
+        ring = self.ring
+        while not self.__stop.is_set() or ring:
+            if not ring:
+                time.sleep(0.01)
+                continue
+            ts, data, origlen, rate = ring.popleft()
+            vlan = self.vlan
+            if len(data) >= 16 and struct.unpack('!H', data[12:14])[0] == ETH_P_8021Q:
+                vlan = struct.unpack('!H', data[14:16])[0] & 0x0fff
+            cnt = self.counters.setdefault(vlan, [0, 0])
+            cnt[0] += rate
+            cnt[1] += origlen * rate
+            if self.pcap:
+                self.pcap.write(ts, data, origlen)
+        if self.pcap:
+            self.pcap.close()
+
+    def start(self):
+        self.__stop.clear()
+        self.__threads = [ threading.Thread(target=self.read),
+                           threading.Thread(target=self.drain) ]
+        for t in self.__threads:
+            t.daemon = True
+            t.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        for t in self.__threads:
+            t.join()
+
+    def report(self):
+        info('*** %s: %d packets seen, %d dropped from the ring\n'
+             % (self.intf, self.seen, self.dropped))
+        for vlan in sorted(self.counters, key=str):
+            pkts, byts = self.counters[vlan]
+            info('\tvlan %s: ~%d packets, ~%d bytes\n' % (vlan, pkts, byts))
+
+def ifindexes(ports):
+    """ the kernel ifindexes of ports, or None if any is unknown """
+    try:
+        return set(int(open('/sys/class/net/%s/ifindex' % p).read()) for p in ports)
+    except (IOError, ValueError):
+        return None
+
+def parse(spec):
+    """ (bridge, [ ports ], output) from <bridge>:<port>[,<port>...][:<output>] """
+    args = spec.split(':')
+    return args[0], args[1].split(','), args[2] if len(args) > 2 else None
+
+if __name__ == '__main__':
+    setLogLevel('info')
+    opts = dict(a[2:].partition('=')[::2] for a in sys.argv[1:] if a.startswith('--'))
+    args = [ a for a in sys.argv[1:] if not a.startswith('--') ]
+    if len(args) < 2 or args[0] not in ('capture', 'set', 'clear'):
+        print ('Usage: sudo ./mirror.py capture|set|clear [options] mirror1 mirror2 ...\n\n'
+               'mirror<n> : <bridge>:<port>[,<port>...][:<output port>]\n'
+               'capture   : mirror, and capture until interrupted\n'
+               'options   : --snaplen=<bytes> --sample=<1 in n, with sFlow> --pcap=<file prefix>')
+        sys.exit(1)
+    specs = [ parse(a) for a in args[1:] ]
+    snaplen = int(opts['snaplen']) if opts.get('snaplen') else None
+    sample = int(opts.get('sample') or 1)
+    mgr = MirrorManager(dict((br, ports) for br, ports, out in specs),
+                        dict((br, out) for br, ports, out in specs if out),
+                        snaplen, sample)
+    if args[0] == 'clear':
+        sys.exit(0 if mgr.clear() else 1)
+    if not mgr.set():
+        sys.exit(1)
+    if args[0] == 'set':
+        sys.exit(0)
+    caps = []
+    for br, ports, out in specs:
+        vlan = int(br[3:]) if br[3:].isdigit() else None
+        pcap = '%s-%s' % (opts['pcap'], br) if opts.get('pcap') else None
+        if sample > 1:
+            cap = Capture(br, vlan, snaplen=snaplen or 128, pcap=pcap,
+                          sflow=mgr.collector(br), ifindexes=ifindexes(ports))
+        else:
+            cap = Capture(mgr.output(br), vlan, snaplen=snaplen or 128, pcap=pcap)
+        caps.append(cap.start())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    for c in caps:
+        c.stop()
+        c.report()
+    mgr.clear()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+"""
+OpenFlow 1.3 connection storms, for loading controllers with more switches
+than Mininet can run.
+
+Mininet gives every UserSwitch its own processes, which caps how many devices
+a controller can be shown from one machine. Here, every switch of a number of
+COs (as twoCOs.py builds them) is instead one OpenFlow session from a single
+process, with the DPID and ports the switch would have had (see
+Domain.layout()). Each session plays the switch side of the protocol: hello,
+features, port and switch descriptions, config and role requests, echoes and
+barriers. Flow-mods are counted, and taken as acknowledged by the barrier
+reply that follows them.
+
+Python 2 has no asyncio, so sessions are non-blocking sockets on one poll()
+loop. New sessions may be ramped at a rate, and sessions that are up may be
+dropped at random (churn) to see how the controller takes reconnects. Dropped
+sessions reconnect after a backoff that doubles, up to BACKOFF_MAX, while
+connecting fails. Measured:
+
+- handshake latency, from connect to the features request being answered,
+  of first connects and of reconnects
+- flow-mods received, and acknowledged per second
+- disconnects by the controller, connect failures and reconnects
+
+    ofstorm.py [options] <controller IP>[:<port>] | stub
+
+where stub runs against a stub controller (openflow.py) in this process.
+"""
+import errno
+import heapq
+import random
+import resource
+import select
+import socket
+import struct
+import sys
+import time
+
+from mininet.log import setLogLevel, info, warn, error
+
+from twoCOs import CO
+from openflow import (OFP_PORT, OFPT_HELLO, OFPT_ERROR, OFPT_ECHO_REQUEST, OFPT_ECHO_REPLY,
+                      OFPT_FEATURES_REQUEST, OFPT_GET_CONFIG_REQUEST, OFPT_GET_CONFIG_REPLY,
+                      OFPT_FLOW_MOD, OFPT_MULTIPART_REQUEST, OFPT_BARRIER_REQUEST,
+                      OFPT_BARRIER_REPLY, OFPT_ROLE_REQUEST, OFPT_ROLE_REPLY,
+                      OFPT_GET_ASYNC_REQUEST, OFPT_GET_ASYNC_REPLY, OFPMP_DESC, OFPMP_PORT_DESC,
+                      OFPCML_NO_BUFFER, StubController, msg, featuresReply, portDesc,
+                      multipartReply, descReply, parseMsgs)
+
+# seconds between connect attempts of a session, doubled on each failure
+BACKOFF_MIN = 0.1
+BACKOFF_MAX = 5.0
+# seconds between samples of the timeline
+SAMPLE = 1.0
+
+class Session(object):
+    """ the switch end of one OpenFlow session """
+
+    def __init__(self, n, name, dpid, ports):
+        # place in the storm
+        self.n = n
+        self.name = name
+        self.dpid = dpid
+        self.ports = ports
+        self.sock = None
+        self.inbuf = self.outbuf = b''
+        # down, connecting, hello (connected, not yet asked for features), up
+        self.state = 'down'
+        # when the current connect began, and how many times it was up before
+        self.started = None
+        self.ups = 0
+        self.backoff = BACKOFF_MIN
+        # flow-mods since the last barrier
+        self.unacked = 0
+
+    def portDescs(self):
+        mac = struct.pack('!Q', int(self.dpid, 16))[-3:]
+        return b''.join(portDesc(p, b'\x02' + mac + struct.pack('!H', p & 0xffff),
+                                 '%s-eth%d' % (self.name, p)) for p in self.ports)
+
+def layouts(domains):
+    """ (switch name, DPID, ports) of the switches of domains, checking DPIDs are unique """
+    seen = {}
+    sws = []
+    for d in domains:
+        for name, (dpid, ports) in sorted(d.layout().items()):
+            if dpid in seen:
+                raise ValueError('%s and %s would both have DPID %s' % (seen[dpid], name, dpid))
+            seen[dpid] = name
+            sws.append((name, dpid, ports))
+    return sws
+
+def pct(vals, p):
+    """ the p-th percentile of sorted vals """
+    return vals[min(len(vals) - 1, int(len(vals) * p / 100.0))] if vals else 0.0
+
+class Storm(object):
+    """
+    OpenFlow sessions for the switches of domains, towards the controller at
+    (ip, port).
+    rate : new connections per second (0: all at once)
+    churn : sessions that are up dropped per second
+    """
+
+    def __init__(self, domains, ctl, rate=0, churn=0.0):
+        self.ctl = ctl
+        self.rate = rate
+        self.churn = churn
+        self.sessions = [ Session(n, *sw) for n, sw in enumerate(layouts(domains)) ]
+        self.poller = select.poll()
+        # fd to session, and (time due, session number) of sessions to connect
+        self.fds = {}
+        self.due = []
+        self.up = 0
+        # handshake latencies of first connects, and of reconnects
+        self.handshakes = []
+        self.rehandshakes = []
+        self.counts = dict((k, 0) for k in ('flowmods', 'acked', 'barriers', 'errors', 'failures',
+                                            'closed', 'churned', 'reconnects'))
+        # (seconds from start, sessions up, flow-mods, flow-mods acknowledged) per SAMPLE
+        self.timeline = []
+        self.allUp = None
+        self.start = None
+        self.raiseFdLimit(len(self.sessions) + 64)
+
+    def raiseFdLimit(self, need):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < need:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(need, hard), hard))
+            if hard < need:
+                warn('*** ofstorm: only %d file descriptors for %d sessions\n' % (hard, need - 64))
+
+    def connect(self, s, now):
+        s.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.sock.setblocking(0)
+        s.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.started = now
+        if s.ups:
+            self.counts['reconnects'] += 1
+        err = s.sock.connect_ex(self.ctl)
+        if err not in (0, errno.EINPROGRESS):
+            self.fail(s, now)
+            return
+        s.state = 'connecting'
+        self.fds[s.sock.fileno()] = s
+        self.poller.register(s.sock, select.POLLOUT)
+
+    def fail(self, s, now):
+        """ connecting failed: try again after a longer backoff """
+        self.counts['failures'] += 1
+        self.drop(s, now)
+        s.backoff = min(BACKOFF_MAX, s.backoff * 2)
+
+    def drop(self, s, now):
+        if s.sock:
+            if s.sock.fileno() in self.fds:
+                self.poller.unregister(s.sock)
+                del self.fds[s.sock.fileno()]
+            s.sock.close()
+            s.sock = None
+        if s.state == 'up':
+            self.up -= 1
+            s.backoff = BACKOFF_MIN
+        s.state = 'down'
+        s.inbuf = s.outbuf = b''
+        s.unacked = 0
+        heapq.heappush(self.due, (now + s.backoff, s.n))
+
+    def send(self, s, data):
+        s.outbuf += data
+        try:
+            n = s.sock.send(s.outbuf)
+        except socket.error as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                # reset by the controller
+                self.counts['closed'] += 1
+                self.drop(s, time.time())
+                return
+            n = 0
+        s.outbuf = s.outbuf[n:]
+        self.poller.modify(s.sock, select.POLLIN | (select.POLLOUT if s.outbuf else 0))
+
+    def handle(self, s, mtype, xid, body, now):
+        """ answer a message from the controller as a switch would """
+        if mtype == OFPT_FEATURES_REQUEST:
+            self.send(s, featuresReply(xid, s.dpid))
+            if s.sock and s.state != 'up':
+                s.state = 'up'
+                self.up += 1
+                (self.rehandshakes if s.ups else self.handshakes).append(now - s.started)
+                s.ups += 1
+        elif mtype == OFPT_ECHO_REQUEST:
+            self.send(s, msg(OFPT_ECHO_REPLY, xid, body))
+        elif mtype == OFPT_FLOW_MOD:
+            self.counts['flowmods'] += 1
+            s.unacked += 1
+        elif mtype == OFPT_BARRIER_REQUEST:
+            self.send(s, msg(OFPT_BARRIER_REPLY, xid))
+            self.counts['barriers'] += 1
+            self.counts['acked'] += s.unacked
+            s.unacked = 0
+        elif mtype == OFPT_MULTIPART_REQUEST:
+            mptype = struct.unpack('!H', body[:2])[0]
+            if mptype == OFPMP_PORT_DESC:
+                self.send(s, multipartReply(xid, mptype, s.portDescs()))
+            elif mptype == OFPMP_DESC:
+                self.send(s, descReply(xid, s.name))
+            else:
+                # no statistics to speak of
+                self.send(s, multipartReply(xid, mptype))
+        elif mtype == OFPT_GET_CONFIG_REQUEST:
+            self.send(s, msg(OFPT_GET_CONFIG_REPLY, xid, struct.pack('!HH', 0, OFPCML_NO_BUFFER)))
+        elif mtype == OFPT_ROLE_REQUEST:
+            self.send(s, msg(OFPT_ROLE_REPLY, xid, body))
+        elif mtype == OFPT_GET_ASYNC_REQUEST:
+            self.send(s, msg(OFPT_GET_ASYNC_REPLY, xid, b'\0' * 24))
+        elif mtype == OFPT_ERROR:
+            self.counts['errors'] += 1
+
+    def event(self, s, ev, now):
+        if s.state == 'connecting':
+            err = s.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err or ev & (select.POLLERR | select.POLLHUP):
+                self.fail(s, now)
+                return
+            s.state = 'hello'
+            self.send(s, msg(OFPT_HELLO, 0))
+            return
+        if ev & select.POLLOUT and s.outbuf:
+            self.send(s, b'')
+        if ev & (select.POLLIN | select.POLLERR | select.POLLHUP):
+            try:
+                data = s.sock.recv(65536)
+            except socket.error:
+                data = b''
+            if not data:
+                self.counts['closed'] += 1
+                self.drop(s, now)
+                return
+            msgs, s.inbuf = parseMsgs(s.inbuf + data)
+            for mtype, xid, body in msgs:
+                if not s.sock:
+                    break
+                self.handle(s, mtype, xid, body, now)
+
+    def shake(self, now, dt):
+        """ drop on average churn sessions that are up per second """
+        n = int(self.churn * dt) + (random.random() < (self.churn * dt) % 1)
+        ups = [ s for s in self.sessions if s.state == 'up' ] if n else []
+        for s in random.sample(ups, min(n, len(ups))):
+            self.counts['churned'] += 1
+            self.drop(s, now)
+
+    def run(self, seconds):
+        """ run the sessions for seconds """
+        self.start = now = time.time()
+        for n, s in enumerate(self.sessions):
+            heapq.heappush(self.due, (now + (float(n) / self.rate if self.rate else 0.0), n))
+        last = sample = now
+        flowmods = acked = 0
+        while now < self.start + seconds:
+            while self.due and self.due[0][0] <= now:
+                self.connect(self.sessions[heapq.heappop(self.due)[1]], now)
+            timeout = min(0.1, max(0.0, self.due[0][0] - now)) if self.due else 0.1
+            ready = self.poller.poll(timeout * 1000)
+            now = time.time()
+            for fd, ev in ready:
+                if fd in self.fds:
+                    self.event(self.fds[fd], ev, now)
+            if self.up == len(self.sessions) and self.allUp is None:
+                self.allUp = now - self.start
+            if self.churn and self.allUp is not None:
+                self.shake(now, now - last)
+            last = now
+            if now - sample >= SAMPLE:
+                self.timeline.append((now - self.start, self.up,
+                                      self.counts['flowmods'] - flowmods, self.counts['acked'] - acked))
+                flowmods, acked, sample = self.counts['flowmods'], self.counts['acked'], now
+        return self
+
+    def close(self):
+        for s in self.sessions:
+            if s.sock:
+                s.sock.close()
+                s.sock = None
+
+    def report(self):
+        c = self.counts
+        secs = self.timeline[-1][0] if self.timeline else 0.0
+        info('*** OpenFlow storm: %d sessions to %s:%d, %d up at the end, all up %s\n'
+             % (len(self.sessions), self.ctl[0], self.ctl[1], self.up,
+                'after %.2fs' % self.allUp if self.allUp is not None else 'never'))
+        for what, lat in (('connects', self.handshakes), ('reconnects', self.rehandshakes)):
+            lat = sorted(lat)
+            if lat:
+                info('\thandshake, %-10s: %6d, p50 %7.1fms p95 %7.1fms p99 %7.1fms max %7.1fms\n'
+                     % (what, len(lat), pct(lat, 50) * 1000, pct(lat, 95) * 1000,
+                        pct(lat, 99) * 1000, lat[-1] * 1000))
+        info('\tflow-mods: %d received, %d acknowledged by %d barriers; %.1f/s acknowledged, %d/s peak\n'
+             % (c['flowmods'], c['acked'], c['barriers'], c['acked'] / secs if secs else 0.0,
+                max([ a for _, _, _, a in self.timeline ] + [ 0 ]) / SAMPLE))
+        info('\tdisconnects: %d by the controller, %d by churn; %d reconnects, %d failed connects,'
+             ' %d errors\n' % (c['closed'], c['churned'], c['reconnects'], c['failures'], c['errors']))
+
+def setup(argv):
+    opts = dict(a[2:].partition('=')[::2] for a in argv[1:] if a.startswith('--'))
+    argv = [ a for a in argv if not a.startswith('--') ]
+    # the switches twoCOs.py would make
+    cos = []
+    for did in range(1, int(opts.get('cos') or 9) + 1):
+        co = CO(did)
+        co.build(int(opts.get('spines') or 2), int(opts.get('leaves') or 2))
+        cos.append(co)
+    stub = None
+    if argv[1] == 'stub':
+        stub = StubController(port=0).start()
+        ctl = (stub.ip, stub.port)
+    else:
+        ip, _, port = argv[1].partition(':')
+        ctl = (ip, int(port or OFP_PORT))
+    try:
+        storm = Storm(cos, ctl, rate=float(opts.get('rate') or 0), churn=float(opts.get('churn') or 0))
+    except ValueError as e:
+        error('*** ofstorm: %s\n' % e)
+        return
+    info('*** ofstorm: %d sessions for %d COs\n' % (len(storm.sessions), len(cos)))
+    storm.run(float(opts.get('seconds') or 30)).report()
+    if stub:
+        info('\tstub controller: %d switches connected, %d programmed\n'
+             % (len(stub.switches), len([ p for c, p in stub.switches.values() if p ])))
+    storm.close()
+    if stub:
+        stub.stop()
+
+if __name__ == '__main__':
+    setLogLevel('info')
+    if len([ a for a in sys.argv if not a.startswith('--') ]) < 2:
+        print ('Usage: %s [options] <controller IP>[:<port>] | stub\n' % sys.argv[0] +
+               'options:\n'
+               '--cos=<n> : simulate the switches of n COs (9; from 10 on, switch names give clashing DPIDs)\n'
+               '--spines=<n>, --leaves=<n> : fabric size of each CO (2, 2)\n'
+               '--seconds=<n> : how long to run (30)\n'
+               '--rate=<n> : new connections per second (0: all at once)\n'
+               '--churn=<n> : sessions dropped per second once all are up, to measure reconnects (0)')
+    else:
+        setup(sys.argv)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Just enough OpenFlow 1.3 to stand in for a controller when no ONOS is around.
+
+The stub controller completes the handshake with every switch that connects,
+answers echoes, and installs a table-miss flow (send to controller) so that
+switches end up with a programmed flow table, as they would under ONOS.
+
+The switch side of the handshake and of the requests a controller makes of
+a new switch (features, port descriptions, config, role) is here too, for
+sessions that stand in for switches (see ofstorm.py).
+"""
+import socket
+import struct
+import sys
+import threading
+import time
+
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+OFP_VERSION = 0x04
+OFP_PORT = 6653
+
+# message types
+OFPT_HELLO = 0
+OFPT_ERROR = 1
+OFPT_ECHO_REQUEST = 2
+OFPT_ECHO_REPLY = 3
+OFPT_FEATURES_REQUEST = 5
+OFPT_FEATURES_REPLY = 6
+OFPT_GET_CONFIG_REQUEST = 7
+OFPT_GET_CONFIG_REPLY = 8
+OFPT_SET_CONFIG = 9
+OFPT_PACKET_IN = 10
+OFPT_PORT_STATUS = 12
+OFPT_FLOW_MOD = 14
+OFPT_MULTIPART_REQUEST = 18
+OFPT_MULTIPART_REPLY = 19
+OFPT_BARRIER_REQUEST = 20
+OFPT_BARRIER_REPLY = 21
+OFPT_ROLE_REQUEST = 24
+OFPT_ROLE_REPLY = 25
+OFPT_GET_ASYNC_REQUEST = 26
+OFPT_GET_ASYNC_REPLY = 27
+
+# multipart types
+OFPMP_DESC = 0
+OFPMP_PORT_DESC = 13
+
+OFPP_CONTROLLER = 0xfffffffd
+OFPP_ANY = 0xffffffff
+OFPG_ANY = 0xffffffff
+OFPCML_NO_BUFFER = 0xffff
+OFP_NO_BUFFER = 0xffffffff
+OFPPS_LIVE = 4
+# 10 Gb full-duplex, copper
+OFPPF_10GB_FD = 1 << 6
+OFPPF_COPPER = 1 << 11
+
+HEADER = struct.Struct('!BBHI')
+
+def msg(mtype, xid, body=b''):
+    """ an OpenFlow message of type mtype """
+    return HEADER.pack(OFP_VERSION, mtype, HEADER.size + len(body), xid) + body
+
+def flowMod(xid, priority=0, out=OFPP_CONTROLLER, table=0):
+    """ an OFPFC_ADD flow-mod matching everything, with one output action """
+    fm = struct.pack('!QQBBHHHIIIH2x', 0, 0, table, 0, 0, 0, priority,
+                     OFP_NO_BUFFER, OFPP_ANY, OFPG_ANY, 0)
+    match = struct.pack('!HH4x', 1, 4)
+    action = struct.pack('!HHIH6x', 0, 16, out, OFPCML_NO_BUFFER)
+    inst = struct.pack('!HH4x', 4, 8 + len(action)) + action
+    return msg(OFPT_FLOW_MOD, xid, fm + match + inst)
+
+def featuresReply(xid, dpid, ntables=254):
+    """ the features of a switch with DPID dpid (hex string), no buffers """
+    return msg(OFPT_FEATURES_REPLY, xid, struct.pack('!QIBB2xII', int(dpid, 16), 0, ntables, 0, 0, 0))
+
+def portDesc(no, mac, name):
+    """ the description of a live 10G port. mac : 6 bytes """
+    feat = OFPPF_10GB_FD | OFPPF_COPPER
+    return struct.pack('!I4x6s2x16sIIIIIIII', no, mac, name.encode()[:15], 0, OFPPS_LIVE,
+                       feat, feat, feat, feat, 10000000, 10000000)
+
+def multipartReply(xid, mptype, body=b''):
+    return msg(OFPT_MULTIPART_REPLY, xid, struct.pack('!HH4x', mptype, 0) + body)
+
+def descReply(xid, dp):
+    """ the switch description, dp : a description of this datapath """
+    return multipartReply(xid, OFPMP_DESC, struct.pack('!256s256s256s32s256s', b'ONF', b'emulated',
+                                                       b'ofstorm', b'None', dp.encode()))
+
+def parseMsgs(buf):
+    """ the whole messages at the start of buf, as (type, xid, body), and what is left """
+    msgs = []
+    while len(buf) >= HEADER.size:
+        version, mtype, length, xid = HEADER.unpack(buf[:HEADER.size])
+        if len(buf) < length:
+            break
+        msgs.append((mtype, xid, buf[HEADER.size:length]))
+        buf = buf[length:]
+    return msgs, buf
+
+def readMsg(sock):
+    """ read one message. returns (type, xid, body), or None on disconnect """
+    hdr = readAll(sock, HEADER.size)
+    if not hdr:
+        return None
+    version, mtype, length, xid = HEADER.unpack(hdr)
+    body = readAll(sock, length - HEADER.size)
+    if body is None:
+        return None
+    return mtype, xid, body
+
+def readAll(sock, n):
+    buf = b''
+    while len(buf) < n:
+        data = sock.recv(n - len(buf))
+        if not data:
+            return None
+        buf += data
+    return buf
+
+class StubHandler(socketserver.BaseRequestHandler):
+    """ one switch connection """
+
+    def handle(self):
+        ctl = self.server.controller
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall(msg(OFPT_HELLO, 1) + msg(OFPT_FEATURES_REQUEST, 2))
+        dpid = None
+        while True:
+            m = readMsg(sock)
+            if m is None:
+                break
+            mtype, xid, body = m
+            if mtype == OFPT_ECHO_REQUEST:
+                sock.sendall(msg(OFPT_ECHO_REPLY, xid, body))
+            elif mtype == OFPT_FEATURES_REPLY:
+                dpid = '%016x' % struct.unpack('!Q', body[:8])[0]
+                ctl.noteSwitch(dpid, owner=self)
+                sock.sendall(flowMod(3) + msg(OFPT_BARRIER_REQUEST, 4))
+            elif mtype == OFPT_BARRIER_REPLY and dpid:
+                ctl.noteSwitch(dpid, programmed=True, owner=self)
+            elif mtype == OFPT_ERROR:
+                ctl.noteError()
+        if dpid:
+            ctl.dropSwitch(dpid, owner=self)
+
+class StubServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    # room for many switches connecting at once
+    request_queue_size = 1024
+    daemon_threads = True
+
+class StubController(object):
+    """ a stub OpenFlow 1.3 controller listening on ip:port in a thread """
+
+    def __init__(self, ip='127.0.0.1', port=OFP_PORT):
+        self.ip = ip
+        self.port = port
+        # dpid to (time connected, time programmed)
+        self.switches = {}
+        # dpid to the handler of its latest connection
+        self.__owners = {}
+        self.errors = 0
+        self.__lock = threading.Lock()
+        self.__server = None
+
+    def noteSwitch(self, dpid, programmed=False, owner=None):
+        with self.__lock:
+            if programmed and self.__owners.get(dpid) is not owner:
+                # a reply on a connection the switch has since replaced
+                return
+            self.__owners[dpid] = owner
+            conn, prog = self.switches.get(dpid, (None, None))
+            now = time.time()
+            if programmed:
+                prog = now
+            else:
+                # a new connection, not programmed yet
+                conn, prog = now, None
+            self.switches[dpid] = (conn, prog)
+
+    def dropSwitch(self, dpid, owner=None):
+        """ forget dpid, unless it has reconnected since owner took it """
+        with self.__lock:
+            if self.__owners.get(dpid) is owner:
+                self.__owners.pop(dpid, None)
+                self.switches.pop(dpid, None)
+
+    def noteError(self):
+        with self.__lock:
+            self.errors += 1
+
+    def start(self):
+        self.__server = StubServer((self.ip, self.port), StubHandler)
+        # port 0: listen on any free port
+        self.port = self.__server.server_address[1]
+        self.__server.controller = self
+        t = threading.Thread(target=self.__server.serve_forever)
+        t.daemon = True
+        t.start()
+        return self
+
+    def stop(self):
+        if self.__server:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else OFP_PORT
+    ctl = StubController('0.0.0.0', port).start()
+    print('stub OpenFlow 1.3 controller listening on port %d' % port)
+    try:
+        while True:
+            time.sleep(5)
+            print('%d switches connected, %d errors' % (len(ctl.switches), ctl.errors))
+    except KeyboardInterrupt:
+        ctl.stop()
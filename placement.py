@@ -0,0 +1,155 @@
+"""
+CPU placement of Domains, so that one busy fabric cannot starve the others.
+
+place() picks cores or CPU quotas for a set of domains by policy:
+- rr       : deal the cores out round-robin
+- weighted : share the cores in proportion to fabric size (switches + hosts)
+
+pin() then moves every process of each domain into a cgroup of its own with
+the chosen cpuset and/or CPU quota. Processes later started from a node's
+shell stay in its cgroup. Where cgroups cannot be used, the processes are
+pinned with taskset, which also holds for their future children.
+"""
+import os
+from multiprocessing import cpu_count
+
+from mininet.log import info, warn
+from mininet.util import quietRun
+
+from profiler import processTree, domainPids
+
+CGROOT = '/sys/fs/cgroup'
+CGNAME = 'ecord'
+# CFS period for quotas, in microseconds
+PERIOD = 100000
+
+POLICIES = ('rr', 'weighted')
+
+def size(domain):
+    return len(domain.getSwitches()) + len(domain.getHosts())
+
+def shares(domains, ncores, policy):
+    """ the number of cores each domain gets, as floats summing to ncores """
+    if policy == 'weighted':
+        weights = [ float(size(d)) or 1.0 for d in domains ]
+    elif policy == 'rr':
+        weights = [ 1.0 for d in domains ]
+    else:
+        raise ValueError('unknown placement policy %s (one of %s)' % (policy, ', '.join(POLICIES)))
+    total = sum(weights)
+    return [ ncores * w / total for w in weights ]
+
+def place(domains, cores=None, policy='rr', quota=False):
+    """
+    Choose a placement for each domain, and set it with Domain.setPlacement.
+    cores : CPUs to use (default: all)
+    quota : limit CPU time rather than pinning to cores
+    """
+    cores = list(cores) if cores else list(range(cpu_count()))
+    share = shares(domains, len(cores), policy)
+    if quota:
+        for d, s in zip(domains, share):
+            d.setPlacement(cores, s)
+        return
+    if len(domains) >= len(cores):
+        # more domains than cores: domains share cores, round-robin
+        for i, d in enumerate(domains):
+            d.setPlacement([ cores[i % len(cores)] ])
+        return
+    # contiguous core ranges, sized by the largest remainder method
+    counts = [ max(1, int(s)) for s in share ]
+    rest = sorted(range(len(domains)), key=lambda i: share[i] - int(share[i]), reverse=True)
+    while sum(counts) < len(cores):
+        counts[rest.pop(0)] += 1
+    while sum(counts) > len(cores):
+        counts[counts.index(max(counts))] -= 1
+    start = 0
+    for d, n in zip(domains, counts):
+        d.setPlacement(cores[start:start + n])
+        start += n
+
+def write(path, val):
+    with open(path, 'w') as f:
+        f.write(str(val))
+
+def read(path):
+    with open(path) as f:
+        return f.read().strip()
+
+def cgroupDirs(did):
+    """ the cgroup directories for domain did: (cpuset dir, cpu dir) """
+    if os.path.exists(os.path.join(CGROOT, 'cgroup.controllers')):
+        # cgroup v2: one hierarchy, enable the controllers on the way down
+        d = os.path.join(CGROOT, CGNAME, 'd%s' % did)
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        for parent in (CGROOT, os.path.join(CGROOT, CGNAME)):
+            write(os.path.join(parent, 'cgroup.subtree_control'), '+cpuset +cpu')
+        return d, d
+    dirs = []
+    for ctl in ('cpuset', 'cpu'):
+        d = os.path.join(CGROOT, ctl, CGNAME, 'd%s' % did)
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        if ctl == 'cpuset':
+            # v1 cpusets need memory nodes before they take any process
+            for parent in (os.path.dirname(d), d):
+                write(os.path.join(parent, 'cpuset.mems'),
+                      read(os.path.join(CGROOT, 'cpuset', 'cpuset.mems')))
+        dirs.append(d)
+    return tuple(dirs)
+
+def pinCgroup(did, pids, cores, quota):
+    cpuset, cpu = cgroupDirs(did)
+    v2 = cpuset == cpu
+    if cores:
+        if not v2:
+            write(os.path.join(os.path.dirname(cpuset), 'cpuset.cpus'),
+                  read(os.path.join(CGROOT, 'cpuset', 'cpuset.cpus')))
+        write(os.path.join(cpuset, 'cpuset.cpus'), ','.join(map(str, cores)))
+    if quota:
+        if v2:
+            write(os.path.join(cpu, 'cpu.max'), '%d %d' % (int(quota * PERIOD), PERIOD))
+        else:
+            write(os.path.join(cpu, 'cpu.cfs_period_us'), PERIOD)
+            write(os.path.join(cpu, 'cpu.cfs_quota_us'), int(quota * PERIOD))
+    groups = set([ cpuset ] if v2 else [ g for g, on in ((cpuset, cores), (cpu, quota)) if on ])
+    for d in groups:
+        for pid in pids:
+            try:
+                write(os.path.join(d, 'cgroup.procs'), pid)
+            except IOError:
+                # the process is gone
+                pass
+
+def pin(domains):
+    """ confine the processes of each domain as set by Domain.setPlacement """
+    children = processTree()
+    for d in domains:
+        cores, quota = d.getPlacement()
+        if not cores and not quota:
+            continue
+        pids = list(domainPids(d, children))
+        info('*** Domain %s: %d processes on cores %s%s\n'
+             % (d.getId(), len(pids), ','.join(map(str, cores or [])) or 'any',
+                ' with %.2f cores of CPU time' % quota if quota else ''))
+        try:
+            pinCgroup(d.getId(), pids, cores, quota)
+        except (IOError, OSError) as e:
+            if not cores:
+                warn('*** Domain %s: cannot set CPU quota: %s\n' % (d.getId(), e))
+                continue
+            warn('*** Domain %s: no cgroups (%s), pinning with taskset\n' % (d.getId(), e))
+            quietRun('for p in %s; do taskset -a -p -c %s $p; done'
+                     % (' '.join(map(str, pids)), ','.join(map(str, cores))), shell=True)
+
+def release(domains):
+    """ remove the cgroups made by pin(), once the domains' processes are gone """
+    for d in domains:
+        for sub in ('', 'cpuset', 'cpu'):
+            path = os.path.join(CGROOT, sub, CGNAME, 'd%s' % d.getId())
+            if os.path.isdir(path):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    warn('*** could not remove cgroup %s\n' % path)
@@ -0,0 +1,86 @@
+"""
+Bring-up work compiled into a plan of operations, and applied in bulk.
+
+A Plan is an ordered list of operations of three kinds:
+
+- ip    : an ip(8) command (without the leading 'ip'), in a namespace given
+          by a node's pid, or None for the root namespace
+- vsctl : an ovs-vsctl command, as a list of arguments
+- py    : bookkeeping in Mininet or Domain objects, e.g. noting that a switch
+          has a new interface, that forks nothing
+
+Executing a plan runs one 'ip -batch' per namespace, then all the ovs-vsctl
+commands as one transaction, then the bookkeeping, so a plan of thousands of
+operations costs a process per namespace touched, plus one. Operations keep
+their order within each kind and namespace. dump() writes the plan out for
+inspection, one operation per line:
+
+    ip root link add xc1-eth0 type veth peer name leaf101-eth0
+    ip 4242 addr add 10.0.100.1/24 dev h111-eth0.100
+    vsctl add-port ovs100 xc1-eth0.100
+    py attach leaf101-eth0 to leaf101
+"""
+import time
+
+from mininet.log import info, error
+
+from bulk import ipBatch, vsctl
+
+class Plan(object):
+
+    def __init__(self):
+        self.ops = []
+
+    def ip(self, line, ns=None):
+        self.ops.append(('ip', ns, line))
+
+    def vsctl(self, args):
+        self.ops.append(('vsctl', None, list(args)))
+
+    def py(self, desc, fn):
+        """ fn() is called on execution; desc says what it does, for dump() """
+        self.ops.append(('py', desc, fn))
+
+    def extend(self, plan):
+        self.ops.extend(plan.ops)
+
+    def lines(self):
+        for kind, ns, arg in self.ops:
+            if kind == 'ip':
+                yield 'ip %s %s' % (ns or 'root', arg)
+            elif kind == 'vsctl':
+                yield 'vsctl %s' % ' '.join(arg)
+            else:
+                yield 'py %s' % ns
+
+    def dump(self, fname):
+        with open(fname, 'w') as outfile:
+            outfile.writelines(l + '\n' for l in self.lines())
+
+    def execute(self):
+        """ apply the plan. returns the number of errors """
+        start = time.time()
+        batches, cmds, calls = {}, [], []
+        for kind, ns, arg in self.ops:
+            if kind == 'ip':
+                batches.setdefault(ns, []).append(arg)
+            elif kind == 'vsctl':
+                cmds.append(arg)
+            else:
+                calls.append((ns, arg))
+        errors = 0
+        # the root namespace first: interfaces made there may be moved to others
+        for ns in sorted(batches, key=lambda ns: ns is not None):
+            status, out = ipBatch(batches[ns], ns)
+            if status:
+                errors += 1
+                error('*** plan: ip in %s: %s\n' % (ns or 'root', out.strip()))
+        status, out = vsctl(cmds)
+        if status:
+            errors += 1
+            error('*** plan: ovs-vsctl: %s\n' % out.strip())
+        for desc, fn in calls:
+            fn()
+        info('*** plan: %d operations in %d processes, %.2fs\n'
+             % (len(self.ops), len(batches) + (1 if cmds else 0), time.time() - start))
+        return errors
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Small-packet rate (PPS) stress test across the fabrics.
+
+64-byte frames are sent from one host to another over one or more of its
+VLANs and many UDP flows, at a series of offered rates. At each rate, the
+packets that went in and out of every switch (by tier), of the
+cross-connects and of the far host are counted, so the report shows where
+packets were lost as the rate goes up.
+
+Frames are made by the kernel's pktgen, driven through the sending host's
+/proc/<pid>/net/pktgen (pktgen is per network namespace). Where pktgen is
+not available, a raw socket generator is run in the host instead:
+
+    pps.py raw <intf> <dst MAC> <src IP> <dst IP> <flows> <pps> <count>
+
+which is far slower, so only good for low rates.
+"""
+import os
+import socket
+import struct
+import sys
+import time
+
+from mininet.log import info, warn
+
+from datapaths import portStats
+from vlanacct import XC
+
+PPS = os.path.abspath(__file__)
+# 60 bytes on the wire before the FCS: 64-byte frames
+FRAME = 60
+UDP_PORT = 9
+
+def devCounters(pid):
+    """ map of interface name to (rx packets, rx drops, tx packets, tx drops), in pid's namespace """
+    counters = {}
+    try:
+        with open('/proc/%d/net/dev' % pid) as f:
+            lines = f.readlines()[2:]
+    except IOError:
+        return counters
+    for line in lines:
+        name, _, vals = line.partition(':')
+        v = vals.split()
+        counters[name.strip()] = (int(v[1]), int(v[3]), int(v[9]), int(v[11]))
+    return counters
+
+def pktgenDir(pid):
+    return '/proc/%d/net/pktgen' % pid
+
+def pgWrite(pid, fname, cmd):
+    with open(os.path.join(pktgenDir(pid), fname), 'w') as f:
+        f.write(cmd + '\n')
+
+def pktgenSent(pid, dev):
+    """ packets sent so far by pktgen on dev """
+    try:
+        with open(os.path.join(pktgenDir(pid), dev)) as f:
+            for line in f:
+                if 'pkts-sofar:' in line:
+                    return int(line.split('pkts-sofar:')[1].split()[0])
+    except IOError:
+        pass
+    return 0
+
+class Stream(object):
+    """ the traffic of one VLAN (None: untagged) from src to dst """
+
+    def __init__(self, src, dst, vlan=None):
+        sintf, dintf = src.defaultIntf(), dst.defaultIntf()
+        self.vlan = vlan
+        # for the raw generator, and for pktgen, which tags frames itself
+        self.dev = '%s.%d' % (sintf, vlan) if vlan else str(sintf)
+        self.pgdev = '%s@%d' % (sintf, vlan) if vlan else str(sintf)
+        self.rxdev = '%s.%d' % (dintf, vlan) if vlan else str(dintf)
+        self.mac = dintf.MAC()
+        vlans = getattr(src, 'vlans', {})
+        self.srcip = (vlans.get(vlan) if vlan else src.IP()).split('/')[0]
+        vlans = getattr(dst, 'vlans', {})
+        self.dstip = (vlans.get(vlan) if vlan else dst.IP()).split('/')[0]
+
+class PpsTest(object):
+    """
+    sends 64-byte frames from host src to host dst over vlans (or untagged),
+    spread over flows UDP flows per VLAN, and counts them along the way
+    through the switches of domains.
+    """
+
+    def __init__(self, domains, src, dst, vlans=None, flows=64):
+        self.domains = domains
+        self.src = src
+        self.dst = dst
+        self.flows = flows
+        self.streams = [ Stream(src, dst, v) for v in (vlans or [ None ]) ]
+        self.pktgen = self.hasPktgen()
+        # offered pps to { 'sent', 'received', tier : (in, out, dropped) }
+        self.results = {}
+
+    def hasPktgen(self):
+        if not os.path.isdir(pktgenDir(self.src.pid)):
+            self.src.cmd('modprobe pktgen')
+        if os.path.isdir(pktgenDir(self.src.pid)):
+            return True
+        warn('*** pps: no pktgen, using a raw socket generator (low rates only)\n')
+        return False
+
+    def counters(self):
+        """ (tier, packets in, packets out, drops) summed per tier, and per host """
+        tiers = {}
+        for d in self.domains:
+            for sw in d.getSwitches():
+                t = tiers.setdefault(d.getTier(sw.name) or 'other', [ 0, 0, 0 ])
+                for cnt in portStats(sw).values():
+                    t[0] += cnt.get('rx_pkts', 0)
+                    t[1] += cnt.get('tx_pkts', 0)
+                    t[2] += cnt.get('rx_drops', 0) + cnt.get('tx_drops', 0)
+        xc = tiers.setdefault('xc', [ 0, 0, 0 ])
+        for name, (rx, rxd, tx, txd) in devCounters(os.getpid()).items():
+            if XC.match(name.partition('.')[0]):
+                xc[0] += rx
+                xc[1] += tx
+                xc[2] += rxd + txd
+        rx = devCounters(self.dst.pid)
+        tiers['received'] = sum(rx.get(s.rxdev, (0,))[0] for s in self.streams)
+        return tiers
+
+    def sendPktgen(self, rate, seconds):
+        pid = self.src.pid
+        threads = sorted(f for f in os.listdir(pktgenDir(pid)) if f.startswith('kpktgend_'))
+        for t in threads:
+            pgWrite(pid, t, 'rem_device_all')
+        per = max(1, int(rate / len(self.streams)))
+        for n, s in enumerate(self.streams):
+            pgWrite(pid, threads[n % len(threads)], 'add_device %s' % s.pgdev)
+            if s.vlan:
+                pgWrite(pid, s.pgdev, 'vlan_id %d' % s.vlan)
+            for cmd in ('pkt_size %d' % FRAME, 'count %d' % (per * seconds), 'ratep %d' % per,
+                        'dst %s' % s.dstip, 'dst_mac %s' % s.mac,
+                        'src_min %s' % s.srcip, 'src_max %s' % s.srcip,
+                        'udp_dst_min %d' % UDP_PORT, 'udp_dst_max %d' % UDP_PORT,
+                        'udp_src_min 1024', 'udp_src_max %d' % (1024 + self.flows - 1),
+                        'flows %d' % self.flows, 'flowlen 1'):
+                pgWrite(pid, s.pgdev, cmd)
+        # returns once every device has sent its count
+        pgWrite(pid, 'pgctrl', 'start')
+        return sum(pktgenSent(pid, s.pgdev) for s in self.streams)
+
+    def sendRaw(self, rate, seconds):
+        per = max(1, int(rate / len(self.streams)))
+        procs = [ self.src.popen([ sys.executable, PPS, 'raw', s.dev, s.mac, s.srcip, s.dstip,
+                                   str(self.flows), str(per), str(per * seconds) ])
+                  for s in self.streams ]
+        return sum(int(p.communicate()[0].split()[-1]) for p in procs)
+
+    def run(self, rate, seconds=5):
+        """ offer rate pps for seconds, and record what happened """
+        before = self.counters()
+        sent = (self.sendPktgen if self.pktgen else self.sendRaw)(rate, seconds)
+        # let queues drain
+        time.sleep(1)
+        after = self.counters()
+        res = { 'sent' : sent, 'received' : after['received'] - before['received'] }
+        for tier in after:
+            if tier != 'received':
+                res[tier] = tuple(a - b for a, b in zip(after[tier], before.get(tier, (0, 0, 0))))
+        self.results[rate] = res
+        return res
+
+    def sweep(self, rates, seconds=5):
+        for rate in rates:
+            info('*** pps: offering %d pps from %s to %s over %d VLANs\n'
+                 % (rate, self.src, self.dst, len(self.streams)))
+            self.run(rate, seconds)
+        return self.results
+
+    def report(self):
+        tiers = sorted(set(t for r in self.results.values() for t in r
+                           if t not in ('sent', 'received')))
+        info('*** PPS test, %s -> %s, %d-byte frames, %d flows per VLAN:\n'
+             % (self.src, self.dst, FRAME + 4, self.flows))
+        info('\t%10s %10s %10s %7s' % ('offered', 'sent', 'received', 'loss %')
+             + ''.join(' %14s' % ('%s lost/drop' % t) for t in tiers) + '\n')
+        for rate, r in sorted(self.results.items()):
+            loss = 100.0 * (r['sent'] - r['received']) / r['sent'] if r['sent'] else 0.0
+            info('\t%10d %10d %10d %7.2f' % (rate, r['sent'], r['received'], loss)
+                 + ''.join(' %14s' % ('%d/%d' % (max(0, r[t][0] - r[t][1]), r[t][2])
+                                      if t in r else '-') for t in tiers) + '\n')
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    s = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    s = (s >> 16) + (s & 0xffff)
+    s += s >> 16
+    return ~s & 0xffff
+
+def frame(dmac, smac, srcip, dstip, sport):
+    """ a 60-byte Ethernet/IPv4/UDP frame """
+    payload = b'\0' * (FRAME - 14 - 20 - 8)
+    udp = struct.pack('!HHHH', sport, UDP_PORT, 8 + len(payload), 0) + payload
+    hdr = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+                      socket.inet_aton(srcip), socket.inet_aton(dstip))
+    hdr = hdr[:10] + struct.pack('!H', checksum(hdr)) + hdr[12:]
+    return dmac + smac + struct.pack('!H', 0x0800) + hdr + udp
+
+def raw(intf, dst, srcip, dstip, flows, pps, count):
+    """ send count frames out of intf at pps, over flows UDP source ports. prints the number sent """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+    sock.bind((intf, 0))
+    smac = sock.getsockname()[4]
+    dmac = bytes(bytearray(int(b, 16) for b in dst.split(':')))
+    frames = [ frame(dmac, smac, srcip, dstip, 1024 + f) for f in range(flows) ]
+    sent, start = 0, time.time()
+    while sent < count:
+        try:
+            sock.send(frames[sent % flows])
+        except socket.error:
+            # queue full: the frame is lost, as it would be on the wire
+            pass
+        sent += 1
+        if sent % 64 == 0:
+            delay = start + float(sent) / pps - time.time()
+            if delay > 0:
+                time.sleep(delay)
+    print('sent %d' % sent)
+
+if __name__ == '__main__':
+    if len(sys.argv) == 9 and sys.argv[1] == 'raw':
+        raw(sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5],
+            int(sys.argv[6]), float(sys.argv[7]), int(sys.argv[8]))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+A UDP probe stream with sequence numbers, to time traffic loss. Runs inside
+host namespaces:
+
+    probe.py send <ip> <port> <pps> <seconds>
+    probe.py recv <port> <seconds> <pps>
+
+The receiver prints one line per outage it sees - a gap of more than three
+probe intervals between arrivals - and a summary when done:
+
+    gap <time of last probe before> <time of first probe after> <probes lost>
+    total <probes received> <highest sequence number>
+"""
+import socket
+import struct
+import sys
+import time
+
+PROBE = struct.Struct('!Id')
+
+def send(ip, port, pps, seconds):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / pps
+    start = time.time()
+    seq = 0
+    while time.time() - start < seconds:
+        try:
+            sock.sendto(PROBE.pack(seq, time.time()), (ip, port))
+        except socket.error:
+            # e.g. no route while a link is down: the probe counts as lost
+            pass
+        seq += 1
+        # pace against the start time so that delays do not add up
+        delay = start + seq * interval - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+def recv(port, seconds, pps):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('0.0.0.0', port))
+    sock.settimeout(0.1)
+    limit = 3.0 / pps
+    end = time.time() + seconds
+    last = lastseq = None
+    count = maxseq = 0
+    while time.time() < end:
+        try:
+            data = sock.recv(64)
+        except socket.timeout:
+            continue
+        now = time.time()
+        seq = PROBE.unpack(data[:PROBE.size])[0]
+        count += 1
+        maxseq = max(maxseq, seq)
+        if last is not None and now - last > limit:
+            print('gap %.6f %.6f %d' % (last, now, max(0, seq - lastseq - 1)))
+            sys.stdout.flush()
+        last, lastseq = now, seq
+    print('total %d %d' % (count, maxseq))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 5 and sys.argv[1] == 'send':
+        send(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]), float(sys.argv[5]))
+    elif len(sys.argv) > 4 and sys.argv[1] == 'recv':
+        recv(int(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4]))
+    else:
+        print(__doc__)
+        sys.exit(1)
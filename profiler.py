@@ -0,0 +1,191 @@
+"""
+CPU, memory and file descriptor use of the processes behind each Domain.
+
+Every Mininet node has a shell process, and whatever runs for the node is
+started from it: ofdatapath and ofprotocol for CpQD switches, iperf and the
+like for hosts. A node's processes are therefore its shell and all of the
+shell's descendants. Processes that are not started from a node (e.g. the
+LINC Erlang VM) can be given to a domain by a pattern on their command line.
+
+Samples are read from /proc without forking, and appended to a file in the
+line protocol used by stats.py:
+
+    proc,domain=1,tier=spine,node=spine11,cmd=ofdatapath,pid=1234 cpu=12.5,rss=...i,fds=...i <ns>
+"""
+import os
+import threading
+import time
+
+from mininet.log import info
+
+from stats import lineProtocol
+
+CLK_TCK = float(os.sysconf('SC_CLK_TCK'))
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def readStat(pid):
+    """ (command, parent PID, CPU seconds, RSS bytes) of a process, or None """
+    try:
+        with open('/proc/%s/stat' % pid) as f:
+            stat = f.read()
+    except IOError:
+        return None
+    # the command is in parentheses and may contain spaces
+    cmd = stat[stat.find('(') + 1:stat.rfind(')')]
+    fields = stat[stat.rfind(')') + 2:].split()
+    # fields[0] is field 3 of proc(5): state
+    ppid = int(fields[1])
+    cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+    rss = int(fields[21]) * PAGE_SIZE
+    return cmd, ppid, cpu, rss
+
+def fdCount(pid):
+    try:
+        return len(os.listdir('/proc/%s/fd' % pid))
+    except OSError:
+        return 0
+
+def cmdline(pid):
+    try:
+        with open('/proc/%s/cmdline' % pid) as f:
+            return f.read().replace('\0', ' ')
+    except IOError:
+        return ''
+
+def processTree():
+    """ map of PID to list of child PIDs, for all processes """
+    children = {}
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        stat = readStat(pid)
+        if stat:
+            children.setdefault(stat[1], []).append(int(pid))
+    return children
+
+def descendants(pid, children):
+    """ pid and all of its descendants """
+    pids, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        pids.append(p)
+        todo.extend(children.get(p, []))
+    return pids
+
+def domainPids(domain, children=None):
+    """ map of every PID domain owns to (node name, tier) """
+    children = children if children is not None else processTree()
+    pids = {}
+    for sw in domain.getSwitches():
+        for pid in descendants(sw.pid, children):
+            pids[pid] = (sw.name, domain.getTier(sw.name) or 'switch')
+    for h in domain.getHosts():
+        for pid in descendants(h.pid, children):
+            pids[pid] = (h.name, 'host')
+    return pids
+
+class Profiler(object):
+    """
+    samples the processes of domains every interval seconds, in a thread.
+    extra : map of command line pattern to the Domain owning such processes
+    rescan : how many samples to take before looking for new processes
+    """
+
+    def __init__(self, domains, fname, interval=1.0, extra={}, rescan=10):
+        self.domains = domains
+        self.fname = fname
+        self.interval = interval
+        self.extra = extra
+        self.rescan = rescan
+        # PID to (domain ID, node, tier)
+        self.__owners = {}
+        # PID to (time, CPU seconds) of the last sample
+        self.__last = {}
+        # PID to (domain ID, node, tier, command, CPU %, RSS, fds) of the last sample
+        self.latest = {}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def scan(self):
+        """ work out which processes belong to which domain and node """
+        children = processTree()
+        owners = {}
+        for d in self.domains:
+            for pid, (node, tier) in domainPids(d, children).items():
+                owners[pid] = (d.getId(), node, tier)
+        if self.extra:
+            for pid in filter(str.isdigit, os.listdir('/proc')):
+                if int(pid) in owners:
+                    continue
+                line = cmdline(pid)
+                for pattern, d in self.extra.items():
+                    if pattern in line:
+                        for p in descendants(int(pid), children):
+                            owners[p] = (d.getId(), pattern, 'extra')
+        self.__owners = owners
+
+    def sample(self):
+        """ sample all known processes once, and append the results to the file """
+        lines = []
+        latest = {}
+        for pid, (did, node, tier) in self.__owners.items():
+            stat = readStat(pid)
+            if not stat:
+                continue
+            cmd, ppid, cpu, rss = stat
+            now = time.time()
+            last = self.__last.get(pid)
+            self.__last[pid] = (now, cpu)
+            if not last or now <= last[0]:
+                continue
+            pct = 100.0 * (cpu - last[1]) / (now - last[0])
+            fds = fdCount(pid)
+            latest[pid] = (did, node, tier, cmd, pct, rss, fds)
+            tags = { 'domain' : did, 'tier' : tier, 'node' : node, 'cmd' : cmd, 'pid' : pid }
+            lines.append(lineProtocol('proc', tags,
+                                      { 'cpu' : pct, 'rss' : rss, 'fds' : fds }, now))
+        self.latest = latest
+        with open(self.fname, 'a') as outfile:
+            outfile.writelines(lines)
+
+    def run(self):
+        n = 0
+        while not self.__stop.is_set():
+            start = time.time()
+            if n % self.rescan == 0:
+                self.scan()
+            self.sample()
+            n += 1
+            self.__stop.wait(max(0, self.interval - (time.time() - start)))
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.run)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread:
+            self.__thread.join()
+
+    def summary(self, key=lambda did, tier: did):
+        """ CPU %, RSS and fds of the latest sample, summed per key(domain ID, tier) """
+        sums = {}
+        for did, node, tier, cmd, pct, rss, fds in self.latest.values():
+            s = sums.setdefault(key(did, tier), [0.0, 0, 0])
+            s[0] += pct
+            s[1] += rss
+            s[2] += fds
+        return sums
+
+    def report(self, n=5):
+        for title, key in (('domain', lambda did, tier: did),
+                           ('tier', lambda did, tier: tier)):
+            info('*** Resource use per %s:\n' % title)
+            info('\t%-10s %8s %10s %6s\n' % (title, 'cpu %', 'rss (MB)', 'fds'))
+            for k, (pct, rss, fds) in sorted(self.summary(key).items()):
+                info('\t%-10s %8.1f %10.1f %6d\n' % (k, pct, rss / 1e6, fds))
+        info('*** Busiest processes:\n')
+        top = sorted(self.latest.values(), key=lambda p: p[4], reverse=True)[:n]
+        for did, node, tier, cmd, pct, rss, fds in top:
+            info('\tdomain %s %s (%s): %.1f%% cpu, %.1f MB\n' % (did, node, cmd, pct, rss / 1e6))
@@ -0,0 +1,85 @@
+"""
+Wait for the domains of a started network to converge, and measure how long
+it took.
+
+Every switch is polled in its own thread until it is connected to a
+controller, and then until it has at least one flow installed. Per domain,
+time-to-connected and time-to-first-forwarding are the times at which the
+last of its switches got there, counted from when waitReady() was called.
+"""
+import json
+import threading
+import time
+
+from mininet.log import info, warn
+
+from datapaths import connected, flowCount
+
+def pollSwitch(sw, t0, deadline, interval, flows, result):
+    """ poll sw, recording when it connected and when it got flows """
+    conn = prog = None
+    while time.time() < deadline:
+        if conn is None and connected(sw):
+            conn = time.time() - t0
+        if conn is not None and (not flows or flowCount(sw) > 0):
+            prog = time.time() - t0
+            break
+        time.sleep(interval)
+    result[sw.name] = (conn, prog)
+
+def waitReady(domains, timeout=60, interval=0.2, flows=True):
+    """
+    Wait for all switches of domains to be connected and, if flows is set,
+    programmed, or for timeout seconds. Notes the times in each Domain as
+    'connected' and 'forwarding', and returns them as a map of domain ID to
+    { 'connected' : secs, 'forwarding' : secs } (None if never reached).
+    """
+    t0 = time.time()
+    deadline = t0 + timeout
+    result = {}
+    threads = []
+    for d in domains:
+        for sw in d.getSwitches():
+            t = threading.Thread(target=pollSwitch,
+                                 args=(sw, t0, deadline, interval, flows, result))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+    for t in threads:
+        t.join()
+
+    times = {}
+    for d in domains:
+        sws = [ result.get(sw.name, (None, None)) for sw in d.getSwitches() ]
+        conn = latest([ c for c, p in sws ])
+        fwd = latest([ p for c, p in sws ]) if flows else None
+        d.noteTime('connected', conn)
+        d.noteTime('forwarding', fwd)
+        times[d.getId()] = { 'connected' : conn, 'forwarding' : fwd }
+        late = [ sw.name for sw in d.getSwitches()
+                 if result.get(sw.name, (None, None))[1 if flows else 0] is None ]
+        if late:
+            warn('*** Domain %s: not ready after %ss: %s\n'
+                 % (d.getId(), timeout, ' '.join(sorted(late))))
+    return times
+
+def latest(ts):
+    """ the last of a list of times, or None if any was never reached """
+    return None if not ts or None in ts else max(ts)
+
+def report(times):
+    info('*** Convergence time (s):\n')
+    info('\t%-8s %12s %12s\n' % ('domain', 'connected', 'forwarding'))
+    for did in sorted(times):
+        t = times[did]
+        info('\t%-8s %12s %12s\n' % (did, fmt(t['connected']), fmt(t['forwarding'])))
+
+def fmt(t):
+    return '%.2f' % t if t is not None else '-'
+
+def logConvergence(fname, times, **tags):
+    """ append a run's times to fname, one JSON document per line """
+    ent = { 'time' : time.time(), 'domains' : times }
+    ent.update(tags)
+    with open(fname, 'a') as outfile:
+        outfile.write(json.dumps(ent, sort_keys=True) + '\n')
@@ -0,0 +1,394 @@
+"""
+End-to-end EE services across domains: planning, and provisioning in bulk.
+
+A service is a VLAN of some Mbit/s between two endpoints, each a host or a
+switch interface (such as the leaf end of a cross-connect), in the same or
+in different domains. Service files have one service per line:
+
+    # name    VLAN  Mbit/s  endpoint      endpoint
+    acme-1    100   500     h111          leaf101-eth0
+
+The Planner indexes, once, every node, port and link of the Mininet object -
+links between domains included, such as the cross-connects of metro.py -
+with the domain and tier of each node, and the capacity of each link, from
+its 'bandwidth' annotation (Gbit/s), its bw or speed parameter (Mbit/s), or
+a default. Every service then gets:
+
+- the shortest path with room for it, the least loaded one (summing the
+  fraction of each link in use) among equally short ones, so that services
+  spread over spines and cross-connect ports
+- a wavelength, the lowest one free on every core ('oe' tier) link of the
+  path, as the core carries it end to end unconverted
+- a VXLAN tunnel for either end that is a cross-connect with a remote CO
+  (see vxlan.py)
+
+As flows match on in port and VLAN only, a VLAN carries one service per
+switch: a service is rejected if its VLAN is in use on a switch of its path.
+Largest services are placed first. Provisioning is in bulk: the flows of all
+paths are grouped per switch and pushed a switch per thread, with one
+'ovs-ofctl add-flows' per OVS switch, and the tunnels are made with one
+'ip -batch' and one OVSDB transaction. Teardown is the same in reverse.
+Core switches are not programmed: their wavelengths are for the optical
+controller, and shown by report().
+"""
+import heapq
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+from mininet.log import info, warn, error
+from mininet.node import UserSwitch, OVSSwitch
+
+from datapaths import pushFlows
+from vxlan import Tunnel, TunnelManager, liveLinks, liveBridges, subIntf, bridge, vxPort
+
+Service = namedtuple('Service', 'name vlan bw a z')
+
+# Mbit/s of links that say nothing about it
+CAPACITY = 10000
+# channels per core link, and the Mbit/s of each
+CHANNELS = 80
+LAMBDA = 10000
+PRIORITY = 60000
+INF = float('inf')
+
+def parse(fname):
+    """ the services in fname """
+    services = []
+    with open(fname) as f:
+        for n, line in enumerate(f, 1):
+            words = line.split('#')[0].split()
+            if not words:
+                continue
+            if len(words) != 5:
+                raise ValueError('%s:%d: expected <name> <VLAN> <Mbit/s> <endpoint> <endpoint>'
+                                 % (fname, n))
+            services.append(Service(words[0], int(words[1]), float(words[2]), words[3], words[4]))
+    return services
+
+def linkCapacity(link, default=CAPACITY):
+    """ Mbit/s of a Mininet link """
+    an = getattr(link, 'annotations', None) or {}
+    if 'bandwidth' in an:
+        return float(an['bandwidth']) * 1000
+    for intf in (link.intf1, link.intf2):
+        params = getattr(intf, 'params', {})
+        for key in ('bw', 'speed'):
+            if params.get(key):
+                return float(params[key])
+    return default
+
+class Index(object):
+    """ the nodes, ports and links of net, with their domains, tiers and capacities """
+
+    def __init__(self, net, domains, capacity=CAPACITY):
+        # node name to node, domain ID and tier ('host' for hosts)
+        self.nodes, self.domain, self.tier = {}, {}, {}
+        for d in domains:
+            for sw in d.getSwitches():
+                self.domain[sw.name] = d.getId()
+                self.tier[sw.name] = d.getTier(sw.name) or 'switch'
+            for h in d.getHosts():
+                self.domain[h.name] = d.getId()
+        # interface name to (switch name, port), for switch interface endpoints
+        self.ports = {}
+        for sw in net.switches:
+            self.nodes[sw.name] = sw
+            self.tier.setdefault(sw.name, 'switch')
+            for intf, port in sw.ports.items():
+                if intf.name != 'lo':
+                    self.ports[intf.name] = (sw.name, port)
+        for h in net.hosts:
+            self.nodes[h.name] = h
+            self.tier[h.name] = 'host'
+        # link number to (node1, port1, node2, port2) and to Mbit/s, and
+        # node name to [ (peer, link number) ]
+        self.links, self.capacity, self.adj = [], [], {}
+        for link in net.links:
+            i1, i2 = link.intf1, link.intf2
+            n1, n2 = i1.node.name, i2.node.name
+            self.adj.setdefault(n1, []).append((n2, len(self.links)))
+            self.adj.setdefault(n2, []).append((n1, len(self.links)))
+            self.links.append((n1, i1.node.ports.get(i1), n2, i2.node.ports.get(i2)))
+            self.capacity.append(linkCapacity(link, capacity))
+        self.core = set(n for n, (a, _, b, _) in enumerate(self.links)
+                        if self.tier.get(a) == 'oe' and self.tier.get(b) == 'oe')
+
+    def port(self, node, n):
+        """ the port of node on link number n """
+        a, pa, b, pb = self.links[n]
+        return pa if a == node else pb
+
+    def kind(self, n):
+        """ the tiers a link joins, e.g. 'leaf-spine' """
+        a, _, b, _ = self.links[n]
+        return '-'.join(sorted((self.tier.get(a, '?'), self.tier.get(b, '?'))))
+
+class Route(object):
+    """ where a service was placed """
+
+    def __init__(self, service, nodes, links, hops, channel, tunnels):
+        self.service = service
+        # node names and link numbers along the path
+        self.nodes = nodes
+        self.links = links
+        # (switch name, in port, out port) of the switches along the path
+        self.hops = hops
+        # wavelength across the core, if it goes through it
+        self.channel = channel
+        self.tunnels = tunnels
+
+class Planner(object):
+    """
+    places services on the links of net, and provisions them on the switches
+    of domains. exits : switch interface name to (root interface, remote
+    VXLAN endpoint IP), for the ends of cross-connects that lead to remote COs
+    """
+
+    def __init__(self, net, domains, exits={}, capacity=CAPACITY, channels=CHANNELS, threads=16):
+        start = time.time()
+        self.index = Index(net, domains, capacity)
+        self.exits = exits
+        self.channels = channels
+        self.threads = threads
+        # link number to Mbit/s in use, and to the wavelengths in use on it
+        self.load = [ 0.0 ] * len(self.index.links)
+        self.lambdas = dict((n, set()) for n in self.index.core)
+        # service name to Route; rejected services and why
+        self.routes = {}
+        self.rejected = []
+        # tunnel to what of it was made here: (sub-interface, bridge, [ ports
+        # added to a bridge that was already there ]), so only that is deleted
+        self.made = {}
+        # (switch name, VLAN) to the service using that VLAN on the switch
+        self.vlans = {}
+        self.timings = {}
+        info('*** services: indexed %d nodes and %d links in %.2fs\n'
+             % (len(self.index.nodes), len(self.index.links), time.time() - start))
+
+    def use(self, n, bw):
+        """ the fraction of link n in use with bw more on it, or None if it would not fit """
+        if n in self.index.core:
+            used = len(self.lambdas[n]) + 1
+            return float(used) / self.channels if used <= self.channels and bw <= LAMBDA else None
+        cap = self.index.capacity[n]
+        return (self.load[n] + bw) / cap if cap and self.load[n] + bw <= cap else None
+
+    def endpoint(self, name):
+        """ (node name, port) where a path to or from endpoint name ends """
+        if name in self.index.nodes and self.index.tier[name] == 'host':
+            return name, None
+        if name in self.index.ports:
+            return self.index.ports[name]
+        raise ValueError('unknown endpoint %s' % name)
+
+    def path(self, src, dst, bw):
+        """ (nodes, links) of the least loaded of the shortest paths from src to dst with room for bw """
+        best = { src : (0, 0.0) }
+        heap = [ (0, 0.0, src, None) ]
+        prev, done = {}, set()
+        while heap:
+            hops, load, node, via = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            prev[node] = via
+            if node == dst:
+                break
+            # hosts are ends, never on the way
+            if node != src and self.index.tier.get(node) == 'host':
+                continue
+            for peer, n in self.index.adj.get(node, ()):
+                if peer in done:
+                    continue
+                use = self.use(n, bw)
+                if use is None:
+                    continue
+                label = (hops + 1, load + use)
+                if label < best.get(peer, (INF, 0)):
+                    best[peer] = label
+                    heapq.heappush(heap, label + (peer, (node, n)))
+        if dst not in done:
+            return None
+        nodes, links = [ dst ], []
+        while prev[nodes[-1]]:
+            node, n = prev[nodes[-1]]
+            nodes.append(node)
+            links.append(n)
+        return nodes[::-1], links[::-1]
+
+    def place(self, svc):
+        """ the Route of svc, reserving what it uses. raises ValueError if it does not fit """
+        (src, sport), (dst, dport) = self.endpoint(svc.a), self.endpoint(svc.z)
+        found = self.path(src, dst, svc.bw)
+        if not found:
+            raise ValueError('no path from %s to %s with room for %g Mbit/s' % (svc.a, svc.z, svc.bw))
+        nodes, links = found
+        core = [ n for n in links if n in self.index.core ]
+        channel = None
+        if core:
+            used = set().union(*(self.lambdas[n] for n in core))
+            free = [ c for c in range(self.channels) if c not in used ]
+            if not free:
+                raise ValueError('no wavelength free end to end between %s and %s' % (svc.a, svc.z))
+            channel = free[0]
+        hops = []
+        for i, node in enumerate(nodes):
+            if self.index.tier.get(node) == 'host':
+                continue
+            inp = self.index.port(node, links[i - 1]) if i else sport
+            outp = self.index.port(node, links[i]) if i < len(links) else dport
+            hops.append((node, inp, outp))
+        # flows match on in port and VLAN only, so a VLAN is one service per switch
+        for sw, _, _ in hops:
+            other = self.vlans.get((sw, svc.vlan))
+            if other:
+                raise ValueError('VLAN %d is already used by %s on %s' % (svc.vlan, other, sw))
+        tunnels = [ Tunnel(self.exits[e][0], svc.vlan, svc.vlan, self.exits[e][1], None)
+                    for e in (svc.a, svc.z) if e in self.exits ]
+        for sw, _, _ in hops:
+            self.vlans[(sw, svc.vlan)] = svc.name
+        for n in links:
+            self.load[n] += svc.bw
+        for n in core:
+            self.lambdas[n].add(channel)
+        return Route(svc, nodes, links, hops, channel, tunnels)
+
+    def unplace(self, route):
+        for sw, _, _ in route.hops:
+            self.vlans.pop((sw, route.service.vlan), None)
+        for n in route.links:
+            self.load[n] -= route.service.bw
+            if n in self.lambdas:
+                self.lambdas[n].discard(route.channel)
+
+    def plan(self, services):
+        """ place services, largest first. returns the Routes of those that fit """
+        start = time.time()
+        routes = []
+        for svc in sorted(services, key=lambda s: -s.bw):
+            if svc.name in self.routes:
+                self.rejected.append((svc, 'already placed'))
+                continue
+            try:
+                route = self.place(svc)
+            except ValueError as e:
+                self.rejected.append((svc, str(e)))
+                continue
+            self.routes[svc.name] = route
+            routes.append(route)
+        self.timings['plan'] = time.time() - start
+        return routes
+
+    def flows(self, routes):
+        """ switch name to the flows forwarding the VLANs of routes both ways """
+        flows = {}
+        for r in routes:
+            for sw, inp, outp in r.hops:
+                # core switches are left to the optical controller
+                if not isinstance(self.index.nodes[sw], (UserSwitch, OVSSwitch)):
+                    continue
+                for i, o in ((inp, outp), (outp, inp)):
+                    if i is None or o is None:
+                        continue
+                    flows.setdefault(sw, []).append(
+                        { 'table' : 0, 'priority' : PRIORITY,
+                          'match' : { 'in_port' : str(i), 'vlan_vid' : str(r.service.vlan) },
+                          'actions' : [ 'output:%s' % o ] })
+        return flows
+
+    def push(self, routes, cmd):
+        flows = self.flows(routes)
+        pool = ThreadPool(self.threads)
+        errs = sum(pool.map(lambda sw: pushFlows(self.index.nodes[sw], flows[sw], cmd),
+                            sorted(flows)), [])
+        pool.close()
+        return errs
+
+    def created(self, tunnels, links, bridges):
+        """
+        tunnel to what TunnelManager.plan() makes of it, given the live links
+        and bridges it plans from: (sub-interface, bridge, [ ports added to a
+        bridge that was already there ]). tunnels that already exist whole are
+        left out.
+        """
+        made = {}
+        for t in tunnels:
+            if t in self.made:
+                continue
+            sub = subIntf(t) not in links
+            ports = bridges.get(bridge(t))
+            added = [ p for p in (subIntf(t), vxPort(t)) if p not in ports ] \
+                if ports is not None else []
+            if sub or ports is None or added:
+                made[t] = (sub, ports is None, added)
+        return made
+
+    def provision(self, services):
+        """ place services, and set up the ones that fit. returns the errors """
+        routes = self.plan(services)
+        start = time.time()
+        errs = self.push(routes, 'add')
+        wanted = sorted(set(t for r in routes for t in r.tunnels))
+        if wanted:
+            links, bridges = liveLinks(), liveBridges()
+            try:
+                mgr = TunnelManager(wanted)
+            except ValueError as e:
+                errs.append(str(e))
+            else:
+                # recorded even if some of it fails, so teardown cleans it up
+                self.made.update(self.created(wanted, links, bridges))
+                if not mgr.apply(*mgr.plan(links, bridges)):
+                    errs.append('could not set up all tunnels')
+        self.timings['provision'] = time.time() - start
+        for e in errs:
+            error('*** services: %s\n' % e)
+        return errs
+
+    def teardown(self, names=None):
+        """ remove the services named in names (default: all). returns the errors """
+        start = time.time()
+        names = sorted(self.routes) if names is None else names
+        routes = [ self.routes.pop(n) for n in names if n in self.routes ]
+        for r in routes:
+            self.unplace(r)
+        errs = self.push(routes, 'del')
+        # only the tunnels made here that nothing else still uses
+        inuse = set(t for r in self.routes.values() for t in r.tunnels)
+        stale = sorted(set(t for r in routes for t in r.tunnels if t in self.made) - inuse)
+        if stale:
+            iplines, cmds = [], []
+            for t in stale:
+                sub, br, ports = self.made.pop(t)
+                if br:
+                    cmds.append([ '--if-exists', 'del-br', bridge(t) ])
+                cmds.extend([ '--if-exists', 'del-port', bridge(t), p ] for p in ports)
+                if sub:
+                    iplines.append('link del %s' % subIntf(t))
+            if not TunnelManager(stale).apply(iplines, cmds):
+                errs.append('could not remove all tunnels')
+        self.timings['teardown'] = time.time() - start
+        info('*** services: tore down %d services in %.2fs\n' % (len(routes), time.time() - start))
+        for e in errs:
+            error('*** services: %s\n' % e)
+        return errs
+
+    def report(self):
+        info('*** Services: %d placed, %d rejected; %s\n'
+             % (len(self.routes), len(self.rejected),
+                ', '.join('%s %.2fs' % t for t in sorted(self.timings.items()))))
+        for svc, why in self.rejected:
+            warn('\t%s (VLAN %d, %g Mbit/s): %s\n' % (svc.name, svc.vlan, svc.bw, why))
+        kinds = {}
+        for n in range(len(self.index.links)):
+            if n not in self.index.core:
+                use = 100.0 * self.load[n] / self.index.capacity[n] if self.index.capacity[n] else 0.0
+                kinds.setdefault(self.index.kind(n), []).append(use)
+        info('\t%-16s %6s %8s %8s\n' % ('links', 'count', 'max %', 'mean %'))
+        for kind, uses in sorted(kinds.items()):
+            info('\t%-16s %6d %8.1f %8.1f\n' % (kind, len(uses), max(uses), sum(uses) / len(uses)))
+        for n in sorted(self.index.core):
+            a, pa, b, pb = self.index.links[n]
+            info('\t%s/%s-%s/%s: %d of %d wavelengths\n'
+                 % (a, pa, b, pb, len(self.lambdas[n]), self.channels))
@@ -0,0 +1,113 @@
+"""
+Flow and port statistics of the switches of a set of Domains.
+
+A StatsCollector polls every switch of every domain at once, at a fixed
+interval, and turns the port counters into rates. Samples are appended to a
+file in InfluxDB line protocol, one line per port and one per switch:
+
+    port,domain=1,tier=spine,switch=spine11,port=2 rx_bps=...,tx_bps=...,... <ns>
+    flows,domain=1,tier=spine,switch=spine11 count=12i,packets=...i,bytes=...i <ns>
+"""
+import numbers
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from mininet.log import info
+
+from datapaths import portStats, flowStats
+
+def lineProtocol(measurement, tags, fields, ts):
+    """ one line of InfluxDB line protocol. ts : time in seconds """
+    tagstr = ''.join(',%s=%s' % (k, escape(tags[k])) for k in sorted(tags) if tags[k] is not None)
+    fieldstr = ','.join('%s=%s' % (k, value(fields[k])) for k in sorted(fields))
+    return '%s%s %s %d\n' % (measurement, tagstr, fieldstr, int(ts * 1e9))
+
+def escape(tag):
+    return str(tag).replace(' ', '\\ ').replace(',', '\\,').replace('=', '\\=')
+
+def value(v):
+    return '%di' % v if isinstance(v, numbers.Integral) else '%.1f' % v
+
+def rates(prev, cur, dt):
+    """ per-second rates of the counters in cur, given the previous sample """
+    if not prev or dt <= 0:
+        return {}
+    # counters going backwards (e.g. a restarted switch) give no rate
+    return dict((k, (cur[k] - prev[k]) / float(dt))
+                for k in cur if k in prev and cur[k] >= prev[k])
+
+class StatsCollector(object):
+    """ polls the switches of domains every interval seconds, in a thread """
+
+    def __init__(self, domains, fname, interval=1.0, threads=16):
+        self.domains = domains
+        self.fname = fname
+        self.interval = interval
+        self.__pool = ThreadPool(threads)
+        # (switch, port) to (time, counters) of the last sample
+        self.__last = {}
+        # (domain ID, switch, port) to the last computed rates
+        self.rates = {}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def sample(self, sw):
+        """ (time, port counters, flow stats) of a switch """
+        ports = portStats(sw)
+        flows = flowStats(sw)
+        return time.time(), ports, flows
+
+    def poll(self):
+        """ poll all switches once, and append the results to the file """
+        sws = [ (d, sw) for d in self.domains for sw in d.getSwitches() ]
+        samples = self.__pool.map(lambda ds: self.sample(ds[1]), sws)
+        lines = []
+        for (d, sw), (ts, ports, flows) in zip(sws, samples):
+            tags = { 'domain' : d.getId(), 'tier' : d.getTier(sw.name), 'switch' : sw.name }
+            for port, cnt in ports.items():
+                last = self.__last.get((sw.name, port))
+                r = rates(last[1], cnt, ts - last[0]) if last else {}
+                self.__last[(sw.name, port)] = (ts, cnt)
+                fields = dict(cnt)
+                if 'rx_bytes' in r and 'tx_bytes' in r:
+                    fields['rx_bps'] = r['rx_bytes'] * 8
+                    fields['tx_bps'] = r['tx_bytes'] * 8
+                    fields['rx_pps'] = r['rx_pkts']
+                    fields['tx_pps'] = r['tx_pkts']
+                    self.rates[(d.getId(), sw.name, port)] = fields
+                lines.append(lineProtocol('port', dict(tags, port=port), fields, ts))
+            count, pkts, byts = flows
+            lines.append(lineProtocol('flows', tags,
+                         { 'count' : count, 'packets' : pkts, 'bytes' : byts }, ts))
+        with open(self.fname, 'a') as outfile:
+            outfile.writelines(lines)
+
+    def run(self):
+        while not self.__stop.is_set():
+            start = time.time()
+            self.poll()
+            self.__stop.wait(max(0, self.interval - (time.time() - start)))
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.run)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread:
+            self.__thread.join()
+        self.__pool.close()
+
+    def busiest(self, n=10):
+        """ the n ports with the highest throughput, as (bps, domain, switch, port) """
+        top = [ (max(r['rx_bps'], r['tx_bps']),) + k for k, r in self.rates.items() ]
+        return sorted(top, reverse=True)[:n]
+
+    def report(self, n=10):
+        info('*** Busiest ports (Mbps):\n')
+        for bps, did, sw, port in self.busiest(n):
+            info('\tdomain %s %s port %s: %.1f\n' % (did, sw, port, bps / 1e6))
@@ -12,36 +12,57 @@ Each have:
 import json
 
 from mininet.net import Mininet
-from mininet.node import UserSwitch, OVSBridge, RemoteController, Host
+from mininet.node import UserSwitch, OVSSwitch, OVSBridge, RemoteController, Host
 from mininet.topo import Topo
 from mininet.log import  setLogLevel, info, error, warn
 from mininet.cli import CLI
 from mininet.link import OVSIntf, Intf
 from mininet.util import quietRun
 from domains import SegmentRoutedDomain
+from datapaths import BACKENDS
+from openflow import StubController
+from readiness import waitReady, report, logConvergence
+from stats import StatsCollector
+from profiler import Profiler
+from placement import POLICIES, place, pin, release
+from vxlan import TunnelManager, fromCOs
+from vlanacct import VlanAccounting
+from links import LINK_PROFILES, applyProfiles
+from failures import Scenario
+import flowsnap
+from watcher import Watcher
+from metrics import Metrics
+from plan import Plan
+from pps import PpsTest
+from services import Planner, parse
 
 class CO(SegmentRoutedDomain):
 
+    # ofdatapath options for the fabric switches
+    dpopts='--no-local-port --no-slicing'
+
     def __init__(self, did):
         SegmentRoutedDomain.__init__(self, did, self.toCfg, False)
         self.s2gw = {}
+        # external interfaces attached to the tether
+        self.ifs = []
 
     def build(self, n=2, m=2):
         """
         bipartite graph, where n = spine; m = leaf; f = host fanout
         """
-        opts='--no-local-port --no-slicing'
+        opts=self.dpopts
         l_nsw, l_msw, l_h = [], [], []
 
         # create n spine switches.
         for sw in range(n):
-            l_nsw.append(self.addSwitch('spine%s%s' % (self.getId(), sw+1),
-                         cls=UserSwitch, dpopts=opts))
+            l_nsw.append(self.addFabricSwitch('spine%s%s' % (self.getId(), sw+1),
+                                              'spine', dpopts=opts))
 
         # create m leaf switches, add f hosts.
         for sw in range(m):
-            leaf = self.addSwitch('leaf%s0%s' % (self.getId(), sw+1),
-                                  cls=UserSwitch, dpopts=opts)
+            leaf = self.addFabricSwitch('leaf%s0%s' % (self.getId(), sw+1),
+                                        'leaf', dpopts=opts)
             l_msw.append(self.noteLeaf(leaf))
 
         # last leaf is the tether.
@@ -67,6 +88,7 @@ class CO(SegmentRoutedDomain):
         ee.setMAC(self.getMAC('11', '11'))
 
         # add the ports that we will use as VxLAN endpoints
+        self.noteIntf(xc)
         quietRun('ip link add %s type veth peer name %s' % (xc, leaf))
         quietRun('ifconfig %s hw ether %s' % (xc, self.getMAC('10', '01')))
         quietRun('ifconfig %s hw ether %s' % (leaf, self.getMAC('01', '01')))
@@ -74,15 +96,146 @@ class CO(SegmentRoutedDomain):
         quietRun('ifconfig %s up' % xc)
         quietRun('ifconfig %s up' % leaf)
 
-        # set the VLANs on host and cross connects.
+        self.addVLANs(vlans)
+        self.attachIfs(net, ifs)
+
+    def planBootstrap(self, net, vlans, ifs=[], plan=None):
+        """ bootstrap() as a Plan (see plan.py), to be executed in bulk """
+        plan = plan if plan else Plan()
+        did = self.getId()
+        xc='xc%s-eth0' % did
+        leaf='leaf%s01-eth0' % did
+        ee = self.getHosts('h%s11' % did)
+        eeif = ee.defaultIntf()
+        mac = self.getMAC('11', '11')
+        plan.ip('link set %s address %s' % (eeif, mac), ee.pid)
+        plan.py('set MAC of %s' % eeif, lambda: setattr(eeif, 'mac', mac))
+
+        plan.ip('link add %s type veth peer name %s' % (xc, leaf))
+        plan.ip('link set %s address %s up' % (xc, self.getMAC('10', '01')))
+        plan.ip('link set %s address %s up' % (leaf, self.getMAC('01', '01')))
+        plan.py('note %s' % xc, lambda: self.noteIntf(xc))
+        planAttach(plan, net, 'leaf%s01' % did, leaf)
+
+        for v in vlans:
+            ip = '10.0.%s.%d/24' % (v, did)
+            plan.ip('link add link %s name %s.%d type vlan id %d' % (eeif, eeif, v, v), ee.pid)
+            plan.ip('addr add %s dev %s.%d' % (ip, eeif, v), ee.pid)
+            plan.ip('link set %s.%d up' % (eeif, v), ee.pid)
+            plan.py('note VLAN %d of %s' % (v, ee),
+                    lambda v=v, ip=ip: ee.vlans.update({ v : ip }))
+            plan.ip('link add link %s name %s.%d type vlan id %d' % (xc, xc, v, v))
+            plan.ip('link set %s.%d up' % (xc, v))
+            plan.py('note %s.%d' % (xc, v), lambda v=v: self.noteIntf('%s.%d' % (xc, v)))
+
+        return self.planAttachIfs(net, ifs, plan, running=False)
+
+    def addVLANs(self, vlans):
+        """ set the VLANs on host and cross connects. """
+        xc='xc%s-eth0' % self.getId()
+        ee = self.getHosts('h%s11' % self.getId())
         for v in vlans:
             ee.addVLAN(int(v), '10.0.%s.%d/24' % (v, self.getId()))
             quietRun('vconfig add %s %d' % (xc, v))
-            quietRun('ifconfig %s.%d up' % (xc, v))
+            quietRun('ifconfig %s up' % self.noteIntf('%s.%d' % (xc, v)))
+
+    def removeVLANs(self, vlans):
+        """ take VLANs off the host and cross connects. """
+        xc='xc%s-eth0' % self.getId()
+        ee = self.getHosts('h%s11' % self.getId())
+        for v in vlans:
+            ee.removeVLAN(int(v))
+            quietRun('ip link del %s.%d' % (xc, v))
+            if '%s.%d' % (xc, v) in self.getIntfs():
+                self.getIntfs().remove('%s.%d' % (xc, v))
+
+    def getVLANs(self):
+        return sorted(self.getHosts('h%s11' % self.getId()).vlans)
 
-        # attach outside interfaces
+    def attachIfs(self, net, ifs):
+        """ attach outside interfaces """
         for i in ifs:
             attachDev(net, self.getTether(), i)
+            self.ifs.append(i)
+
+    def planAttachIfs(self, net, ifs, plan=None, running=True):
+        """ attachIfs() as a Plan, to the tether as it is before or after starting """
+        plan = plan if plan else Plan()
+        for i in ifs:
+            planAttach(plan, net, self.getTether(), i, running)
+            plan.py('note %s' % i, lambda i=i: self.ifs.append(i))
+        return plan
+
+    def detachIfs(self, net, ifs):
+        """ detach outside interfaces, where the tether can let go of them """
+        tether = net.get(self.getTether())
+        for i in ifs:
+            if not hasattr(tether, 'detach'):
+                warn('*** %s cannot detach %s while running\n' % (tether.name, i))
+                continue
+            tether.detach(i)
+            self.ifs.remove(i)
+
+    def addLeaf(self, net):
+        """
+        add a leaf to the running fabric, linked to every spine. spines that
+        cannot attach ports while running are restarted on their new ports.
+        """
+        n = len(set(self.getLeaves())) + 1
+        name = self.noteLeaf(self.addFabricSwitch('leaf%s0%s' % (self.getId(), n),
+                                                  'leaf', dpopts=self.dpopts))
+        leaf = self.injectSwitch(net, name)
+        for spine in self.getSwitches():
+            if self.getTier(spine.name) != 'spine':
+                continue
+            link = self.injectLink(net, self.addLink(spine.name, name))
+            intf = link.intf1 if link.intf1.node == spine else link.intf2
+            if hasattr(spine, 'attach'):
+                spine.attach(intf)
+            else:
+                spine.stop(deleteIntfs=False)
+                spine.start(self.getControllers())
+        leaf.start(self.getControllers())
+        i = len(self.getSwitches())
+        self.addSwitchCfg(leaf, '%s0%s' % (self.getId(), i), '192.168.%s.%s' % (self.getId(), i),
+                          self.macFmt % (self.getId(), i))
+        return leaf
+
+    def netCfg(self):
+        """
+        the segment routing netcfg of the CO as it is now: its switches, the
+        cross-connect and EE host ports with a tagged interface per VLAN, the
+        external interfaces, and the EE host on each of its VLANs
+        """
+        did = self.getId()
+        self.setCfg({ 'ports' : {}, 'devices' : {}, 'hosts' : {} })
+        leaves = []
+        for l in self.getLeaves():
+            if l not in leaves:
+                leaves.append(l)
+        # leaves last, in the order added, so that SIDs stay put as leaves are added
+        sws = sorted(sw.name for sw in self.getSwitches() if sw.name not in leaves) + leaves
+        for i, name in enumerate(sws, 1):
+            self.addSwitchCfg(self.getSwitches(name), '%s0%s' % (did, i), '192.168.%s.%s' % (did, i),
+                              self.macFmt % (did, i))
+        ee = self.getHosts('h%s11' % did)
+        leaf = self.getSwitches('leaf%s01' % did)
+        tether = self.getSwitches(self.getTether())
+        link = ee.defaultIntf().link
+        eeport = link.intf2 if link.intf1.node == ee else link.intf1
+        ports = [ (leaf, 'leaf%s01-eth0' % did, self.getVLANs()),
+                  (leaf, eeport.name, self.getVLANs()) ]
+        ports += [ (tether, i, []) for i in self.ifs ]
+        for sw, name, vlans in ports:
+            intf = [ i for i in sw.intfList() if i.name == name ]
+            if not intf:
+                continue
+            ifid = self.addPortCfg(sw, intf[0])
+            for v in vlans or [ '-1' ]:
+                self.intfCfg(ifid, vlan=str(v))
+        for v, ip in sorted(ee.vlans.items()):
+            self.addHostCfg(ee, tag=v, ip=ip)
+        return self.getCfg()
 
     def toCfg(self):
         """ Dump a file in segment routing config file format. """
@@ -91,7 +244,7 @@ class CO(SegmentRoutedDomain):
             if sw.name in self.getLeaves():
                 swid = self.addSwitchCfg(sw, '%s0%s' % (self.getId(), i),
                                          self.s2gw[sw.name],
-                                         '00:00:00:%02x:%02x:80' % (self.getId(), i))
+                                         self.macFmt % (self.getId(), i))
                 # check for non-loopback ports facing a host with name of form 'h.*'.
                 for iface in filter(lambda el: el.name != 'lo', sw.intfList()):
                     ep1, ep2 = iface.link.intf1.node, iface.link.intf2.node
@@ -103,7 +256,7 @@ class CO(SegmentRoutedDomain):
             else:
                 self.addSwitchCfg(sw, '%s0%s' % (self.getId(), i),
                                   '192.168.%s.%s' % (self.getId(), i),
-                                  '00:00:00:%02x:%02x:80' % (self.getId(), i))
+                                  self.macFmt % (self.getId(), i))
             i = i+1
         for h in self.getHosts():
             self.addHostCfg(h)
@@ -127,7 +280,6 @@ class VLANHost(Host):
            vlan: VLAN ID for default interface"""
         r = super(VLANHost, self).config(**params)
         if vlan:
-            self.vlans.append(vlan, params['ip'])
             self.addVLAN(vlan, params['ip'])
         return r
 
@@ -141,8 +293,15 @@ class VLANHost(Host):
         self.cmd( 'vconfig add %s %d' % ( intf, vlan ) )
         # assign the host's IP to the VLAN interface
         self.cmd( 'ifconfig %s.%d inet %s' % ( intf, vlan, ip ) )
-        # update the intf name and host's intf map
-        newName = '%s.%d' % ( intf, vlan )
+        self.vlans[vlan] = ip
+
+    def removeVLAN( self, vlan, iface=None ):
+        """Remove a VLAN interface added with addVLAN"""
+        if vlan not in self.vlans:
+            return
+        intf = self.defaultIntf() if iface is None else self.intf(iface)
+        self.cmd( 'ip link del %s.%d' % ( intf, vlan ) )
+        del self.vlans[vlan]
 
 class IpHost(Host):
     def __init__(self, name, gateway, *args, **kwargs):
@@ -151,9 +310,9 @@ class IpHost(Host):
 
     def config(self, **kwargs):
         Host.config(self, **kwargs)
-        mtu = "ifconfig "+self.name+"-eth0 mtu 1490"
-        self.cmd(mtu)
-        self.cmd('ip route add default via %s' % self.gateway)
+        # one round trip to the shell. a link profile may change the MTU later.
+        self.cmd('ifconfig %s-eth0 mtu 1490; ip route add default via %s'
+                 % (self.name, self.gateway))
 
 def attachDev(net, sw, dev):
     switch = net.get(sw)
@@ -166,40 +325,215 @@ def attachDev(net, sw, dev):
         Intf(dev, node=switch)
     info("Interface %s is attached to switch %s.\n" % (dev, sw))
 
+def planAttach(plan, net, sw, dev, running=False):
+    """
+    attachDev() as a Plan. a switch that is not running yet only needs to know
+    of the port; a running OVS switch gets it in the plan's OVSDB transaction.
+    """
+    switch = net.get(sw)
+    if running and isinstance(switch, OVSSwitch):
+        plan.ip('link set %s up' % dev)
+        plan.vsctl([ '--may-exist', 'add-port', switch.name, dev ])
+    elif running and hasattr(switch, 'attach'):
+        plan.py('attach %s to %s' % (dev, sw), lambda: switch.attach(dev))
+        return plan
+    elif switch.inNamespace:
+        plan.ip('link set %s netns %s' % (dev, switch.pid))
+    plan.py('attach %s to %s' % (dev, sw), lambda: Intf(dev, node=switch))
+    return plan
+
 def setup():
     cos = []
+    stub = None
     for d in CTLS.keys():
         co = CO(d)
+        for tier, backend in BACKS.get(d, {}).items():
+            co.setBackend(backend, tier)
         ctls = CTLS[d]
         for i in range(len(ctls)):
-            co.addController('c%s%s' % (d, i), controller=RemoteController, ip=ctls[i])
+            if ctls[i] == 'stub':
+                # one local stub controller stands in for ONOS for all COs
+                stub = stub if stub else StubController().start()
+                co.addController('c%s%s' % (d, i), controller=RemoteController,
+                                 ip=stub.ip, port=stub.port)
+            else:
+                co.addController('c%s%s' % (d, i), controller=RemoteController, ip=ctls[i])
         co.build()
         cos.append(co)
+    # read the files given before any node is made
+    scenario = services = None
+    try:
+        if OPTS.get('failures'):
+            scenario = Scenario(cos, OPTS['failures'])
+        if OPTS.get('services'):
+            services = parse(OPTS['services'])
+    except (IOError, ValueError) as e:
+        error('*** %s\n' % e)
+        if stub:
+            stub.stop()
+        return
     # make/setup Mininet object
     net = Mininet()
+    plan = Plan() if 'plan' in OPTS else None
     for co in cos:
         co.injectInto(net)
+    # the names in the scenario can only be resolved once the nodes exist
+    if scenario:
+        try:
+            scenario.check()
+        except ValueError as e:
+            error('*** %s\n' % e)
+            net.stop()
+            if stub:
+                stub.stop()
+            return
+    for co in cos:
         #co.dumpCfg('co%d.json' % co.getId())
         vls = VLANS.get(co.getId())
         ifs = INFS.get(co.getId()) 
-        co.bootstrap(net, vls, ifs)
+        if plan:
+            co.planBootstrap(net, vls, ifs, plan)
+        else:
+            co.bootstrap(net, vls, ifs)
+        if OPTS.get('links'):
+            co.setLinkProfile(OPTS['links'])
+    # what is set up once the net is built: the EE hosts' trunk addresses
+    started = Plan() if plan else None
+    if plan:
+        if OPTS['plan']:
+            plan.dump(OPTS['plan'])
+        if plan.execute():
+            error('*** Bootstrap plan failed, stopping\n')
+            net.stop()
+            if stub:
+                stub.stop()
+            return
     # start everything, let it run its course
     net.build()
+    applyProfiles(cos)
+    tunnels = None
+    remotes = REMOTES
+    if remotes:
+        tunnels = TunnelManager(fromCOs(VLANS, remotes))
+        tunnels.add()
     for co in cos:
         # remove IP from trunk interface of EE host (assigned by Mininet)
         ee = net.get('h%d11' % co.getId())
-        ee.defaultIntf().ifconfig('inet', '0')
+        if started:
+            started.ip('addr flush dev %s' % ee.defaultIntf(), ee.pid)
+        else:
+            ee.defaultIntf().ifconfig('inet', '0')
+    if started:
+        if OPTS['plan']:
+            plan.extend(started)
+            plan.dump(OPTS['plan'])
+        if started.execute():
+            error('*** Host plan failed, stopping\n')
+            if tunnels:
+                tunnels.delete()
+            net.stop()
+            if stub:
+                stub.stop()
+            return
+    for co in cos:
         co.start()
+    if 'pin' in OPTS:
+        place(cos, policy=OPTS['pin'] or 'rr', quota='quota' in OPTS)
+        pin(cos)
+    # --restore needs the switches connected too
+    if 'converge' in OPTS or OPTS.get('restore'):
+        times = waitReady(cos)
+        report(times)
+        if 'converge' in OPTS:
+            logConvergence(OPTS['converge'] or CONVERGENCE_LOG, times, script='twoCOs')
+    if OPTS.get('restore'):
+        flowsnap.restore(cos, OPTS['restore'])
+    stats = StatsCollector(cos, OPTS['stats'] or 'stats.lp').start() if 'stats' in OPTS else None
+    prof = Profiler(cos, OPTS['profile'] or 'profile.lp').start() if 'profile' in OPTS else None
+    # reachable from the CLI, e.g. 'py net.acct.live()'
+    net.acct = VlanAccounting(cos, fname=OPTS['acct'] or None).start() if 'acct' in OPTS else None
+    # netcfg goes to netcfg/co<id>.json, and to ONOS unless the CO has a stub controller
+    watcher = Watcher(net, cos, OPTS['watch'] or 'topology.json',
+                      push=[ d for d in CTLS if 'stub' not in CTLS[d] ]).start() \
+              if 'watch' in OPTS else None
+    metrics = None
+    if 'metrics' in OPTS:
+        where = OPTS['metrics'] or '9105'
+        metrics = Metrics(cos, stats=stats, acct=net.acct, prof=prof)
+        metrics.start(port=int(where) if where.isdigit() else None,
+                      fname=None if where.isdigit() else where)
+    if scenario:
+        if metrics:
+            metrics.scenario = scenario
+        scenario.run()
+        scenario.report()
+    if OPTS.get('pps'):
+        # between the EE hosts of the first two COs, over the VLANs they share
+        a, b = cos[0].getId(), cos[1].getId()
+        shared = sorted(set(VLANS[a]) & set(VLANS[b]))
+        test = PpsTest(cos, net.get('h%d11' % a), net.get('h%d11' % b), shared)
+        test.sweep([ int(r) for r in OPTS['pps'].split(',') ])
+        test.report()
+    # reachable from the CLI, e.g. 'py net.services.teardown([ "acme-1" ])'
+    net.services = None
+    if services is not None:
+        # the cross-connects lead to the remote COs of --vxlan
+        exits = dict(('leaf%d01-eth0' % did, ('xc%d-eth0' % did, ip)) for did, ip in remotes.items())
+        net.services = Planner(net, cos, exits)
+        net.services.provision(services)
+        net.services.report()
     CLI(net)
+    if net.services:
+        net.services.teardown()
+    if watcher:
+        watcher.stop()
+    if metrics:
+        metrics.stop()
+    if net.acct:
+        net.acct.stop()
+        net.acct.report()
+    if stats:
+        stats.stop()
+        stats.report()
+    if prof:
+        prof.stop()
+        prof.report()
+    if 'snapshot' in OPTS:
+        flowsnap.save(flowsnap.snapshot(cos), OPTS['snapshot'] or 'flows.json.gz')
+    if tunnels:
+        tunnels.delete()
     net.stop()
+    if 'pin' in OPTS:
+        release(cos)
+    if stub:
+        stub.stop()
 
 # CO configuration arguments. DomainID to parameters in maps:
 # CTLS : domain ID to controllers (array)
 # VLANS : domain ID to vlans (array)
 # INFS : domain ID to external interfaces
+# BACKS : domain ID to map of switch tier (None for all) to datapath backend
 CTLS={}
 VLANS={}
 INFS={}
+BACKS={}
+# OPTS : option name to value, from --name=value arguments
+OPTS={}
+# REMOTES : domain ID to remote VXLAN endpoint IP, from --vxlan
+REMOTES={}
+# where --converge keeps the convergence times of each run by default
+CONVERGENCE_LOG='convergence.log'
+
+def options(argv):
+    """pull --name[=value] options out of argv into OPTS, and return the rest."""
+    rest = []
+    for arg in argv:
+        if arg.startswith('--'):
+            name, _, val = arg[2:].partition('=')
+            OPTS[name] = val
+        else:
+            rest.append(arg)
+    return rest
 
 def parseable(argv):
     """see if it can, and parse, the configs and add to maps of domainID to its configs."""
@@ -216,9 +550,34 @@ def parseable(argv):
         ctls = get(args, 1)
         vlans = get(args, 2)
         ifs = get(args, 3)
+        backs = get(args, 4)
         CTLS[did] = ctls.split(',')
         VLANS[did] = map(lambda v: int(v), vlans.split(','))
-        INFS[did] = ifs.split(',') if ifs is not None else []
+        INFS[did] = ifs.split(',') if ifs else []
+        BACKS[did] = {}
+        for b in backs.split(',') if backs else []:
+            tier, backend = b.split('=') if '=' in b else (None, b)
+            if backend not in BACKENDS:
+                print('datapath backend must be one of %s' % ', '.join(sorted(BACKENDS)))
+                return False
+            BACKS[did][tier] = backend
+    return True
+
+def tunnelable():
+    """see if the --vxlan tunnels can all be made, and parse them into REMOTES."""
+    try:
+        for r in OPTS['vxlan'].split(',') if OPTS.get('vxlan') else []:
+            did, ip = r.split('=')
+            REMOTES[int(did)] = ip
+    except ValueError:
+        print('--vxlan must be a comma-separated list of <domain ID>=<IP>')
+        return False
+    # every VLAN gets one ovs<vid> bridge, so only one CO may tunnel it
+    try:
+        TunnelManager(fromCOs(VLANS, REMOTES))
+    except ValueError as e:
+        print('--vxlan: %s; give the COs with tunnels distinct VLANs' % e)
+        return False
     return True
 
 def get(l, v):
@@ -231,11 +590,41 @@ if __name__ == '__main__':
     setLogLevel('info')
     import sys
     if len(sys.argv) < 2 or '-h' in sys.argv:
-        print ('Usage: sudo -E %s config1 config2 ...\n',
-               'config<n> : configurations for a CO, format domainID:[ctrls]:[vlans]:[ifs]\n'
-               '[ctrls]   : a comma-separated list of controller IPs\n',
+        print ('Usage: sudo -E %s [options] config1 config2 ...\n',
+               'config<n> : configurations for a CO, format domainID:[ctrls]:[vlans]:[ifs]:[dps]\n'
+               '[ctrls]   : a comma-separated list of controller IPs, or stub for a local stub controller\n',
                '[vlans]   : a comma-separated list of VLANs at the EE\n'
-               '[ifs]     : a comma-separated list of interfaces to the world (optional)')
+               '[ifs]     : a comma-separated list of interfaces to the world (optional)\n'
+               '[dps]     : datapath backend (cpqd, ovs, ovs13), or a comma-separated\n'
+               '            list of tier=backend, e.g. spine=ovs13,leaf=cpqd (optional)\n'
+               'options:\n'
+               '--converge[=<file>] : wait for the COs to converge, and log the times to <file> (convergence.log)\n'
+               '--stats[=<file>] : poll switch port and flow statistics into <file> (stats.lp)\n'
+               '--profile[=<file>] : sample CPU/memory/fds of node processes into <file> (profile.lp)\n'
+               '--pin[=rr|weighted] : give each CO its own cores, by policy (rr)\n'
+               '--quota : with --pin, give each CO a share of CPU time instead of cores\n'
+               '--vxlan=<id>=<ip>,... : VXLAN tunnels for the VLANs of CO <id> to remote <ip>\n'
+               '--acct[=<file>] : per-VLAN traffic accounting (live view: py net.acct.live())\n'
+               '--links=<profile> : MTU/offload/queue profile for all interfaces (%s)\n'
+               '--failures=<file> : run the failure scenario in <file> before the CLI (see failures.py)\n'
+               '--snapshot[=<file>] : save the flow tables of all switches on exit (flows.json.gz)\n'
+               '--restore=<file> : push the flows saved in <file> once the COs are up\n'
+               '--watch[=<file>] : apply edits of VLANs, ifs and leaves in <file> while running (topology.json),\n'
+               '                   writing and pushing the netcfg of COs that change (netcfg/co<id>.json)\n'
+               '--metrics[=<port>|<file>] : Prometheus metrics on http://127.0.0.1:<port>/metrics (9105), or in <file>\n'
+               '--plan[=<file>] : set up the COs with one bulk plan (see plan.py), dumped to <file> if given\n'
+               '--pps=<rate>,... : 64-byte frame loss per tier at each offered rate, between the first two COs\n'
+               '--services=<file> : place and provision the EE services in <file> before the CLI (see services.py)'
+               % ', '.join(sorted(LINK_PROFILES)))
     else:
-        if parseable(sys.argv[1:]):
+        configs = options(sys.argv[1:])
+        if OPTS.get('pin') and OPTS['pin'] not in POLICIES:
+            print('placement policy must be one of %s' % ', '.join(POLICIES))
+        elif OPTS.get('links') and OPTS['links'] not in LINK_PROFILES:
+            print('link profile must be one of %s' % ', '.join(sorted(LINK_PROFILES)))
+        elif 'pps' in OPTS and len(set(c.split(':')[0] for c in configs)) < 2:
+            print('--pps measures between two COs; give at least two configs')
+        elif 'pps' in OPTS and not all(r.isdigit() for r in OPTS['pps'].split(',')):
+            print('--pps must be a comma-separated list of frames per second')
+        elif parseable(configs) and tunnelable():
             setup()
@@ -0,0 +1,151 @@
+"""
+Consistency checks for the network configuration of a set of Domains, to be
+run before anything is pushed to a controller.
+
+Hash indexes are built once over all domains - devices and their ports from
+the Mininet switches, links between ports, and the SIDs, router IPs/MACs and
+host MACs/IPs claimed by each netcfg - and every reference is then checked
+with a lookup, so the whole check is linear in the size of the configs:
+
+- segment routing devices, ports and host locations refer to existing
+  devices and ports
+- nodeSid, routerIp, routerMac, host MACs and host IPs are unique across
+  all domains
+- every cross-connect port is on its domain's tether, its remote is an
+  existing OCh port, no OCh port is claimed twice, and (given the network)
+  the two ports are actually linked
+"""
+from mininet.log import warn
+
+def devId(dpid):
+    """ a device ID of the form netcfg uses, from a DPID or device ID """
+    dpid = dpid[3:] if dpid.startswith('of:') else dpid
+    return 'of:' + dpid.zfill(16)
+
+def connectPoint(cp):
+    """ (device ID, port) from 'of:<dpid>/<port>' """
+    dev, _, port = cp.rpartition('/')
+    return devId(dev), port
+
+class Validator(object):
+
+    def __init__(self):
+        # device ID to (domain ID, switch)
+        self.devices = {}
+        # device ID to set of port numbers (as strings)
+        self.ports = {}
+        # (device ID, port) to (device ID, port) at the other end of its link
+        self.links = {}
+        # (kind, value) to the first place claiming it, for uniqueness
+        self.claims = {}
+        self.errors = []
+
+    def error(self, msg):
+        self.errors.append(msg)
+
+    def indexDomains(self, domains):
+        for d in domains:
+            for sw in d.getSwitches():
+                did = devId(sw.dpid)
+                if did in self.devices:
+                    self.error('%s of domain %s and %s of domain %s have the same DPID %s'
+                               % (sw.name, d.getId(), self.devices[did][1].name,
+                                  self.devices[did][0], did))
+                self.devices[did] = (d.getId(), sw)
+                self.ports[did] = set(str(p) for p in sw.ports.values())
+
+    def indexLinks(self, net):
+        for link in net.links:
+            ends = []
+            for intf in (link.intf1, link.intf2):
+                node = intf.node
+                ends.append((devId(node.dpid), str(node.ports[intf]))
+                            if hasattr(node, 'dpid') else (node.name, None))
+            self.links[ends[0]] = ends[1]
+            self.links[ends[1]] = ends[0]
+
+    def claim(self, kind, val, where):
+        first = self.claims.setdefault((kind, val), where)
+        if first != where:
+            self.error('%s %s claimed by both %s and %s' % (kind, val, first, where))
+
+    def checkPort(self, dev, port, where):
+        if dev not in self.devices:
+            self.error('%s: unknown device %s' % (where, dev))
+        elif port not in self.ports[dev]:
+            self.error('%s: device %s has no port %s' % (where, dev, port))
+
+    def checkCfg(self, did, cfg):
+        """ check the segment routing netcfg of domain did """
+        for dev, ent in cfg.get('devices', {}).items():
+            where = 'domain %s device %s' % (did, dev)
+            if devId(dev) not in self.devices:
+                self.error('%s: no such switch' % where)
+            sr = ent.get('segmentrouting', {})
+            for kind in ('nodeSid', 'routerIp', 'routerMac'):
+                if kind in sr:
+                    self.claim(kind, str(sr[kind]), where)
+        for cp, ent in cfg.get('ports', {}).items():
+            dev, port = connectPoint(cp)
+            where = 'domain %s port %s' % (did, cp)
+            if cp.rpartition('/')[0] not in cfg.get('devices', {}):
+                self.error('%s: device is not configured' % where)
+            self.checkPort(dev, port, where)
+        for hid, ent in cfg.get('hosts', {}).items():
+            where = 'domain %s host %s' % (did, hid)
+            self.claim('host MAC', hid.split('/')[0].lower(), where)
+            basic = ent.get('basic', {})
+            for ip in basic.get('ips', []):
+                self.claim('host IP', ip, where)
+            loc = basic.get('location')
+            if not loc:
+                self.error('%s: no location' % where)
+                continue
+            if loc.rpartition('/')[0] not in cfg.get('devices', {}):
+                self.error('%s: location %s is on a device that is not configured' % (where, loc))
+            dev, port = connectPoint(loc)
+            self.checkPort(dev, port, where)
+
+    def checkCrossConnects(self, domain, cfg):
+        """ check the cross-connect netcfg of a fabric domain """
+        tether = domain.getSwitches(name=domain.getTether())
+        tid = devId(tether.dpid) if tether else None
+        for cp, ent in cfg.get('ports', {}).items():
+            xc = ent.get('cross-connect')
+            if xc is None:
+                continue
+            where = 'domain %s cross-connect %s' % (domain.getId(), cp)
+            dev, port = connectPoint(cp)
+            if dev != tid:
+                self.error('%s: not on the tether %s' % (where, domain.getTether()))
+            self.checkPort(dev, port, where)
+            remote = connectPoint(xc.get('remote', ''))
+            self.checkPort(remote[0], remote[1], where)
+            self.claim('OCh port', '%s/%s' % remote, where)
+            if self.links and self.links.get((dev, port)) != remote:
+                self.error('%s: not linked to %s/%s' % ((where,) + remote))
+
+def validate(domains, xconnects={}, net=None):
+    """
+    Check the netcfg of domains (as generated by their toCfg), and the
+    cross-connect configs in xconnects, a map of domain ID to netcfg.
+    net : the Mininet object, to check that cross-connects are wired as
+          configured. Returns a list of errors.
+    """
+    v = Validator()
+    v.indexDomains(domains)
+    if net:
+        v.indexLinks(net)
+    for d in domains:
+        if hasattr(d, 'getCfg'):
+            v.checkCfg(d.getId(), d.getCfg())
+        if d.getId() in xconnects:
+            v.checkCrossConnects(d, xconnects[d.getId()])
+    return v.errors
+
+def check(domains, xconnects={}, net=None):
+    """ validate, and warn about every error. returns True if there were none """
+    errors = validate(domains, xconnects, net)
+    for e in errors:
+        warn('*** netcfg: %s\n' % e)
+    return not errors
@@ -0,0 +1,155 @@
+"""
+Per-VLAN traffic accounting for the services carried by the COs.
+
+Each service is one VLAN, seen on VLAN sub-interfaces: <intf>.<vid> of the EE
+hosts (h<x>11) and xc<x>-eth0.<vid> of the cross-connects. The counters of
+all of them are read from /proc/<pid>/net/dev, which shows the interfaces of
+the network namespace of process <pid>. So one file read per namespace covers
+every VLAN in it, and no process is forked per interface or per poll.
+
+Rates are kept per (domain, VLAN, side), side being the node name for
+sub-interfaces in a host, or 'xc' for the cross-connects. They can be shown
+live, summarized, and appended to a file in line protocol (see stats.py):
+
+    vlan,domain=1,side=xc,vlan=100 rx_bps=...,tx_bps=...,rx_pps=...,tx_pps=... <ns>
+"""
+import os
+import re
+import threading
+import time
+
+from mininet.log import info
+
+from stats import lineProtocol, rates
+
+XC = re.compile(r'xc(\d+)-eth\d+$')
+
+def readDev(path):
+    """ map of VLAN sub-interface name to counters, from a net/dev file """
+    counters = {}
+    try:
+        with open(path) as f:
+            lines = f.readlines()[2:]
+    except IOError:
+        return counters
+    for line in lines:
+        name, _, vals = line.partition(':')
+        name = name.strip()
+        base, _, vid = name.rpartition('.')
+        if not vid.isdigit():
+            continue
+        v = vals.split()
+        counters[name] = { 'rx_bytes' : int(v[0]), 'rx_pkts' : int(v[1]),
+                           'tx_bytes' : int(v[8]), 'tx_pkts' : int(v[9]) }
+    return counters
+
+class VlanAccounting(object):
+    """
+    polls the VLAN sub-interfaces of domains' hosts and of the root namespace
+    every interval seconds, in a thread.
+    fname : where to append samples to, if anywhere
+    """
+
+    def __init__(self, domains, interval=1.0, fname=None):
+        self.domains = domains
+        self.interval = interval
+        self.fname = fname
+        # (domain ID, VLAN, side) to (time, counters) of the last sample
+        self.__last = {}
+        # (domain ID, VLAN, side) to the latest rates
+        self.rates = {}
+        # (domain ID, VLAN, side) to [ samples, sum of bps, peak bps, first, last counters ]
+        self.totals = {}
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def sources(self):
+        """ (net/dev file, domain ID, side) for every namespace to read """
+        srcs = [ ('/proc/%d/net/dev' % os.getpid(), None, 'xc') ]
+        for d in self.domains:
+            for h in d.getHosts():
+                srcs.append(('/proc/%d/net/dev' % h.pid, d.getId(), h.name))
+        return srcs
+
+    def poll(self):
+        lines = []
+        for path, did, side in self.sources():
+            now = time.time()
+            for name, cnt in readDev(path).items():
+                base, _, vid = name.rpartition('.')
+                if did is None:
+                    m = XC.match(base)
+                    if not m:
+                        continue
+                    key = (int(m.group(1)), int(vid), side)
+                else:
+                    key = (did, int(vid), side)
+                last = self.__last.get(key)
+                self.__last[key] = (now, cnt)
+                if not last:
+                    self.totals[key] = [ 0, 0.0, 0.0, cnt, cnt ]
+                    continue
+                r = rates(last[1], cnt, now - last[0])
+                if 'rx_bytes' not in r or 'tx_bytes' not in r:
+                    continue
+                fields = { 'rx_bps' : r['rx_bytes'] * 8, 'tx_bps' : r['tx_bytes'] * 8,
+                           'rx_pps' : r['rx_pkts'], 'tx_pps' : r['tx_pkts'] }
+                self.rates[key] = fields
+                tot = self.totals[key]
+                bps = max(fields['rx_bps'], fields['tx_bps'])
+                tot[0] += 1
+                tot[1] += bps
+                tot[2] = max(tot[2], bps)
+                tot[4] = cnt
+                if self.fname:
+                    tags = { 'domain' : key[0], 'vlan' : key[1], 'side' : key[2] }
+                    lines.append(lineProtocol('vlan', tags, fields, now))
+        if lines:
+            with open(self.fname, 'a') as outfile:
+                outfile.writelines(lines)
+
+    def run(self):
+        while not self.__stop.is_set():
+            start = time.time()
+            self.poll()
+            self.__stop.wait(max(0, self.interval - (time.time() - start)))
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.run)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread:
+            self.__thread.join()
+
+    def live(self, n=20):
+        """ show the n busiest VLANs right now """
+        top = sorted(self.rates.items(),
+                     key=lambda kr: max(kr[1]['rx_bps'], kr[1]['tx_bps']), reverse=True)[:n]
+        info('%-8s %6s %-10s %12s %12s %10s %10s\n'
+             % ('domain', 'vlan', 'side', 'rx Mbps', 'tx Mbps', 'rx pps', 'tx pps'))
+        for (did, vid, side), r in top:
+            info('%-8s %6s %-10s %12.2f %12.2f %10.0f %10.0f\n'
+                 % (did, vid, side, r['rx_bps'] / 1e6, r['tx_bps'] / 1e6,
+                    r['rx_pps'], r['tx_pps']))
+
+    def summary(self):
+        """ map of (domain, VLAN, side) to (bytes rx, bytes tx, mean bps, peak bps) """
+        summ = {}
+        for key, (n, total, peak, first, last) in self.totals.items():
+            summ[key] = (last['rx_bytes'] - first['rx_bytes'],
+                         last['tx_bytes'] - first['tx_bytes'],
+                         total / n if n else 0.0, peak)
+        return summ
+
+    def report(self):
+        info('*** Per-VLAN traffic:\n')
+        info('\t%-8s %6s %-10s %12s %12s %10s %10s\n'
+             % ('domain', 'vlan', 'side', 'rx MB', 'tx MB', 'mean Mbps', 'peak Mbps'))
+        for (did, vid, side), (rx, tx, mean, peak) in sorted(self.summary().items()):
+            info('\t%-8s %6s %-10s %12.2f %12.2f %10.2f %10.2f\n'
+                 % (did, vid, side, rx / 1e6, tx / 1e6, mean / 1e6, peak / 1e6))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+VXLAN tunnels from the cross-connect interfaces of COs to remote COs.
+
+For each (interface, VLAN) a tunnel is, as with ovs_vxlan.sh:
+- a VLAN sub-interface <intf>.<vid>, in promiscuous mode
+- an OVS bridge ovs<vid> holding the sub-interface
+- a VXLAN port vxlan<vni> on the bridge, towards the remote
+
+A TunnelManager works out what is missing from (or stale in) the running
+system, and applies all of it with one 'ip -batch' and one ovs-vsctl
+transaction. Adding, deleting and reconciling can be repeated safely.
+"""
+import re
+import sys
+from collections import namedtuple
+
+from mininet.log import setLogLevel, info, error
+
+from bulk import ipBatch, vsctl, run
+
+Tunnel = namedtuple('Tunnel', 'intf vid vni remote local')
+
+def subIntf(t):
+    return '%s.%d' % (t.intf, t.vid)
+
+def bridge(t):
+    return 'ovs%d' % t.vid
+
+def vxPort(t):
+    return 'vxlan%d' % t.vni
+
+def fromCOs(vlans, remotes, local=None, vnis={}):
+    """
+    tunnels for the cross-connects of COs as set up by twoCOs.py.
+    vlans : domain ID to list of VLANs (twoCOs.VLANS)
+    remotes : domain ID to the remote VXLAN endpoint IP
+    vnis : VLAN to VNI, for VNIs that differ from the VLAN ID
+    """
+    return [ Tunnel('xc%s-eth0' % did, v, vnis.get(v, v), remotes[did], local)
+             for did in sorted(remotes) for v in vlans.get(did, []) ]
+
+def liveLinks():
+    """ the names of the interfaces in the root namespace """
+    status, out = run([ 'ip', '-o', 'link', 'show' ])
+    return set(m.split('@')[0] for m in re.findall(r'^\d+: ([^:]+):', out, re.M))
+
+def liveBridges():
+    """ map of OVS bridge name to map of port name to interface options """
+    status, out = run([ 'ovs-vsctl', 'show' ])
+    bridges = {}
+    br = port = None
+    for line in out.splitlines():
+        line = line.strip()
+        if line.startswith('Bridge '):
+            br = bridges.setdefault(line.split()[1].strip('"'), {})
+            port = None
+        elif line.startswith('Port ') and br is not None:
+            port = line.split()[1].strip('"')
+            br[port] = {}
+        elif line.startswith('options:') and port:
+            br[port] = dict(re.findall(r'(\w+)="?([^",}]*)"?', line[8:]))
+    return bridges
+
+class TunnelManager(object):
+    """ adds, deletes and reconciles a set of tunnels in bulk """
+
+    def __init__(self, tunnels):
+        self.tunnels = list(tunnels)
+        seen, owners = {}, {}
+        for t in self.tunnels:
+            for key in (subIntf(t), vxPort(t)):
+                if seen.setdefault(key, t) != t:
+                    raise ValueError('tunnels %s and %s both use %s' % (seen[key], t, key))
+            # a bridge joining two interfaces would join their VLANs too
+            if owners.setdefault(bridge(t), t.intf) != t.intf:
+                raise ValueError('%s and %s both need bridge %s'
+                                 % (owners[bridge(t)], t.intf, bridge(t)))
+
+    def plan(self, links=None, bridges=None, only=None):
+        """
+        the ip batch lines and ovs-vsctl commands bringing up the tunnels in
+        only (default: all) that are missing or differ from the live state.
+        """
+        links = liveLinks() if links is None else links
+        bridges = liveBridges() if bridges is None else bridges
+        iplines, cmds = [], []
+        for t in self.tunnels if only is None else only:
+            sub, br, vx = subIntf(t), bridge(t), vxPort(t)
+            if sub not in links:
+                iplines.append('link add link %s name %s type vlan id %d' % (t.intf, sub, t.vid))
+                iplines.append('link set %s promisc on up' % sub)
+            ports = bridges.get(br)
+            if ports is None:
+                cmds.append([ '--may-exist', 'add-br', br ])
+                ports = {}
+            if sub not in ports:
+                cmds.append([ '--may-exist', 'add-port', br, sub ])
+            opts = { 'key' : str(t.vni), 'remote_ip' : t.remote }
+            if t.local:
+                opts['local_ip'] = t.local
+            if ports.get(vx) != opts:
+                cmds.append([ '--may-exist', 'add-port', br, vx ])
+                cmds.append([ 'set', 'interface', vx, 'type=vxlan' ] +
+                            [ 'options:%s=%s' % (k, opts[k]) for k in sorted(opts) ])
+        return iplines, cmds
+
+    def unplan(self, only=None):
+        """ the ip batch lines and ovs-vsctl commands removing tunnels """
+        iplines, cmds = [], []
+        for t in self.tunnels if only is None else only:
+            cmds.append([ '--if-exists', 'del-br', bridge(t) ])
+            iplines.append('link del %s' % subIntf(t))
+        return iplines, cmds
+
+    def stale(self, links=None, bridges=None):
+        """ live tunnels on the managed interfaces that are not wanted """
+        links = liveLinks() if links is None else links
+        bridges = liveBridges() if bridges is None else bridges
+        wanted = set(subIntf(t) for t in self.tunnels)
+        parents = set(t.intf for t in self.tunnels)
+        stale = []
+        for link in links:
+            parent, _, vid = link.rpartition('.')
+            if parent in parents and vid.isdigit() and link not in wanted:
+                vxs = [ p for p in bridges.get('ovs%s' % vid, {}) if p.startswith('vxlan') ]
+                vni = int(vxs[0][5:]) if vxs else int(vid)
+                stale.append(Tunnel(parent, int(vid), vni, None, None))
+        return stale
+
+    def apply(self, iplines, cmds):
+        # OVSDB first when removing, so that no port is left dangling
+        steps = [ (vsctl, cmds), (ipBatch, iplines) ]
+        if not any(c[0] == '--if-exists' for c in cmds):
+            steps.reverse()
+        ok = True
+        for fn, arg in steps:
+            status, out = fn(arg)
+            if status:
+                error('*** %s failed: %s\n' % (fn.__name__, out.strip()))
+                ok = False
+        return ok
+
+    def add(self):
+        iplines, cmds = self.plan()
+        info('*** Adding tunnels: %d ip commands, %d OVSDB operations\n'
+             % (len(iplines), len(cmds)))
+        return self.apply(iplines, cmds)
+
+    def delete(self):
+        info('*** Deleting %d tunnels\n' % len(self.tunnels))
+        return self.apply(*self.unplan())
+
+    def reconcile(self):
+        """ add what is missing, and remove stale tunnels """
+        links, bridges = liveLinks(), liveBridges()
+        stale = self.stale(links, bridges)
+        if stale:
+            info('*** Removing %d stale tunnels\n' % len(stale))
+            self.apply(*self.unplan(stale))
+        iplines, cmds = self.plan(links, bridges)
+        info('*** Reconciling tunnels: %d ip commands, %d OVSDB operations\n'
+             % (len(iplines), len(cmds)))
+        return self.apply(iplines, cmds)
+
+def parse(spec):
+    """ tunnels from <intf>:<vid>[=<vni>],...[:<remote>[:<local>]] """
+    args = spec.split(':')
+    intf, vids = args[0], args[1]
+    remote = args[2] if len(args) > 2 else None
+    local = args[3] if len(args) > 3 else None
+    tunnels = []
+    for v in vids.split(','):
+        vid, _, vni = v.partition('=')
+        tunnels.append(Tunnel(intf, int(vid), int(vni or vid), remote, local))
+    return tunnels
+
+if __name__ == '__main__':
+    setLogLevel('info')
+    cmds = ('add', 'delete', 'reconcile', 'plan')
+    if len(sys.argv) < 3 or sys.argv[1] not in cmds:
+        print ('Usage: sudo ./vxlan.py add|delete|reconcile|plan tunnels1 tunnels2 ...\n\n'
+               'tunnels<n> : <intf>:<vid>[=<vni>],...:<remote_ip>[:<local_ip>]\n'
+               '             e.g. xc1-eth0:100,200=5200:10.0.0.2 (delete needs no IPs)')
+        sys.exit(1)
+    tunnels = sum([ parse(s) for s in sys.argv[2:] ], [])
+    if sys.argv[1] != 'delete' and None in [ t.remote for t in tunnels ]:
+        print('%s needs the remote IP of every tunnel' % sys.argv[1])
+        sys.exit(1)
+    mgr = TunnelManager(tunnels)
+    if sys.argv[1] == 'plan':
+        iplines, cmds = mgr.plan()
+        print('\n'.join([ 'ip ' + l for l in iplines ] +
+                        [ 'ovs-vsctl ' + ' '.join(c) for c in cmds ]))
+    else:
+        sys.exit(0 if getattr(mgr, sys.argv[1])() else 1)
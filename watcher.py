@@ -0,0 +1,162 @@
+"""
+Keeps a running twoCOs.py session in line with a topology spec file, so the
+lab layout can be edited without restarting it. The spec is JSON, per CO:
+
+    { "1" : { "vlans" : [ 100, 200 ], "ifs" : [ "eth1" ], "leaves" : 2 } }
+
+The file is checked for changes every interval seconds. On a change, the
+spec is compared to what each CO has now, and only the difference is
+applied: VLAN sub-interfaces of the EE host and cross-connect are added or
+removed, external interfaces are attached to or detached from the tether,
+and new leaves are linked to the spines. Leaves are not removed, and COs are
+not added, while running.
+
+The netcfg of every CO that changed is then generated anew (CO.netCfg()),
+written to <cfgdir>/co<id>.json, and pushed to the CO's ONOS with
+onos-netcfg, as metro.py does.
+"""
+import json
+import os
+import threading
+
+from mininet.log import info, warn, error
+from mininet.util import quietRun
+
+from links import applyProfiles
+
+ONOS_NETCFG = os.path.join(os.environ.get('ONOS_ROOT', '/opt/onos'), 'tools/test/bin/onos-netcfg')
+
+def current(cos):
+    """ the spec of what cos have now """
+    return dict((str(co.getId()), { 'vlans' : co.getVLANs(), 'ifs' : list(co.ifs),
+                                    'leaves' : len(set(co.getLeaves())) })
+                for co in cos)
+
+def delta(have, want):
+    """
+    map of CO ID to the changes taking it from spec have to spec want, as
+    { 'vlans' : (to add, to remove), 'ifs' : (to add, to remove), 'leaves' : to add }
+    """
+    changes = {}
+    for did, spec in want.items():
+        if did not in have:
+            warn('*** watcher: CO %s is not running, cannot add it\n' % did)
+            continue
+        cur = have[did]
+        ch = {}
+        for key in ('vlans', 'ifs'):
+            old, new = set(cur[key]), set(spec.get(key, cur[key]))
+            if old != new:
+                ch[key] = (sorted(new - old), sorted(old - new))
+        leaves = spec.get('leaves', cur['leaves']) - cur['leaves']
+        if leaves < 0:
+            warn('*** watcher: CO %s: leaves are not removed while running\n' % did)
+        elif leaves:
+            ch['leaves'] = leaves
+        if ch:
+            changes[did] = ch
+    return changes
+
+class Watcher(object):
+    """
+    applies changes in spec file fname to cos, in a thread.
+    cfgdir : where to write co<id>.json with the netcfg of COs that changed
+    push : IDs of the COs whose netcfg is pushed to their (first) controller
+    """
+
+    def __init__(self, net, cos, fname, interval=2.0, cfgdir='netcfg', push=()):
+        self.net = net
+        self.cos = dict((str(co.getId()), co) for co in cos)
+        self.fname = fname
+        self.interval = interval
+        self.cfgdir = cfgdir
+        self.push = set(str(did) for did in push)
+        self.__mtime = None
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def dump(self):
+        """ write what the COs have now as the spec """
+        with open(self.fname, 'w') as outfile:
+            json.dump(current(self.cos.values()), outfile, indent=4, sort_keys=True,
+                      separators=(',', ': '))
+        self.__mtime = os.stat(self.fname).st_mtime
+
+    def apply(self, changes):
+        for did, ch in sorted(changes.items()):
+            co = self.cos[did]
+            add, rm = ch.get('vlans', ([], []))
+            if add or rm:
+                info('*** watcher: CO %s: VLANs +%s -%s\n' % (did, add, rm))
+                co.removeVLANs(rm)
+                co.addVLANs(add)
+            add, rm = ch.get('ifs', ([], []))
+            if add or rm:
+                info('*** watcher: CO %s: interfaces +%s -%s\n' % (did, add, rm))
+                co.detachIfs(self.net, rm)
+                # one OVSDB transaction for the ports of a running OVS tether
+                if co.planAttachIfs(self.net, add).execute():
+                    warn('*** watcher: CO %s: could not attach all of %s\n' % (did, add))
+            for _ in range(ch.get('leaves', 0)):
+                info('*** watcher: CO %s: adding %s\n' % (did, co.addLeaf(self.net).name))
+            if co.getLinkProfile():
+                applyProfiles([ co ])
+            self.pushCfg(co)
+
+    def pushCfg(self, co):
+        """ write out the netcfg of co, and push it to its ONOS """
+        if not os.path.isdir(self.cfgdir):
+            os.makedirs(self.cfgdir)
+        fname = os.path.join(self.cfgdir, 'co%s.json' % co.getId())
+        with open(fname, 'w') as outfile:
+            json.dump(co.netCfg(), outfile, indent=4, separators=(',', ': '))
+        if str(co.getId()) not in self.push:
+            return
+        info('*** watcher: pushing %s to CO-ONOS %s\n' % (fname, co.getId()))
+        output = quietRun('%s %s %s' % (ONOS_NETCFG, co.getControllers()[0].ip, fname),
+                          shell=True)
+        # successful output contains the two characters '{}'
+        if output.strip().strip('{}'):
+            warn('*** watcher: could not push %s to ONOS: %s\n' % (fname, output))
+
+    def check(self):
+        """ apply the spec, if it changed since the last look """
+        try:
+            mtime = os.stat(self.fname).st_mtime
+        except OSError:
+            return
+        if mtime == self.__mtime:
+            return
+        self.__mtime = mtime
+        try:
+            with open(self.fname) as f:
+                want = json.load(f)
+        except ValueError as e:
+            error('*** watcher: %s: %s\n' % (self.fname, e))
+            return
+        self.apply(delta(current(self.cos.values()), want))
+
+    def run(self):
+        while not self.__stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                # keep watching: the next edit may fix it
+                error('*** watcher: %s\n' % e)
+            self.__stop.wait(self.interval)
+
+    def start(self):
+        """ start watching, first writing the spec if there is none """
+        if not os.path.exists(self.fname):
+            self.dump()
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.run)
+        self.__thread.daemon = True
+        self.__thread.start()
+        info('*** watcher: applying changes to %s\n' % self.fname)
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread:
+            self.__thread.join()